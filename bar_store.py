@@ -0,0 +1,64 @@
+# bar_store.py
+import os, json, tempfile, threading
+from typing import Dict, List, Optional, Tuple
+
+
+class BarStore:
+    """
+    Local cache of completed sessions' 1m candles ([epoch, o, h, l, c, v] rows).
+    Past sessions never change, so a day is fetched from the broker once and then
+    served from memory (and from disk across restarts). A day without a session is
+    stored as [] so it is not asked for again.
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self._mem: Dict[Tuple[str, str], List[list]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str, day: str) -> str:
+        safe = symbol.replace(":", "_").replace("/", "_")
+        return os.path.join(self.root, safe, f"{day}.json")
+
+    def get(self, symbol: str, day: str) -> Optional[List[list]]:
+        key = (symbol, day)
+        rows = self._mem.get(key)
+        if rows is not None:
+            return rows
+        path = self._path(symbol, day)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._mem[key] = rows
+        return rows
+
+    def days(self, symbol: str) -> List[str]:
+        """Days of `symbol` on disk (YYYY-MM-DD, sorted), empty no-session days included."""
+        d = os.path.dirname(self._path(symbol, "x"))
+        try:
+            names = os.listdir(d)
+        except OSError:
+            return []
+        return sorted(n[:-5] for n in names if n.endswith(".json"))
+
+    def put(self, symbol: str, day: str, rows: List[list]):
+        path = self._path(symbol, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # unique temp name: concurrent writers of the same day must not share (and unlink) one file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(rows, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._mem[(symbol, day)] = rows
@@ -0,0 +1,103 @@
+# bars.py
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import datetime as dt
+import pandas as pd
+from data import utc_epoch_to_ist_dt
+
+# (ts_ist, o, h, l, c, v) -- ts is the bucket start in IST
+Bar = Tuple[dt.datetime, float, float, float, float, float]
+
+TIMEFRAMES = (1, 3, 5, 15)
+
+
+class BarAggregator:
+    """
+    Incremental multi-timeframe OHLCV built from closed 1m candles of one symbol.
+    - buckets align to IST minute-of-day (same bins as pandas '{tf}min' resample)
+    - a tf bar is finished when its last minute arrives or the next bucket starts
+    - subscribe(tf, cb) -> cb(tf, bar) on every finished bar (not fired while seeding)
+    - frame(tf) returns a cached DataFrame (index ts, cols o/h/l/c/v), rebuilt only after a new bar
+    """
+    def __init__(self, symbol: str, timeframes: Iterable[int] = TIMEFRAMES, maxlen: int = 800):
+        self.symbol = symbol
+        self.timeframes = tuple(sorted(set(timeframes) | {1}))
+        self.maxlen = maxlen
+        self._subs: Dict[int, List[Callable]] = {tf: [] for tf in self.timeframes}
+        self.reset()
+
+    def reset(self):
+        self.bars: Dict[int, deque] = {tf: deque(maxlen=self.maxlen) for tf in self.timeframes}
+        self.version: Dict[int, int] = {tf: 0 for tf in self.timeframes}
+        self._partial: Dict[int, Optional[list]] = {tf: None for tf in self.timeframes}
+        self._frames: Dict[int, Tuple[int, pd.DataFrame]] = {}
+        self.last_epoch: Optional[int] = None
+
+    def subscribe(self, tf: int, cb: Callable[[int, Bar], None]):
+        if tf not in self._subs:
+            raise ValueError(f"timeframe {tf}m not aggregated (have {self.timeframes})")
+        self._subs[tf].append(cb)
+
+    # ---------- ingest ----------
+    def seed(self, candles: List[list]) -> int:
+        return self.ingest(candles, emit=False)
+
+    def ingest(self, candles: List[list], now_epoch: Optional[float] = None, emit: bool = True) -> int:
+        """Feed broker rows [epoch, o, h, l, c, v]; only new, closed 1m candles are taken. Returns count."""
+        n = 0
+        for row in candles or ():
+            ep = int(row[0])
+            if self.last_epoch is not None and ep <= self.last_epoch:
+                continue
+            if now_epoch is not None and ep + 60 > now_epoch:
+                break  # still forming
+            self._push_1m(ep, row, emit)
+            self.last_epoch = ep
+            n += 1
+        return n
+
+    def _push_1m(self, ep: int, row: list, emit: bool):
+        ts = utc_epoch_to_ist_dt(ep)
+        o, h, l, c, v = (float(x) for x in row[1:6])
+        mod = ts.hour * 60 + ts.minute
+        for tf in self.timeframes:
+            key = (ts.date(), mod // tf)
+            p = self._partial[tf]
+            if p is not None and p[0] != key:
+                self._finish(tf, emit)
+                p = None
+            if p is None:
+                start = ts.replace(hour=(mod // tf * tf) // 60, minute=(mod // tf * tf) % 60)
+                self._partial[tf] = [key, start, o, h, l, c, v]
+            else:
+                p[3] = max(p[3], h)
+                p[4] = min(p[4], l)
+                p[5] = c
+                p[6] += v
+            if (mod + 1) % tf == 0:
+                self._finish(tf, emit)
+
+    def _finish(self, tf: int, emit: bool):
+        p = self._partial[tf]
+        self._partial[tf] = None
+        bar: Bar = (p[1], p[2], p[3], p[4], p[5], p[6])
+        self.bars[tf].append(bar)
+        self.version[tf] += 1
+        if emit:
+            for cb in self._subs[tf]:
+                cb(tf, bar)
+
+    # ---------- read ----------
+    def up_to_date(self, now_epoch: float) -> bool:
+        """True once the most recently closed minute has been ingested."""
+        return self.last_epoch is not None and self.last_epoch >= (int(now_epoch) // 60) * 60 - 60
+
+    def frame(self, tf: int) -> pd.DataFrame:
+        ver = self.version[tf]
+        hit = self._frames.get(tf)
+        if hit is not None and hit[0] == ver:
+            return hit[1]
+        rows = self.bars[tf]
+        df = pd.DataFrame(list(rows), columns=["ts", "o", "h", "l", "c", "v"]).set_index("ts")
+        self._frames[tf] = (ver, df)
+        return df
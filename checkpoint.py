@@ -0,0 +1,120 @@
+# checkpoint.py
+import os, json, time, datetime as dt
+from typing import List, Optional
+from models import Position
+
+# Position fields persisted in a checkpoint (tick history is deliberately left out;
+# it only feeds diagnostics and would make every write grow through the day).
+_POS_FIELDS = ("symbol", "side", "entry_time", "entry_price", "qty", "sl_price", "tp_price",
+               "peak_price", "last_trail_level_hit", "is_core", "notes", "entry_qty")
+
+
+def _json_default(o):
+    if isinstance(o, (dt.datetime, dt.date)):
+        return o.isoformat()
+    raise TypeError(f"not JSON serializable: {type(o).__name__}")
+
+
+def ts_or_none(s: Optional[str]) -> Optional[dt.datetime]:
+    return dt.datetime.fromisoformat(s) if s else None
+
+
+def position_to_dict(p: Position) -> dict:
+    return {k: getattr(p, k) for k in _POS_FIELDS}
+
+
+def position_from_dict(d: dict) -> Position:
+    kw = {k: d[k] for k in _POS_FIELDS if k in d}
+    kw["entry_time"] = ts_or_none(kw.get("entry_time"))
+    return Position(**kw)
+
+
+class Checkpointer:
+    """
+    Crash-safe checkpoint of engine state: a small JSON snapshot plus an append-only journal of
+    closed trades next to it (<name>.trades.jsonl).
+    - due() is asked before the caller builds the state, so throttled ticks serialize nothing;
+      writes are throttled to min_interval_sec unless force=True (entries/exits)
+    - save() is a no-op when the serialized snapshot is unchanged since the last write
+    - each closed trade is appended to the journal once; the snapshot only records how many
+      there are, so a write does not grow with the day's trades
+    - tmp file + os.replace, so a crash mid-write leaves the previous snapshot intact; journal
+      lines past the snapshot's count (crash between the two writes) are dropped on load
+    """
+    def __init__(self, path: str, min_interval_sec: float = 2.0):
+        self.path = path
+        self.journal = os.path.splitext(path)[0] + ".trades.jsonl"
+        self.min_interval_sec = min_interval_sec
+        self._last_blob: Optional[str] = None
+        self._last_write = 0.0
+
+    def due(self, force: bool = False) -> bool:
+        return force or (time.monotonic() - self._last_write) >= self.min_interval_sec
+
+    def save(self, state: dict, force: bool = False) -> bool:
+        if not self.due(force):
+            return False
+        blob = json.dumps(state, sort_keys=True, separators=(",", ":"), default=_json_default)
+        if blob == self._last_blob:
+            return False
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._last_blob = blob
+        self._last_write = time.monotonic()
+        return True
+
+    def append_trades(self, trades: List[dict]):
+        if not trades:
+            return
+        lines = "".join(json.dumps(t, sort_keys=True, separators=(",", ":"), default=_json_default) + "\n"
+                        for t in trades)
+        with open(self.journal, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear_journal(self):
+        try:
+            os.remove(self.journal)
+        except FileNotFoundError:
+            pass
+
+    def load_trades(self, n: int) -> List[dict]:
+        """The first n journal entries (the trades the snapshot counted); the journal is cut back to them."""
+        trades: List[dict] = []
+        extra = False
+        try:
+            with open(self.journal, "r", encoding="utf-8") as f:
+                for line in f:
+                    if len(trades) >= n:
+                        extra = True
+                        break
+                    try:
+                        trades.append(json.loads(line))
+                    except ValueError:  # torn last line
+                        extra = True
+                        break
+        except OSError:
+            return trades
+        if extra:
+            tmp = self.journal + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(t, sort_keys=True, separators=(",", ":")) + "\n" for t in trades)
+            os.replace(tmp, self.journal)
+        return trades
+
+    def load(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                blob = f.read()
+            state = json.loads(blob)
+        except (OSError, ValueError):
+            return None
+        self._last_blob = blob
+        return state
@@ -17,6 +17,12 @@ IST = pytz.timezone("Asia/Kolkata")
 ORB_START_IST = dt.time(9, 15)
 ORB_END_IST   = dt.time(9, 30)
 SQUARE_OFF_IST= dt.time(15, 29)
+TICK_SLEEP_SEC = 0.8
+
+# --- Persistent service mode (main.py --service) ---
+SERVICE_WAKE_IST  = dt.time(9, 0)  # wake-up time on each following day
+AUTO_ROLL_EXPIRY  = True           # derive EXPIRY_CODE per day when rolling sessions
+EXPIRY_WEEKDAY    = 1              # monthly expiry = last <weekday> of month (Mon=0, Tue=1)
 
 
 # --------- Trading / Risk ---------
@@ -45,6 +51,33 @@ SLOW_PROFIT_PCT       = 15
 REDUCED_TP_PCT        = 25
 
 USE_PROJECTED_RISK_BLOCK = True
+DAILY_LOSS_INCLUDES_MTM  = True   # daily-loss gate on realized + open MTM; projected risk on PnL if open stops fill
+
+# --------- Underlyings (multi-underlying mode: python main.py --multi) ---------
+# strike_step / lot_size / expiry_code per underlying; expiry_code "" = derive from date
+INSTRUMENTS = {
+    "NIFTY":     {"index_symbol": "NSE:NIFTY50-INDEX",  "option_root": "NIFTY",     "strike_step": 50,  "lot_size": 75, "expiry_code": ""},
+    "BANKNIFTY": {"index_symbol": "NSE:NIFTYBANK-INDEX", "option_root": "BANKNIFTY", "strike_step": 100, "lot_size": 35, "expiry_code": ""},
+    "FINNIFTY":  {"index_symbol": "NSE:FINNIFTY-INDEX",  "option_root": "FINNIFTY",  "strike_step": 50,  "lot_size": 65, "expiry_code": ""},
+}
+UNDERLYINGS          = ["NIFTY", "BANKNIFTY"]   # run together on one shared quote snapshot
+QUOTE_BATCH_SIZE     = 50     # symbols per batched quotes call
+QUOTE_MAX_AGE_SEC    = 0.5    # board snapshot older than this -> fall back to a direct quote
+
+# --------- Shared-memory market data hub (python main.py --hub / --attach) ---------
+HUB_NAME             = "orb_market_hub"   # multiprocessing.shared_memory block name
+HUB_SLOTS            = 256    # symbols the hub can publish (indices + option ladders)
+HUB_BAR_CAPACITY     = 512    # 1m bars per symbol per session (375 in a regular session)
+HUB_POLL_SEC         = 0.5    # publisher quote cycle
+HUB_LADDER_WIDTH     = 5      # ATM +/- strikes (CE and PE) published per underlying
+HUB_MAX_AGE_SEC      = 3.0    # hub heartbeat older than this -> readers use their own API calls
+
+# --------- Strike selection ---------
+STRIKE_SELECT_MODE   = "atm"          # "atm" (nearest strike) | "delta" | "premium"
+TARGET_DELTA         = 0.45           # |delta| aimed for in "delta" mode
+PREMIUM_BAND_INR     = (80.0, 160.0)  # "premium" mode: premium in band, nearest the middle wins
+STRIKE_LADDER_WIDTH  = 5              # ATM +/- strikes quoted (one batched call) in delta/premium mode
+RISK_FREE_RATE       = 0.065          # for Black-Scholes IV/delta
 
 # --------- RSI ---------
 USE_RSI           = True
@@ -76,6 +109,39 @@ REARM_USING_OR_BAND    = True
 
 # --------- Logging ---------
 LOG_DIR = "logs"
+BAR_STORE_DIR = "data/bars"          # local cache of past sessions' 1m candles
+
+# --- Pre-market warm-up (runs while waiting for ORB end) ---
+WARMUP_ENABLED         = True
+WARMUP_KEEPALIVE_SEC   = 20       # light index quote to keep broker connections warm
+WARMUP_LADDER_WIDTH    = 3        # resolve ATM +/- N strikes (CE & PE) before 09:30
+WARMUP_THREADS         = 4
+
+# --- Cross-session indicator warm-start (RSI / Supertrend / BB ready at the open) ---
+WARM_START_ENABLED      = True
+WARM_START_MAX_SESSIONS = 2       # prior sessions to draw seed bars from
+WARM_START_MAX_GAP_DAYS = 5       # ignore sessions older than this (calendar days)
+WARM_START_MAX_BARS     = 300     # cap on cached seed tail per symbol
+WARM_START_GAP_RESET_PCT = 1.5    # opening gap larger than this -> treat as regime break, no seed
+
+# --- Shared bar aggregator ---
+BAR_REFRESH_RETRY_SEC   = 3.0     # re-poll 1m history at most this often until the closed bar lands
+
+# --- Strategy registry: (name, params) built via strategy/registry.py ---
+STRATEGIES = [
+    ("bb_scalp",         {}),
+    ("supertrend_trend", {"period": 10, "multiplier": 3.0, "tf_min": 5}),
+    ("vwap_reversion",   {"band_k": 2.0, "lookback_min": 120}),
+]
+
+# --- Strategy executor (concurrent signal evaluation per tick) ---
+STRATEGY_WORKERS        = 4       # 0 = evaluate inline (deterministic replay)
+STRATEGY_TIMEOUT_SEC    = 0.25    # per-tick deadline; late strategies count as no signal
+
+# --- Crash-safe checkpoint / resume ---
+CHECKPOINT_ENABLED       = True
+CHECKPOINT_MIN_INTERVAL_SEC = 2.0   # throttle on-change writes (entries/exits always write)
+RESUME_FROM_CHECKPOINT   = True     # restore today's checkpoint on restart instead of recomputing ORB
 
 # --- Snapshots & diagnostics ---
 SNAPSHOT_INTERVAL_SEC   = 15 * 60   # 15 minutes
@@ -83,6 +149,61 @@ ENABLE_DIAGNOSTICS      = True      # log why entries were not taken
 ENABLE_MOMENTUM_LOGS    = True      # log RSI regime & price-zone shifts
 RSI_HYSTERESIS          = 1.0       # RSI points to reduce flip-flop around thresholds
 
+# --- Order execution (execution.py) ---
+EXECUTION_MODE           = "sim"       # "sim": fill at LTP in-process | "paper": FakeExchange over live quotes | "live": Fyers orders
+EXEC_PRODUCT_TYPE        = "INTRADAY"
+EXEC_POLL_SEC            = 0.5         # order-book poll while any order is working
+EXEC_ORDER_TIMEOUT_SEC   = 10.0        # cancel the unfilled remainder of a market order after this
+EXEC_SQUAREOFF_WAIT_SEC  = 15.0        # wait for square-off exits to fill before ending the session
+EXEC_BASKET_WORKERS      = 8           # concurrent sends for a basket exit (square-off, several exits in one tick)
+EXEC_FAKE_LATENCY_SEC    = 0.25        # FakeExchange: order rest time before it can fill
+EXEC_FAKE_SLIPPAGE_TICKS = 1           # FakeExchange: market fills this many ticks against us
+EXEC_FAKE_PARTIAL_PROB   = 0.1         # FakeExchange: chance a fill arrives in two parts
+TICK_SIZE                = 0.05        # option premium tick
+EXEC_BROKER_STOPS        = False       # mirror pos.sl_price as an exchange SL-M order (modified as it trails)
+EXEC_PROTECTED_TICK_SLEEP_SEC = None   # tick interval while every open position is exchange-protected (None = TICK_SLEEP_SEC)
+
+# --- Paper fill model & charges (fills.py) ---
+FILL_MODEL_ENABLED        = False   # fill at bid/ask (or modelled spread/slippage) + fees instead of LTP + COST_PER_SIDE_INR
+FILL_HALF_SPREAD_TICKS    = 1.0     # no book in the quote: half spread paid per side
+FILL_SLIPPAGE_TICKS       = 1.0
+FILL_IMPACT_TICKS_PER_LOT = 0.5     # per lot beyond the first / beyond the visible depth
+FILL_LATENCY_MS           = 250.0   # decision -> exchange
+FILL_DRIFT_BPS_PER_SEC    = 5.0     # adverse premium drift during that latency
+FEE_BROKERAGE_PER_ORDER   = 20.0    # INR
+FEE_STT_SELL_PCT          = 0.1     # on sell premium
+FEE_EXCHANGE_PCT          = 0.03503 # NSE transaction charge on premium turnover
+FEE_SEBI_PCT              = 0.0001  # INR 10 / crore
+FEE_STAMP_BUY_PCT         = 0.003   # on buy premium
+FEE_GST_PCT               = 18.0    # on brokerage + exchange + SEBI
+
+# --- Adaptive polling (scheduler.py) ---
+ADAPTIVE_POLL_ENABLED  = False   # per-symbol poll cadence from distance to the nearest trigger (else TICK_SLEEP_SEC)
+POLL_MIN_SEC           = 0.3     # fastest poll, right at a level
+POLL_MAX_SEC           = 5.0     # slowest poll, nothing nearby
+POLL_BUDGET_PER_MIN    = 150     # quote polls per minute across index + positions
+POLL_SAFETY_SIGMAS     = 3.0     # poll before a k-sigma move could reach the nearest level
+POLL_VOL_HALFLIFE_SEC  = 60.0    # volatility EWMA half-life
+POLL_DEFAULT_VOL_BPS   = 5.0     # per sqrt(second) until a symbol has history
+
+# --- Event bus (events.py) ---
+EVENT_BUS_ASYNC  = True    # live runs: log/metrics/path-recorder subscribers on their own threads (replays stay inline)
+EVENT_FLUSH_SEC  = 0.2     # subscriber drain interval (events are handed over in batches)
+EVENT_METRICS_MAXLEN = 10_000   # metrics subscriber drops its oldest events beyond this backlog
+
+# --- Live metrics endpoint (metrics.py) ---
+METRICS_ENABLED            = False          # serve /metrics (Prometheus text) and /state (JSON)
+METRICS_HOST               = "127.0.0.1"    # local only
+METRICS_PORT               = 9108
+METRICS_LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+# --- Profiling (profiler.py) ---
+PROFILE_ENABLED          = False   # profile every session (or toggle at runtime: kill -USR1 <pid>)
+PROFILE_SAMPLE_MS        = 5       # stack sampling interval of the trading-loop thread
+PROFILE_TRACE_MALLOC     = True    # tracemalloc alongside (slows the loop noticeably)
+PROFILE_MEM_INTERVAL_SEC = 60      # traced-memory timeline resolution
+PROFILE_TOP_ALLOCS       = 25      # allocation sites listed in the report
+
 # --- Diagnostics throttling ---
 DIAG_INTERVAL_SEC       = 15 * 60   # minimum seconds between DIAG_NO_ENTRY logs
 DIAG_ONLY_ON_CHANGE     = True      # log only if the reason set changed vs last time
@@ -115,3 +236,38 @@ IMPULSE_LOSS_PCT  = -3.0     # if -3.0% hit in window -> immediate exit
 # (optional) shorter scalp timeout (keeps same logic, just quicker)
 # SCALP_MAX_HOLD_MIN = 8
 
+
+# --- Vectorized ORB research backtester (orb_backtest.py) ---
+BT_PREMIUM_PCT_OF_SPOT = 0.6    # approx. ATM premium at entry, % of spot
+BT_DELTA               = 0.5    # premium points per index point
+BT_THETA_PCT_PER_HOUR  = 2.0    # premium decay while held, % of entry premium per hour
+BT_MAX_CELLS           = 20_000_000   # exit combos x days x minutes per numpy pass (memory cap)
+
+# --- Exit-rule optimizer (exit_optimizer.py) ---
+EXIT_PATHS_RECORD  = False         # append each closed position's full tick path to logs/exit_paths_YYYYMMDD.jsonl
+                                   #   (research runs only: the files are neither capped nor cleaned up)
+EXIT_OPT_MAX_CELLS = 5_000_000     # rule sets x trades x ticks per numpy pass (memory cap)
+
+# --- Walk-forward optimizer (walkforward.py) ---
+WF_IS_DAYS         = 60                     # in-sample sessions per window (parameter pick)
+WF_OOS_DAYS        = 20                     # out-of-sample sessions scored with that pick; windows step by this
+WF_OBJECTIVE       = "total_pnl"            # orb_backtest.pnl_stats column maximised in-sample
+WF_CACHE_DIR       = "data/indicator_cache" # LRU spill of per-day indicator series (None = memory only)
+WF_CACHE_MAX_ITEMS = 10_000                 # series kept in memory before spilling
+
+# --- Risk gate simulator (risk_sim.py) ---
+RISK_SIM_SESSIONS = 1_000_000   # synthetic sessions per parameter choice
+RISK_SIM_CHUNK    = 100_000     # sessions per vectorized pass (memory cap)
+
+# --- Synthetic market / throughput stress (synthetic.py, stress.py) ---
+SYN_SPOT0            = 24500.0
+SYN_VOL_ANNUAL       = 0.14          # calm-regime index vol
+SYN_REGIME_VOL_MULT  = (1.0, 2.5)    # calm / stressed
+SYN_REGIME_MEAN_MIN  = (90.0, 20.0)  # mean minutes spent in each regime
+SYN_JUMPS_PER_DAY    = 2.0
+SYN_JUMP_STD_PCT     = 0.4           # jump size (log return) std, %
+SYN_IV_PREMIUM       = 0.02          # option IV = regime vol + this
+SYN_DAYS_TO_EXPIRY   = 7.0
+SYN_SPREAD_TICKS     = 2             # option bid/ask spread in the synthetic quotes
+STRESS_RATES         = [10, 100, 500, 1000, 2000, 5000]   # ticks per second
+STRESS_SECONDS       = 30            # simulated seconds per rate
@@ -1,31 +1,140 @@
-import os, csv, datetime as dt
+import os, csv, time, threading, datetime as dt
+import numpy as np
 import pandas as pd
-from typing import Optional, Tuple, List
-from config import IST, INDEX_SYMBOL
-from config import USE_YDAY_WHEN_TODAY_EMPTY, EXPIRY_CODE
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple, List
+from config import IST, QUOTE_BATCH_SIZE, QUOTE_MAX_AGE_SEC
+from config import USE_YDAY_WHEN_TODAY_EMPTY, EXPIRY_WEEKDAY
 from config import LOT_SIZE, INIT_SL_PCT, COST_PER_SIDE_INR
-from config import LOG_DIR
-
-def ist_now():
-    return dt.datetime.now(IST)
+from config import LOG_DIR, BAR_STORE_DIR
+from config import STRIKE_SELECT_MODE, TARGET_DELTA, PREMIUM_BAND_INR, STRIKE_LADDER_WIDTH, RISK_FREE_RATE
+from config import (WARM_START_ENABLED, WARM_START_MAX_SESSIONS, WARM_START_MAX_GAP_DAYS,
+                    WARM_START_MAX_BARS, WARM_START_GAP_RESET_PCT)
+from bar_store import BarStore
+from instruments import Instrument, default_instrument
+from greeks import select_strike
+from logging_utils import ist_now  # honours a virtual clock (synthetic.py)
 
 def utc_epoch_to_ist_dt(epoch: int) -> dt.datetime:
     return dt.datetime.fromtimestamp(epoch, tz=dt.timezone.utc).astimezone(IST)
 
+def nearest_strike(spot: float, step: int) -> int:
+    return int(round(spot / float(step)) * step)
+
 def nearest_50_strike(spot: float) -> int:
-    return int(round(spot / 50.0) * 50)
+    return nearest_strike(spot, 50)
+
+def quote_price(v: dict) -> Optional[float]:
+    price = v.get("lp") or v.get("last_price") or v.get("ltp") or v.get("open_price") or v.get("prev_close_price")
+    return float(price) if price is not None else None
+
+def last_expiry_weekday(y: int, m: int) -> dt.date:
+    nxt = dt.date(y + (m == 12), m % 12 + 1, 1)
+    d = nxt - dt.timedelta(days=1)
+    return d - dt.timedelta(days=(d.weekday() - EXPIRY_WEEKDAY) % 7)
+
+def expiry_code_for(day: dt.date) -> str:
+    """Monthly option code (e.g. 25SEP) live on `day`: rolls after the month's last EXPIRY_WEEKDAY."""
+    y, m = day.year, day.month
+    if day > last_expiry_weekday(y, m):
+        y, m = y + (m == 12), m % 12 + 1
+    return dt.date(y, m, 1).strftime("%y%b").upper()
+
+def expiry_datetime(code: str) -> dt.datetime:
+    """15:30 IST on the expiry day of a monthly code such as 25SEP."""
+    d = dt.datetime.strptime(code, "%y%b")
+    return IST.localize(dt.datetime.combine(last_expiry_weekday(d.year, d.month), dt.time(15, 30)))
+
+def parse_quotes(resp: dict) -> Dict[str, Tuple[float, dict]]:
+    """symbol -> (ltp, raw v) for every valid row of a (multi-symbol) quotes response."""
+    out: Dict[str, Tuple[float, dict]] = {}
+    for row in resp.get("d") or []:
+        v = row.get("v") or {}
+        sym = row.get("n") or v.get("symbol")
+        px = None if (v.get("s") == "error" or v.get("errmsg")) else quote_price(v)
+        if sym and px is not None:
+            out[sym] = (px, v)
+    return out
+
+class QuoteBoard:
+    """
+    Shared quote snapshot for several engines in one process: one batched quotes call per
+    cycle (QUOTE_BATCH_SIZE symbols per request) covers every index and open option.
+    DataClient.get_ltp reads from it and only falls back to its own quote when stale/missing.
+    """
+    def __init__(self, fyers, logger, max_age_sec: float = QUOTE_MAX_AGE_SEC, batch: int = QUOTE_BATCH_SIZE):
+        self.fyers = fyers
+        self.log = logger
+        self.max_age_sec = max_age_sec
+        self.batch = batch
+        self._px: Dict[str, Tuple[float, float, dict]] = {}  # symbol -> (ltp, monotonic ts, raw v)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def refresh(self, symbols: Iterable[str]) -> int:
+        syms = sorted(set(s for s in symbols if s))
+        n = 0
+        for i in range(0, len(syms), self.batch):
+            chunk = syms[i:i + self.batch]
+            try:
+                resp = self.fyers.quotes({"symbols": ",".join(chunk)})
+            except Exception as e:
+                self.log("QUOTES_ERR", reason=f"batch of {len(chunk)}: {str(e)[:120]}")
+                continue
+            self.calls += 1
+            if not isinstance(resp, dict) or resp.get("s") != "ok":
+                self.log("QUOTES_ERR", reason=f"batch of {len(chunk)}: {str(resp)[:120]}")
+                continue
+            now = time.monotonic()
+            with self._lock:
+                for sym, (px, v) in parse_quotes(resp).items():
+                    self._px[sym] = (px, now, v)
+                    n += 1
+        return n
+
+    def get(self, symbol: str) -> Optional[float]:
+        hit = self._px.get(symbol)
+        if hit is None or (time.monotonic() - hit[1]) > self.max_age_sec:
+            return None
+        return hit[0]
+
+    def raw(self, symbol: str) -> Optional[dict]:
+        hit = self._px.get(symbol)
+        return hit[2] if hit is not None else None
+
 
 class DataClient:
-    def __init__(self, fyers, logger):
+    def __init__(self, fyers, logger, instrument: Optional[Instrument] = None,
+                 board: Optional[QuoteBoard] = None, store: Optional[BarStore] = None):
         self.fyers = fyers
         self.log = logger
+        self.inst = instrument or default_instrument()
+        self.board = board  # shared quote snapshot (multi-underlying mode), else None
+        self.expiry_code = self.inst.expiry_code or expiry_code_for(ist_now().date())
         self._sym_cache = {}  # key: (expiry, strike, opt_type) -> symbol string
+        self.store = store or BarStore(BAR_STORE_DIR)  # completed sessions' 1m candles
+        self._seed_cache = {}  # key: (symbol, today) -> prior-session tail rows
+        self._ladder_centre: Optional[int] = None  # strike the greeks ladder was last quoted around
+        self._quotes: Dict[str, dict] = {}  # symbol -> last raw quote row (bid/ask/depth for fills.py)
+
+    def roll_day(self, expiry_code: str):
+        """Drop caches scoped to the previous session/expiry; the bar store stays warm."""
+        if expiry_code != self.expiry_code:
+            self.log("EXPIRY_ROLL", reason=f"{self.expiry_code} -> {expiry_code}")
+        self.expiry_code = expiry_code
+        self._sym_cache = {k: v for k, v in self._sym_cache.items() if k[0] == expiry_code}
+        today = ist_now().date().isoformat()
+        self._seed_cache = {k: v for k, v in self._seed_cache.items() if k[1] == today}
 
     # ---------- quotes / history ----------
     def quotes(self, symbol: str) -> dict:
         return self.fyers.quotes({"symbols": symbol})
 
     def get_ltp(self, symbol: str) -> float:
+        if self.board is not None:
+            px = self.board.get(symbol)
+            if px is not None:
+                return px
         resp = self.quotes(symbol)
         if resp.get("s") != "ok":
             raise RuntimeError(f"Quotes failed for {symbol}: {resp}")
@@ -35,12 +144,38 @@ class DataClient:
         v = d[0].get("v") or {}
         if v.get("s") == "error" or v.get("errmsg"):
             raise RuntimeError(f"Invalid symbol per broker for {symbol}: {v}")
-        price = v.get("lp") or v.get("last_price") or v.get("ltp") or v.get("open_price") or v.get("prev_close_price")
+        price = quote_price(v)
         if price is None:
             raise RuntimeError(f"LTP not available for {symbol}: {resp}")
-        return float(price)
+        self._quotes[symbol] = v
+        return price
+
+    def last_quote(self, symbol: str) -> Optional[dict]:
+        """Raw quote row behind the last get_ltp of `symbol` (no broker call)."""
+        if self.board is not None:
+            v = self.board.raw(symbol)
+            if v is not None:
+                return v
+        return self._quotes.get(symbol)
+
+    def quotes_many(self, symbols: List[str]) -> Dict[str, float]:
+        """LTPs for several symbols: from the shared board when all are fresh, else one batched call."""
+        if self.board is not None:
+            hits = {s: self.board.get(s) for s in symbols}
+            if all(v is not None for v in hits.values()):
+                return hits
+        resp = self.fyers.quotes({"symbols": ",".join(symbols)})
+        if not isinstance(resp, dict) or resp.get("s") != "ok":
+            raise RuntimeError(f"Quotes failed for {len(symbols)} symbols: {str(resp)[:200]}")
+        parsed = parse_quotes(resp)
+        self._quotes.update((s, v) for s, (_, v) in parsed.items())
+        return {s: px for s, (px, _) in parsed.items()}
 
     def history(self, symbol: str, resolution: str, range_from: str, range_to: str) -> List[list]:
+        return self._history(symbol, resolution, range_from, range_to)[1]
+
+    def _history(self, symbol: str, resolution: str, range_from: str, range_to: str) -> Tuple[bool, List[list]]:
+        """(answered, candles): answered is False on a broker/transport error, True for ok and no_data."""
         payload = {
             "symbol": symbol,
             "resolution": resolution,   # "1" or "D"
@@ -52,11 +187,11 @@ class DataClient:
         resp = self.fyers.history(payload)
         if not isinstance(resp, dict) or resp.get("s") not in ("ok", "no_data"):
             self.log("HISTORY_ERR", symbol=symbol, reason=str(resp))
-            return []
+            return False, []
         if resp.get("s") == "no_data":
             self.log("HISTORY_ERR", symbol=symbol, reason=str(resp))
-            return []
-        return resp.get("candles") or []
+            return True, []
+        return True, resp.get("candles") or []
 
     def get_prev_trading_close_strict(self, symbol: str) -> Tuple[Optional[str], Optional[float]]:
         today = ist_now().date()
@@ -74,14 +209,73 @@ class DataClient:
         day = ist_now().strftime("%Y-%m-%d")
         return self.history(symbol, "1", day, day)
 
+    def get_1m_day(self, symbol: str, day: str) -> List[list]:
+        """1m candles for a past session, served from the bar store once fetched."""
+        if day >= ist_now().strftime("%Y-%m-%d"):
+            return self.history(symbol, "1", day, day)
+        rows = self.store.get(symbol, day)
+        if rows is None:
+            ok, rows = self._history(symbol, "1", day, day)
+            if ok:  # empty answers (weekends, holidays) are stored too, so they are asked once
+                self.store.put(symbol, day, rows)
+        return rows
+
     def get_1m_last_trading(self, symbol: str, lookback_days=7) -> List[list]:
         for i in range(1, lookback_days + 1):
             ds = (ist_now().date() - dt.timedelta(days=i)).strftime("%Y-%m-%d")
-            d = self.history(symbol, "1", ds, ds)
+            d = self.get_1m_day(symbol, ds)
             if d:
                 return d
         return []
 
+    # ---------- cross-session warm-start ----------
+    def _prior_tail(self, symbol: str) -> List[list]:
+        today = ist_now().date()
+        key = (symbol, today.isoformat())
+        if key in self._seed_cache:
+            return self._seed_cache[key]
+        tail: List[list] = []
+        sessions = 0
+        for i in range(1, WARM_START_MAX_GAP_DAYS + 1):
+            if sessions >= WARM_START_MAX_SESSIONS or len(tail) >= WARM_START_MAX_BARS:
+                break
+            rows = self.get_1m_day(symbol, (today - dt.timedelta(days=i)).strftime("%Y-%m-%d"))
+            if rows:
+                tail = list(rows) + tail
+                sessions += 1
+        tail = tail[-WARM_START_MAX_BARS:]
+        self._seed_cache[key] = tail
+        if tail:
+            d0 = utc_epoch_to_ist_dt(tail[0][0]).date()
+            d1 = utc_epoch_to_ist_dt(tail[-1][0]).date()
+            self.log("WARM_START", symbol=symbol, reason=f"{len(tail)} seed bars from {d0}..{d1} ({sessions} sessions)")
+        else:
+            self.log("WARM_START", symbol=symbol, reason=f"no prior session within {WARM_START_MAX_GAP_DAYS}d; cold start")
+        return tail
+
+    def seed_rows(self, symbol: str, n_bars: int, before: Optional[int] = None,
+                  first_open: Optional[float] = None) -> List[list]:
+        """
+        Last n_bars 1m candles of the prior session(s) strictly before epoch `before`.
+        Gaps are handled explicitly:
+          - sessions older than WARM_START_MAX_GAP_DAYS are never used (stale)
+          - if today's open gaps more than WARM_START_GAP_RESET_PCT from the prior close,
+            the seed is dropped (regime break) and indicators cold-start as before
+          - the overnight hole itself is left as-is; resampled bins across it are empty and dropped
+        """
+        if not WARM_START_ENABLED or n_bars <= 0:
+            return []
+        tail = self._prior_tail(symbol)
+        if before is not None:
+            tail = [r for r in tail if r[0] < before]
+        if not tail:
+            return []
+        if first_open is not None and WARM_START_GAP_RESET_PCT is not None:
+            prev_close = float(tail[-1][4])
+            if prev_close and abs(first_open - prev_close) * 100.0 / prev_close > WARM_START_GAP_RESET_PCT:
+                return []
+        return tail[-n_bars:]
+
     # ---------- option symbol resolution ----------
     def _can_quote_symbol(self, symbol: str) -> bool:
         try:
@@ -95,8 +289,7 @@ class DataClient:
         v = d[0].get("v") or {}
         if v.get("s") == "error" or v.get("errmsg"):
             return False
-        price = v.get("lp") or v.get("last_price") or v.get("ltp") or v.get("open_price") or v.get("prev_close_price")
-        return price is not None
+        return quote_price(v) is not None
 
     def resolve_option_symbol(self, expiry_code: str, strike: int, opt_type: str) -> str:
         key = (expiry_code, int(strike), opt_type.upper())
@@ -104,13 +297,15 @@ class DataClient:
             return self._sym_cache[key]
 
         # Prefer NSE first for your account (based on your logs), then NFO
+        root = self.inst.option_root
         candidates = [
-            f"NSE:NIFTY{expiry_code}{int(strike)}{opt_type.upper()}",
-            f"NFO:NIFTY{expiry_code}{int(strike)}{opt_type.upper()}",
+            f"NSE:{root}{expiry_code}{int(strike)}{opt_type.upper()}",
+            f"NFO:{root}{expiry_code}{int(strike)}{opt_type.upper()}",
         ]
 
         # Also try nearby strikes if exact ATM isn’t quotable
-        OFFSETS = [0, -50, +50, -100, +100, -150, +150]
+        step = self.inst.strike_step
+        OFFSETS = [0, -step, +step, -2 * step, +2 * step, -3 * step, +3 * step]
         for off in OFFSETS:
             s = int(strike) + off
             for base in candidates:
@@ -124,7 +319,96 @@ class DataClient:
                     return sym
         raise RuntimeError(f"Could not resolve option: {expiry_code} {strike} {opt_type}")
 
+    def symbol_cache_rows(self) -> List[list]:
+        """Resolved option symbols as [expiry, strike, opt_type, symbol] rows (checkpoint)."""
+        return [[e, k, t, sym] for (e, k, t), sym in self._sym_cache.items()]
+
+    def restore_symbol_cache(self, rows: Iterable[list]) -> int:
+        """Re-seed resolved option symbols from symbol_cache_rows() output; returns how many."""
+        n = 0
+        for e, k, t, sym in rows:
+            self._sym_cache[(e, int(k), t)] = sym
+            n += 1
+        return n
+
+    def resolve_strike_ladder(self, spot: float, width: int = 3, workers: int = 4) -> int:
+        """Resolve CE/PE symbols for ATM +/- width strikes concurrently; returns count resolved."""
+        step = self.inst.strike_step
+        atm = nearest_strike(spot, step)
+        jobs = [(atm + k * step, t) for k in range(-width, width + 1) for t in ("CE", "PE")]
+        jobs = [(k, t) for k, t in jobs if (self.expiry_code, k, t) not in self._sym_cache]
+
+        def one(job):
+            try:
+                self.resolve_option_symbol(self.expiry_code, job[0], job[1])
+                return 1
+            except Exception:
+                return 0
+
+        if not jobs:
+            return 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+            return sum(ex.map(one, jobs))
+
     def pick_atm_symbol(self, side: str) -> str:
-        idx = self.get_ltp(INDEX_SYMBOL)
-        strike = nearest_50_strike(idx)
-        return self.resolve_option_symbol(EXPIRY_CODE, strike, side)
+        idx = self.get_ltp(self.inst.index_symbol)
+        strike = nearest_strike(idx, self.inst.strike_step)
+        return self.resolve_option_symbol(self.expiry_code, strike, side)
+
+    # ---------- strike selection ----------
+    def pick_entry_symbol(self, side: str) -> str:
+        """Entry strike per STRIKE_SELECT_MODE ("atm" | "delta" | "premium"); greeks failures fall back to ATM."""
+        if STRIKE_SELECT_MODE == "atm":
+            return self.pick_atm_symbol(side)
+        try:
+            return self.pick_greeks_symbol(side, STRIKE_SELECT_MODE)
+        except Exception as e:
+            self.log("STRIKE_PICK_ERR", reason=f"{STRIKE_SELECT_MODE} {side}: {str(e)[:120]}; using ATM")
+            return self.pick_atm_symbol(side)
+
+    def _side_ladder(self, centre: int, side: str) -> List[Tuple[int, str]]:
+        step = self.inst.strike_step
+        out, seen = [], set()
+        for k in range(-STRIKE_LADDER_WIDTH, STRIKE_LADDER_WIDTH + 1):
+            try:
+                sym = self.resolve_option_symbol(self.expiry_code, centre + k * step, side)
+            except Exception:
+                continue
+            if sym not in seen:  # the resolver may fall back to a neighbouring strike
+                seen.add(sym)
+                out.append((int(sym.rsplit(self.expiry_code, 1)[1][:-2]), sym))
+        return out
+
+    def pick_greeks_symbol(self, side: str, mode: str) -> str:
+        """
+        One batched quote of index + side ladder, IV/delta for every strike at once (greeks.py),
+        then the strike nearest TARGET_DELTA ("delta") or inside PREMIUM_BAND_INR ("premium").
+        The ladder is re-centred (one more quote) only when spot has moved more than a strike.
+        """
+        idx_sym, step = self.inst.index_symbol, self.inst.strike_step
+        centre = self._ladder_centre
+        if centre is None:
+            centre = nearest_strike(self.get_ltp(idx_sym), step)
+        for _ in range(2):
+            ladder = self._side_ladder(centre, side)
+            px = self.quotes_many([idx_sym] + [s for _, s in ladder])
+            spot = px.get(idx_sym)
+            if spot is None:
+                raise RuntimeError(f"no index quote for {idx_sym}")
+            atm = nearest_strike(spot, step)
+            if abs(atm - centre) <= step:
+                break
+            centre = atm
+        self._ladder_centre = centre
+
+        rows = [(k, s, px[s]) for k, s in ladder if s in px]
+        if not rows:
+            raise RuntimeError("no ladder quotes")
+        T = max((expiry_datetime(self.expiry_code) - ist_now()).total_seconds(), 3600.0) / (365.0 * 86400.0)
+        pick = select_strike(spot, np.array([r[0] for r in rows]), np.array([r[2] for r in rows]), T,
+                             RISK_FREE_RATE, side.upper() == "CE",
+                             target_delta=TARGET_DELTA if mode == "delta" else None,
+                             band=PREMIUM_BAND_INR if mode == "premium" else None)
+        if pick is None:
+            raise RuntimeError(f"no strike qualifies ({mode})")
+        return rows[pick[0]][1]
@@ -0,0 +1,106 @@
+# diagnostics.py
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Why a core entry is not taken, per side. Bits are stable: they also go into the log's extra column.
+NO_BREAK        = 1 << 0
+RSI_BLOCK       = 1 << 1
+DUPLICATE_CORE  = 1 << 2
+NOT_ARMED       = 1 << 3
+DAILY_LOSS_HIT  = 1 << 4
+COOLDOWN        = 1 << 5
+MAX_CONCURRENT  = 1 << 6
+PROJECTED_RISK  = 1 << 7
+
+_NAMES = [
+    (NO_BREAK, None),  # side-specific text below
+    (RSI_BLOCK, "rsi_block"),
+    (DUPLICATE_CORE, "duplicate_core"),
+    (NOT_ARMED, "not_armed"),
+    (DAILY_LOSS_HIT, "daily_loss_hit"),
+    (COOLDOWN, "cooldown"),
+    (MAX_CONCURRENT, "max_concurrent"),
+    (PROJECTED_RISK, "projected_risk_breach"),
+]
+_NO_BREAK_TEXT = {"CE": "no_breakout_above_buffer", "PE": "no_breakdown_below_buffer"}
+
+
+@dataclass(frozen=True)
+class TickState:
+    """Everything the diagnostics need, taken from memory the tick already holds (no broker calls)."""
+    idx: float
+    rsi: Optional[float]
+    or_high: Optional[float]
+    or_low: Optional[float]
+    hi_buf: Optional[float]
+    lo_buf: Optional[float]
+    rsi_ok: Dict[str, bool]              # side -> ORB RSI filter passes
+    armed: Dict[str, bool]
+    core_open: Dict[str, bool]           # side -> a core position is already open
+    daily_loss_hit: bool
+    cooldown_sec: int
+    n_open: int
+    projected_ok: Dict[str, Optional[bool]] = field(default_factory=dict)  # None = no premium estimate yet
+    mtm: float = 0.0
+    at_sl: float = 0.0
+
+
+def block_mask(s: TickState, side: str, prevent_duplicate: bool = True, rearm_on_pullback: bool = True,
+               max_concurrent: int = 2) -> int:
+    if side == "CE":
+        raw = s.hi_buf is not None and s.idx > s.hi_buf
+    else:
+        raw = s.lo_buf is not None and s.idx < s.lo_buf
+    m = 0
+    if not raw:
+        m |= NO_BREAK
+    elif not s.rsi_ok.get(side, False):
+        m |= RSI_BLOCK
+    if prevent_duplicate and s.core_open.get(side):
+        m |= DUPLICATE_CORE
+    if rearm_on_pullback and not s.armed.get(side, True):
+        m |= NOT_ARMED
+    if s.daily_loss_hit:
+        m |= DAILY_LOSS_HIT
+    if s.cooldown_sec > 0:
+        m |= COOLDOWN
+    if s.n_open >= max_concurrent:
+        m |= MAX_CONCURRENT
+    if raw and s.projected_ok.get(side) is False:
+        m |= PROJECTED_RISK
+    return m
+
+
+def mask_text(mask: int, side: str) -> str:
+    out = [(_NO_BREAK_TEXT[side] if bit == NO_BREAK else name) for bit, name in _NAMES if mask & bit]
+    return ", ".join(out) if out else "ok"
+
+
+def diag_rows(s: TickState, masks: Dict[str, int]) -> List[Tuple[str, str, str]]:
+    """(event, reason, extra) rows for DIAG_NO_ENTRY."""
+    rsi = f"{s.rsi}" if s.rsi is not None else "NA"
+    return [("DIAG_NO_ENTRY", f"{side} blocked: {mask_text(m, side)} | IDX={s.idx:.2f} RSI={rsi}", f"mask=0x{m:02x}")
+            for side, m in masks.items()]
+
+
+def snapshot_rows(s: TickState, positions, marks) -> List[Tuple[str, str]]:
+    """(event, reason) rows for SNAPSHOT / SNAPSHOT_POS; marks(p) -> last LTP or None."""
+    f = lambda v: f"{v:.2f}" if v is not None else "NA"
+    head = (
+        f"IDX={s.idx:.2f} ORH={f(s.or_high)} ORL={f(s.or_low)} "
+        f"HI_BUF={f(s.hi_buf)} LO_BUF={f(s.lo_buf)} "
+        f"RSI={f(s.rsi)} "
+        f"Armed(L/S)={s.armed.get('CE')}/{s.armed.get('PE')} "
+        f"CD={s.cooldown_sec}s OpenPos={s.n_open} "
+        f"MTM={s.mtm:.2f} AtSL={s.at_sl:.2f}"
+    )
+    rows = [("SNAPSHOT", head)]
+    for p in positions:
+        cp = marks(p)
+        rows.append(("SNAPSHOT_POS",
+                     f"{'CORE' if p.is_core else 'SCALP'} {p.side} [{p.symbol}] "
+                     f"EP={p.entry_price:.2f} CP={f(cp) if cp is not None else 'nan'} "
+                     f"SL={p.sl_price:.2f} TP={p.tp_price:.2f}"))
+    if not positions:
+        rows.append(("SNAPSHOT_POS", "None"))
+    return rows
@@ -1,18 +1,19 @@
 # engine.py
+import os
+import copy
 import time
 import datetime as dt
 from typing import Optional, List
-
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 from config import (
     # IDs / symbols / session
-    INDEX_SYMBOL, IST,
-    ORB_START_IST, ORB_END_IST, SQUARE_OFF_IST,
+    IST,
+    ORB_END_IST, SQUARE_OFF_IST,
     START_IMMEDIATELY, USE_YDAY_WHEN_TODAY_EMPTY,
 
     # Trading & risk
-    LOT_SIZE, COOLDOWN_SEC, MAX_CONCURRENT_POS,
+    COOLDOWN_SEC, MAX_CONCURRENT_POS,
     ALLOW_OPPOSITE_IF_SAFE, MAX_DAILY_LOSS_INR, COST_PER_SIDE_INR,
     INIT_SL_PCT, INIT_TP_PCT, TRAIL_STEPS, DD_HARD_DROP_PCT,
     TIME_BASED_EXIT_MIN, MOMENTUM_FAST_MIN, SLOW_PROFIT_PCT, REDUCED_TP_PCT,
@@ -26,6 +27,31 @@ from config import (
 
     # Snapshots/diagnostics
     SNAPSHOT_INTERVAL_SEC, ENABLE_DIAGNOSTICS, ENABLE_MOMENTUM_LOGS, RSI_HYSTERESIS,
+
+    # Decisiveness / impulse exit
+    RSI_SLOPE_MIN_UP, RSI_SLOPE_MIN_DOWN,
+    IMPULSE_WINDOW_SEC, IMPULSE_WIN_PCT, IMPULSE_LOSS_PCT,
+
+    # Checkpoint / resume
+    LOG_DIR, CHECKPOINT_ENABLED, CHECKPOINT_MIN_INTERVAL_SEC, RESUME_FROM_CHECKPOINT,
+
+    # Persistent service mode
+    AUTO_ROLL_EXPIRY, SERVICE_WAKE_IST, TICK_SLEEP_SEC,
+
+    # Pre-market warm-up / cross-session seeding
+    WARM_START_ENABLED, BAR_REFRESH_RETRY_SEC,
+
+    # Strategy registry / executor
+    STRATEGIES, STRATEGY_WORKERS, STRATEGY_TIMEOUT_SEC,
+    WARMUP_ENABLED, WARMUP_KEEPALIVE_SEC, WARMUP_LADDER_WIDTH, WARMUP_THREADS,
+
+    # Strike selection
+    STRIKE_SELECT_MODE, STRIKE_LADDER_WIDTH,
+    DAILY_LOSS_INCLUDES_MTM,
+
+    # Order execution
+    EXEC_SQUAREOFF_WAIT_SEC, EXEC_BROKER_STOPS, EXEC_PROTECTED_TICK_SLEEP_SEC,
+    FILL_MODEL_ENABLED, ADAPTIVE_POLL_ENABLED, EXIT_PATHS_RECORD,
 )
 
 # ---- optional config fallbacks (if not added to config.py yet) ----
@@ -70,28 +96,88 @@ from config import (
     SCALP_ENABLED, SCALP_TP_PCT, SCALP_SL_PCT, SCALP_MAX_HOLD_MIN, SCALP_COOLDOWN_SEC, RSI_SLOPE_BARS
 )
 
-from models import Position
+from models import Position, MarketSnapshot
+from instruments import Instrument, default_instrument
+from risk import RiskBook, entry_gate, scalp_gate, projected_ok
+from portfolio import Portfolio
+from diagnostics import TickState, block_mask
+from metrics import Metrics
+from execution import OrderManager, BUY, SELL, STOP_MARKET, tick_round
+from fills import FillModel, fees
+from scheduler import PollScheduler
+from exit_optimizer import record_exit_paths
+from events import BUS, publish, pos_state_row, Enter, Exit, SLMoved, TPAdjusted, Signal, Diag, Snapshot
+import profiler
+from checkpoint import Checkpointer, position_to_dict, position_from_dict, ts_or_none
 from summary import summarize
-from logging_utils import init_csv, logger_row as log, ist_now as now_ist
-from data import DataClient, utc_epoch_to_ist_dt
-from indicators import compute_rsi_from_1m
+from logging_utils import init_csv, rotate_log, logger_row as log, logger_rows as log_rows, ist_now as now_ist
+from data import DataClient, expiry_code_for
+from bars import BarAggregator
+from indicators import compute_rsi
 from strategy.orb import ORBStrategy
-from strategy.bb_scalp import BBScalp
-from strategy.supertrend_trend import SupertrendTrend
-from strategy.vwap_reversion import VWAPReversion
+from strategy.registry import build_strategies
+from strategy.executor import StrategyExecutor
 from collections import deque
 
+
 class Engine:
-    def __init__(self, fyers):
+    def __init__(self, fyers, instrument: Optional[Instrument] = None,
+                 data_client: Optional[DataClient] = None, risk: Optional[RiskBook] = None,
+                 metrics: Optional[Metrics] = None, orders: Optional[OrderManager] = None):
         init_csv()
 
         self.fyers = fyers
-        self.dc = DataClient(fyers, log)
+        self.inst = instrument or default_instrument()
+        self.dc = data_client or DataClient(fyers, log, self.inst)
+        self.risk = risk or RiskBook()  # shared across underlyings for the combined daily-loss gate
+        self.metrics = metrics  # live /metrics endpoint (metrics.py); None = off
+        self.orders = orders    # broker order path (execution.py); None = fill at LTP in-process
+        self.fills = FillModel(lot_size=self.inst.lot_size) if FILL_MODEL_ENABLED else None  # paper fills + fees
+        self.sched = PollScheduler() if ADAPTIVE_POLL_ENABLED else None  # per-symbol poll cadence
+        if EXIT_PATHS_RECORD:  # premium path of every closed position, for exit_optimizer.py
+            BUS.subscribe("exit_paths", record_exit_paths, kinds=(Exit,))
         self.orb = ORBStrategy(self.dc, log)
 
+        # Shared multi-timeframe bars for the index (1m/3m/5m/15m, fed once per closed minute)
+        self.bars = BarAggregator(self.inst.index_symbol, timeframes=(1, 3, 5, 15, RSI_TIMEFRAME_MIN))
+        self._last_bar_fetch = 0.0
+        self.bars.subscribe(RSI_TIMEFRAME_MIN, self._on_rsi_bar)
+
+        # BB-Scalp + secondary strategies (stateless across days; kept warm in service mode)
+        # Built from config.STRATEGIES via the registry, cheapest first; each declares its data needs
+        self.strategies = build_strategies(STRATEGIES, self.dc, log, self.inst.index_symbol, self.bars)
+        for s in self.strategies:
+            if set(s.symbols) - {self.inst.index_symbol}:
+                raise ValueError(f"{s.name}: symbols {s.symbols} not served by this engine")
+            for tf in s.timeframes:
+                self.bars.subscribe(tf, s.on_bar)
+        self.scalp_strats = [s for s in self.strategies if s.route == "scalp"]
+        self.strats = [s for s in self.strategies if s.route != "scalp"]
+        self.seed_bars = max([(RSI_PERIOD + 5 + 1) * RSI_TIMEFRAME_MIN] + [s.warmup_bars for s in self.strategies])
+        self.strat_skips = 0  # evaluations skipped by cheap gates (this session)
+        self.executor = StrategyExecutor(log, STRATEGY_WORKERS, STRATEGY_TIMEOUT_SEC)
+        # delta/premium selection quotes a wider ladder; resolve all of it during warm-up
+        self.ladder_width = WARMUP_LADDER_WIDTH if STRIKE_SELECT_MODE == "atm" \
+            else max(WARMUP_LADDER_WIDTH, STRIKE_LADDER_WIDTH)
+        self.portfolio = Portfolio(COST_PER_SIDE_INR)  # open-position MTM, marked from each tick's quotes
+
+        self.reset_session_state()
+        self.session_header()
+
+    def reset_session_state(self):
+        """(Re)initialize everything that is scoped to one trading day."""
         self.positions: List[Position] = []
         self.realized_pnl = 0.0
+        self.risk.update(self.inst.name, 0.0)
+        self.portfolio.reset()
+        self.publish_open()
         self.cooldown_until: Optional[dt.datetime] = None
+        self.last_idx: Optional[float] = None
+        self._pending_entries = {}  # order tag -> working entry Order
+        self._exiting = {}          # id(position) -> working exit Order
+        self._protect = {}          # id(position) -> {"sl": Order} exchange-side stop
+        self._exit_after_cancel = {}  # id(position) -> exit reason, waiting for its legs to cancel
+        self._exit_batch: Optional[list] = None  # (position, reason) collected while tick() manages positions
 
         # EoD stats
         self.trades = []
@@ -104,10 +190,10 @@ class Engine:
         self.last_rsi_regime: Optional[str] = None  # 'bull' | 'bear' | 'neutral' | 'unknown'
         self.last_price_zone: Optional[str] = None  # 'above_hi' | 'inside_or' | 'below_lo'
         self._last_diag_ts: Optional[dt.datetime] = None
-        self._last_diag_reasons = {"CE": None, "PE": None}
+        self._last_diag_reasons = {"CE": None, "PE": None}  # side -> last logged block mask
+        self._est_entry = {"CE": None, "PE": None}  # last premium estimate per side (estimate_entry)
 
-        # BB-Scalp strategy + its cooldown
-        self.bb_scalp = BBScalp(self.dc, log, INDEX_SYMBOL)
+        # BB-Scalp cooldown
         self.scalp_cooldown_until: Optional[dt.datetime] = None
 
         # Optional time-based re-arm tracker (in addition to your pullback/OR-band logic)
@@ -119,21 +205,35 @@ class Engine:
 
         self.rsi_window = deque(maxlen=RSI_SLOPE_BARS)  # store last N RSI prints
 
-        self.strats = [
-            SupertrendTrend(self.dc, log, INDEX_SYMBOL, period=10, multiplier=3.0, tf_min=5),
-            VWAPReversion(self.dc, log, INDEX_SYMBOL, band_k=2.0, lookback_min=120),
-        ]
-
-        # ---- Auth check (tolerant) ----
-        prof = {}
-        prof_ok = False
-        try:
-            prof = self.fyers.get_profile()
-            prof_ok = isinstance(prof, dict) and prof.get("s") == "ok"
-        except Exception as e:
-            prof = {"s": "error", "message": f"exception: {e}"}
-
-        q = self.fyers.quotes({"symbols": INDEX_SYMBOL})
+        # ORB levels / arming
+        self.orb.or_high = self.orb.or_low = None
+        self.orb.entry_hi_buf = self.orb.entry_lo_buf = None
+        self.orb.long_armed = self.orb.short_armed = True
+
+        # Crash-safe state checkpoint (one file per trading day)
+        self.rsi_val: Optional[float] = None
+        self.ckpt: Optional[Checkpointer] = None
+        self._ckpt_key: Optional[tuple] = None
+        if CHECKPOINT_ENABLED:
+            path = os.path.join(LOG_DIR, f"engine_state_{self.inst.name}_{now_ist().strftime('%Y%m%d')}.json")
+            self.ckpt = Checkpointer(path, CHECKPOINT_MIN_INTERVAL_SEC)
+
+    def session_header(self):
+        # ---- Auth check (tolerant) + prev close, issued concurrently ----
+        def _profile():
+            try:
+                return self.fyers.get_profile()
+            except Exception as e:
+                return {"s": "error", "message": f"exception: {e}"}
+
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            f_prof = ex.submit(_profile)
+            f_q = ex.submit(self.fyers.quotes, {"symbols": self.inst.index_symbol})
+            f_prev = ex.submit(self.dc.get_prev_trading_close_strict, self.inst.index_symbol)
+            prof = f_prof.result()
+            q = f_q.result()
+            prev_date, prev_close = f_prev.result()
+        prof_ok = isinstance(prof, dict) and prof.get("s") == "ok"
         quotes_ok = isinstance(q, dict) and q.get("s") == "ok"
 
         if quotes_ok:
@@ -145,131 +245,558 @@ class Engine:
             raise RuntimeError(f"Auth/quotes failed: prof={prof} quotes={q}")
 
         # ---- Session header: previous close ----
-        prev_date, prev_close = self.dc.get_prev_trading_close_strict(INDEX_SYMBOL)
+        self.prev_close = prev_close
         log(
-            "SESSION_START",
+            "SESSION_START", symbol=self.inst.index_symbol,
             reason=f"Today={now_ist().date().isoformat()} PrevCloseDate={prev_date or 'NA'} "
-                   f"PrevNIFTYClose={f'{prev_close:.2f}' if prev_close is not None else 'NA'}",
+                   f"Prev{self.inst.name}Close={f'{prev_close:.2f}' if prev_close is not None else 'NA'}",
             day_pnl=self.realized_pnl
         )
 
+    # ============ Checkpoint / resume ============
+
+    def state_dict(self) -> dict:
+        return {
+            "day": now_ist().date().isoformat(),
+            "positions": [position_to_dict(p) for p in self.positions],
+            "realized_pnl": self.realized_pnl,
+            "cooldown_until": self.cooldown_until,
+            "scalp_cooldown_until": self.scalp_cooldown_until,
+            "orb": {
+                "or_high": self.orb.or_high, "or_low": self.orb.or_low,
+                "entry_hi_buf": self.orb.entry_hi_buf, "entry_lo_buf": self.orb.entry_lo_buf,
+                "long_armed": self.orb.long_armed, "short_armed": self.orb.short_armed,
+            },
+            "rsi_val": self.rsi_val,
+            "rsi_window": list(self.rsi_window),
+            "last_core_entry_time": self._last_core_entry_time,
+            "last_scalp_entry_ts": self.last_scalp_entry_ts,
+            "last_scalp_entry_ts_by_side": self.last_scalp_entry_ts_by_side,
+            "n_trades": len(self.trades),  # the trades themselves are in the checkpoint's journal
+            "equity": self.equity, "equity_peak": self.equity_peak, "max_drawdown": self.max_drawdown,
+            "sym_cache": self.dc.symbol_cache_rows(),
+        }
+
+    def state_key(self) -> tuple:
+        """
+        Cheap fingerprint of what moves state_dict between forced writes (trailing, arming, RSI,
+        cooldowns); entries/exits force a write anyway.
+        """
+        return (len(self.trades), self.realized_pnl, self.cooldown_until, self.scalp_cooldown_until,
+                self.orb.long_armed, self.orb.short_armed, self.orb.entry_hi_buf, self.orb.entry_lo_buf,
+                self.rsi_val, tuple((id(p), p.qty, p.sl_price, p.tp_price, p.peak_price, p.last_trail_level_hit)
+                                    for p in self.positions))
+
+    def checkpoint(self, force: bool = False):
+        """Throttle, then the dirty check, then serialize: most ticks stop at the first test."""
+        if self.ckpt is None or not self.ckpt.due(force):
+            return
+        key = self.state_key()
+        if not force and key == self._ckpt_key:
+            return
+        try:
+            self.ckpt.save(self.state_dict(), force=force)
+            self._ckpt_key = key
+        except Exception as e:
+            log("CKPT_ERR", reason=str(e)[:120], day_pnl=self.realized_pnl)
+
+    def resume_from_checkpoint(self) -> bool:
+        """Restore today's checkpoint (if any). Returns True when ORB levels were restored."""
+        if self.ckpt is None or not RESUME_FROM_CHECKPOINT:
+            return False
+        t0 = time.perf_counter()
+        st = self.ckpt.load()
+        if not st or st.get("day") != now_ist().date().isoformat():
+            return False
+        orb = st.get("orb") or {}
+        if orb.get("entry_hi_buf") is None or orb.get("entry_lo_buf") is None:
+            return False
+
+        for k in ("or_high", "or_low", "entry_hi_buf", "entry_lo_buf", "long_armed", "short_armed"):
+            setattr(self.orb, k, orb[k])
+        self.positions = [position_from_dict(d) for d in st.get("positions", [])]
+        self.realized_pnl = float(st.get("realized_pnl", 0.0))
+        self.risk.update(self.inst.name, self.realized_pnl)
+        for p in self.positions:
+            self.portfolio.open(p, p.peak_price)  # re-marked on the first tick
+        self.publish_open()
+        self.cooldown_until = ts_or_none(st.get("cooldown_until"))
+        self.scalp_cooldown_until = ts_or_none(st.get("scalp_cooldown_until"))
+        self.rsi_val = st.get("rsi_val")
+        self.rsi_window.clear()
+        self.rsi_window.extend(st.get("rsi_window", []))
+        for side in ("CE", "PE"):
+            self._last_core_entry_time[side] = ts_or_none((st.get("last_core_entry_time") or {}).get(side))
+            self.last_scalp_entry_ts_by_side[side] = ts_or_none((st.get("last_scalp_entry_ts_by_side") or {}).get(side))
+        self.last_scalp_entry_ts = ts_or_none(st.get("last_scalp_entry_ts"))
+        self.trades = st["trades"] if "trades" in st else self.ckpt.load_trades(int(st.get("n_trades", 0)))
+        for t in self.trades:
+            t["entry_time"] = ts_or_none(t.get("entry_time"))
+            t["exit_time"] = ts_or_none(t.get("exit_time"))
+        self.equity = float(st.get("equity", 0.0))
+        self.equity_peak = float(st.get("equity_peak", 0.0))
+        self.max_drawdown = float(st.get("max_drawdown", 0.0))
+        self.dc.restore_symbol_cache(st.get("sym_cache", []))
+
+        log("RESUME", reason=f"Restored {len(self.positions)} pos, {len(self.trades)} trades, "
+                             f"ORH={self.orb.or_high:.2f} ORL={self.orb.or_low:.2f} "
+                             f"in {(time.perf_counter() - t0) * 1000:.1f}ms",
+            day_pnl=self.realized_pnl)
+        for p in self.positions:
+            self.log_pos_state(p, p.peak_price, tag="RESUME_POS")
+        if self.orders is not None and self.positions:
+            self.restore_protection()
+        return True
+
+    def restore_protection(self):
+        """
+        Orders mode after a restart: the previous process's working orders on the resumed
+        symbols are cancelled (nothing tracks them; a stale stop would sell on top of a new
+        one), then every resumed position gets its exchange stop again.
+        """
+        try:
+            n = self.orders.cancel_stale(p.symbol for p in self.positions)
+        except Exception as e:
+            log("ORDER_ERR", reason=f"resume: order book read failed ({str(e)[:120]}); client-side SL/TP only",
+                day_pnl=self.realized_pnl)
+            return
+        if n:
+            log("ORDER_CANCEL", reason=f"resume: cancelled {n} working orders left by the previous run",
+                day_pnl=self.realized_pnl)
+        for p in self.positions:
+            self.protect(p)
+
+    # ============ Pre-market warm-up ============
+
+    def warm_up(self):
+        """
+        Front-load the expensive setup into the pre-ORB wait: the warm-start seed (prior
+        sessions' 1m, fetched once into the bar store) and the option strike ladder around
+        the current index, fetched concurrently. Today's 1m is left to start_session, which
+        needs it complete up to ORB end.
+        """
+        t0 = time.perf_counter()
+        try:
+            spot = self.dc.get_ltp(self.inst.index_symbol)
+        except Exception:
+            spot = self.prev_close
+        with ThreadPoolExecutor(max_workers=max(1, WARMUP_THREADS)) as ex:
+            f_seed = ex.submit(self.dc.seed_rows, self.inst.index_symbol, self.seed_bars) if WARM_START_ENABLED else None
+            f_ladder = ex.submit(self.dc.resolve_strike_ladder, spot, self.ladder_width, WARMUP_THREADS) \
+                if spot else None
+            resolved = f_ladder.result() if f_ladder else 0
+            seed_n = len(f_seed.result()) if f_seed else 0
+        log("WARMUP", reason=f"seed_bars={seed_n} "
+                             f"ladder+={resolved} spot={spot if spot else 'NA'} "
+                             f"in {(time.perf_counter() - t0):.2f}s",
+            day_pnl=self.realized_pnl)
+
+    def _keepalive(self):
+        # A light quote keeps the broker HTTP connection warm; re-resolve the ladder if ATM moved
+        try:
+            spot = self.dc.get_ltp(self.inst.index_symbol)
+            self.dc.resolve_strike_ladder(spot, self.ladder_width, WARMUP_THREADS)
+        except Exception:
+            pass
+
     # ============ Helpers / position ops ============
 
     def log_pos_state(self, pos: Position, ltp: float, tag: str, extra: str = ""):
-        snap = f"EP={pos.entry_price:.2f} CP={ltp:.2f} SL={pos.sl_price:.2f} TP={pos.tp_price:.2f}"
-        if extra:
-            snap += f" | {extra}"
-        log(tag, symbol=pos.symbol, side=pos.side, price=ltp, qty=pos.qty, reason=snap, day_pnl=self.realized_pnl)
+        log(**pos_state_row(tag, pos.symbol, pos.side, pos.qty, pos.entry_price, ltp, pos.sl_price, pos.tp_price,
+                            self.realized_pnl, extra))
 
     def create_position(self, side: str, is_core=True, note=""):
-        symbol = self.dc.pick_atm_symbol(side)
-        ltp = self.dc.get_ltp(symbol)
-        entry = ltp
-        sl = entry * (1 - INIT_SL_PCT / 100.0)
-        tp = entry * (1 + INIT_TP_PCT / 100.0)
-        pos = Position(
-            symbol=symbol, side=side, entry_time=now_ist(),
-            entry_price=entry, qty=LOT_SIZE, sl_price=sl, tp_price=tp,
-            peak_price=entry, is_core=is_core, notes=note
-        )
-        self.positions.append(pos)
-        log("ENTER", symbol=symbol, side=side, price=entry, qty=LOT_SIZE,
-            reason=f"New {'CORE' if is_core else 'SCALP'}", day_pnl=self.realized_pnl)
-        self.log_pos_state(pos, ltp, tag="ENTER_STATE")
+        self.enter(side, is_core, note, INIT_SL_PCT, INIT_TP_PCT)
         if is_core:
             self._last_core_entry_time[side] = now_ist()
 
     def create_scalp_position(self, side: str):
-        symbol = self.dc.pick_atm_symbol(side)
+        self.enter(side, False, "SCALP", SCALP_SL_PCT, SCALP_TP_PCT)
+        # stamp scalp entry times
+        now = now_ist()
+        self.last_scalp_entry_ts = now
+        self.last_scalp_entry_ts_by_side[side] = now
+
+    def enter(self, side: str, is_core: bool, note: str, sl_pct: float, tp_pct: float):
+        """Open at the LTP (sim) or submit a market buy whose fill opens the position (orders)."""
+        symbol = self.dc.pick_entry_symbol(side)
         ltp = self.dc.get_ltp(symbol)
-        entry = ltp
-        sl = entry * (1 - SCALP_SL_PCT / 100.0)
-        tp = entry * (1 + SCALP_TP_PCT / 100.0)
+        if self.orders is None:
+            px = ltp if self.fills is None else \
+                self.fills.price(BUY, ltp, self.inst.lot_size, self.dc.last_quote(symbol))
+            self.open_position(symbol, side, px, self.inst.lot_size, is_core, note, sl_pct, tp_pct, ltp)
+            return
+        o = self.orders.submit(self.orders.new_order(
+            self.inst.name, symbol, BUY, self.inst.lot_size, "entry", ltp,
+            meta={"side": side, "is_core": is_core, "note": note, "sl_pct": sl_pct, "tp_pct": tp_pct}))
+        self._pending_entries[o.tag] = o
+        log("ORDER_SUBMIT", symbol=symbol, side=side, price=ltp, qty=o.qty,
+            reason=f"entry {'CORE' if is_core else 'SCALP'}", extra=o.tag, day_pnl=self.realized_pnl)
+
+    def open_position(self, symbol: str, side: str, entry: float, qty: int, is_core: bool, note: str,
+                      sl_pct: float, tp_pct: float, ltp: float):
+        sl = entry * (1 - sl_pct / 100.0)
+        tp = entry * (1 + tp_pct / 100.0)
         pos = Position(
             symbol=symbol, side=side, entry_time=now_ist(),
-            entry_price=entry, qty=LOT_SIZE, sl_price=sl, tp_price=tp,
-            peak_price=entry, is_core=False, notes="SCALP"
+            entry_price=entry, qty=qty, sl_price=sl, tp_price=tp,
+            peak_price=entry, is_core=is_core, notes=note
         )
         self.positions.append(pos)
-        log("ENTER", symbol=symbol, side=side, price=entry, qty=LOT_SIZE,
-            reason="New SCALP", day_pnl=self.realized_pnl)
-        self.log_pos_state(pos, ltp, tag="ENTER_STATE")
-        # stamp scalp entry times
-        now = now_ist()
-        self.last_scalp_entry_ts = now
-        self.last_scalp_entry_ts_by_side[side] = now
+        self.portfolio.open(pos, ltp)
+        self.publish_open()
+        publish(Enter(pos.entry_time, symbol, side, entry, qty, is_core, ltp, sl, tp, self.realized_pnl))
+        self.checkpoint(force=True)
+        return pos
 
     def exit_position(self, pos: Position, reason: str):
+        if self._exit_batch is not None:  # tick() is managing positions: exit with the rest of the tick
+            self._exit_batch.append((pos, reason))
+            return
+        if self.orders is None:
+            ltp = self.dc.get_ltp(pos.symbol)
+            px = ltp if self.fills is None else \
+                self.fills.price(SELL, ltp, pos.qty, self.dc.last_quote(pos.symbol))
+            self.close_position(pos, px, reason)
+            return
+        if self.exit_pending(pos):
+            return  # exit already working
+        if self._protect.get(id(pos)):
+            # never sell on top of live stops: cancel them first, market out once they are gone
+            self._exit_after_cancel[id(pos)] = reason
+            for o in self._protect[id(pos)].values():
+                self.orders.cancel(o)
+            return
+        ref = self.portfolio.ltp(pos) or pos.entry_price
+        o = self.orders.submit(self.orders.new_order(
+            self.inst.name, pos.symbol, SELL, pos.qty, "exit", ref, meta={"pos": pos, "reason": reason}))
+        self._exiting[id(pos)] = o
+        log("ORDER_SUBMIT", symbol=pos.symbol, side=pos.side, price=ref, qty=pos.qty,
+            reason=f"exit: {reason}", extra=o.tag, day_pnl=self.realized_pnl)
+
+    def close_position(self, pos: Position, price: float, reason: str, qty: Optional[int] = None):
+        """Book an exit of `qty` (default all) at `price`; a partial exit leaves the rest open."""
+        self.close_many([(pos, price, reason, qty)])
+
+    def close_many(self, exits: list):
+        """
+        Book exits [(pos, price, reason, qty or None)] in one pass: PnL, cooldowns, trades and
+        equity/drawdown per exit, then one risk update, state publish and checkpoint.
+        """
         exit_time = now_ist()
-        ltp = self.dc.get_ltp(pos.symbol)
-        self.log_pos_state(pos, ltp, tag="EXIT_STATE", extra=f"reason={reason}")
-
-        pnl = (ltp - pos.entry_price) * pos.qty
-        pnl -= 2 * COST_PER_SIDE_INR
-        self.realized_pnl += pnl
-        self.positions.remove(pos)
-
-        # Cooldowns
-        self.cooldown_until = exit_time + dt.timedelta(seconds=COOLDOWN_SEC)
-        if not pos.is_core:
-            self.scalp_cooldown_until = exit_time + dt.timedelta(seconds=SCALP_COOLDOWN_SEC)
-
-        log("EXIT", symbol=pos.symbol, side=pos.side, price=ltp, qty=pos.qty,
-            reason=reason, pnl=pnl, day_pnl=self.realized_pnl)
-
-        # EoD tracking
-        hold_min = (exit_time - pos.entry_time).total_seconds() / 60.0
-        self.trades.append({
-            "pnl": pnl, "side": pos.side, "core": pos.is_core, "reason": reason,
-            "hold_min": hold_min, "entry_time": pos.entry_time, "exit_time": exit_time,
-            "symbol": pos.symbol
-        })
-        self.equity += pnl
-        if self.equity > self.equity_peak:
-            self.equity_peak = self.equity
-        dd = self.equity_peak - self.equity
-        if dd > self.max_drawdown:
-            self.max_drawdown = dd
+        for pos, price, reason, qty in exits:
+            held = pos.qty
+            qty = pos.qty if qty is None else min(qty, pos.qty)
+
+            pnl = (price - pos.entry_price) * qty
+            if FILL_MODEL_ENABLED:
+                pnl -= fees(pos.entry_price, price, qty, buy_share=qty / pos.entry_qty)
+            else:  # costs are per position: a split exit pays its share of the round trip
+                pnl -= 2 * COST_PER_SIDE_INR * qty / pos.entry_qty
+            self.realized_pnl += pnl
+            if qty < pos.qty:
+                pos.qty -= qty
+                self.portfolio.mark(pos, price)
+            else:
+                self.positions.remove(pos)
+                self.portfolio.close(pos)
+                if self.sched is not None:
+                    self.sched.forget(pos.symbol)
+
+            # Cooldowns
+            self.cooldown_until = exit_time + dt.timedelta(seconds=COOLDOWN_SEC)
+            if not pos.is_core:
+                self.scalp_cooldown_until = exit_time + dt.timedelta(seconds=SCALP_COOLDOWN_SEC)
+
+            publish(Exit(exit_time, pos.symbol, pos.side, price, qty, reason, pnl, self.realized_pnl,
+                         pos.entry_price, pos.sl_price, pos.tp_price, held, qty >= held, pos))
+
+            # EoD tracking
+            hold_min = (exit_time - pos.entry_time).total_seconds() / 60.0
+            self.trades.append({
+                "pnl": pnl, "side": pos.side, "core": pos.is_core, "reason": reason,
+                "hold_min": hold_min, "entry_time": pos.entry_time, "exit_time": exit_time,
+                "symbol": pos.symbol, "entry_price": pos.entry_price
+            })
+            self.equity += pnl
+            if self.equity > self.equity_peak:
+                self.equity_peak = self.equity
+            dd = self.equity_peak - self.equity
+            if dd > self.max_drawdown:
+                self.max_drawdown = dd
+        self.risk.update(self.inst.name, self.realized_pnl)
+        self.publish_open()
+        if self.ckpt is not None:
+            try:
+                self.ckpt.append_trades(self.trades[-len(exits):])
+            except Exception as e:
+                log("CKPT_ERR", reason=f"trade journal: {str(e)[:120]}", day_pnl=self.realized_pnl)
+        self.checkpoint(force=True)
+
+    def exit_many(self, exits: list, label: str):
+        """
+        Exit several positions [(pos, reason)] together (square-off, rules firing on several
+        positions in one tick). Sim: one batched quote for every symbol, then one close_many
+        pass, so every exit is priced at the same moment. Orders: all market sells go to the
+        order manager as one concurrently placed basket; positions with exchange legs still
+        cancel those first (exit_position). Trigger-to-last-exit time is logged as BASKET_EXIT.
+        """
+        if len(exits) <= 1:
+            for pos, reason in exits:
+                self.exit_position(pos, reason)
+            return
+        t0, c0 = now_ist(), time.perf_counter()
+        if self.orders is None:
+            try:
+                ltps = self.dc.quotes_many(sorted({p.symbol for p, _ in exits}))
+            except Exception as e:
+                log("QUOTES_ERR", reason=f"basket exit quote: {e}", day_pnl=self.realized_pnl)
+                ltps = {}
+            fills = []
+            for pos, reason in exits:
+                ltp = ltps.get(pos.symbol)
+                if ltp is None:
+                    ltp = self.dc.get_ltp(pos.symbol)
+                px = ltp if self.fills is None else \
+                    self.fills.price(SELL, ltp, pos.qty, self.dc.last_quote(pos.symbol))
+                fills.append((pos, px, reason, None))
+            self.close_many(fills)
+            self.basket_done(label, len(fills), time.perf_counter() - c0)
+            return
+
+        basket = {"label": label, "t0": t0, "left": 0}
+        orders, rows = [], []
+        for pos, reason in exits:
+            if self.exit_pending(pos):
+                continue
+            if self._protect.get(id(pos)):
+                self.exit_position(pos, reason)
+                continue
+            ref = self.portfolio.ltp(pos) or pos.entry_price
+            o = self.orders.new_order(self.inst.name, pos.symbol, SELL, pos.qty, "exit", ref,
+                                      meta={"pos": pos, "reason": reason, "basket": basket})
+            self._exiting[id(pos)] = o
+            orders.append(o)
+            rows.append(dict(event="ORDER_SUBMIT", symbol=pos.symbol, side=pos.side, price=ref, qty=pos.qty,
+                             reason=f"exit: {reason}", extra=f"{o.tag} basket={label}", day_pnl=self.realized_pnl))
+        basket["left"] = basket["n"] = len(orders)
+        self.orders.submit_many(orders)
+        log_rows(rows)
+
+    def basket_done(self, label: str, n: int, seconds: float):
+        log("BASKET_EXIT", reason=f"{label}: {n} exits, trigger -> last exit {seconds * 1000:.1f} ms",
+            day_pnl=self.realized_pnl)
+        if self.metrics is not None:
+            self.metrics.observe("basket_exit_seconds", seconds, mode="sim" if self.orders is None else "orders")
+
+    def exit_pending(self, pos: Position) -> bool:
+        return id(pos) in self._exiting or id(pos) in self._exit_after_cancel
+
+    # ---- exchange-side SL (EXEC_BROKER_STOPS) ----
+    def protect(self, pos: Position):
+        """
+        Working SL-M sell order mirroring pos.sl_price. The target stays a client-side market
+        exit that cancels the stop first: a second resting sell could fill alongside the stop.
+        """
+        if self.orders is None or not EXEC_BROKER_STOPS:
+            return
+        legs = {"sl": self.orders.new_order(self.inst.name, pos.symbol, SELL, pos.qty, "protect", pos.sl_price,
+                                            order_type=STOP_MARKET, stop_price=tick_round(pos.sl_price),
+                                            meta={"pos": pos, "leg": "sl"})}
+        for o in legs.values():
+            self.orders.submit(o)
+        self._protect[id(pos)] = legs
+        log("ORDER_PROTECT", symbol=pos.symbol, side=pos.side, qty=pos.qty,
+            reason=f"SL-M {tick_round(pos.sl_price):.2f}",
+            extra=" ".join(o.tag for o in legs.values()), day_pnl=self.realized_pnl)
+
+    def sync_protection(self, pos: Position):
+        """Move the exchange stop in place when trailing/breakeven moved pos.sl_price or the qty changed."""
+        o = (self._protect.get(id(pos)) or {}).get("sl")
+        if o is None or o.terminal:
+            return
+        px = tick_round(pos.sl_price)
+        want = o.meta.get("want", (o.stop_price, o.qty))
+        if want != (px, pos.qty):
+            o.meta["want"] = (px, pos.qty)
+            self.orders.modify(o, stopPrice=px, qty=pos.qty)
+
+
+    def reconcile_orders(self):
+        """Apply fills/rejections the order poller saw since the last tick."""
+        if self.orders is None:
+            return
+        for o in self.orders.drain(self.inst.name):
+            if not o.terminal or o.meta.get("booked"):
+                continue  # partial fill still working; booked once the order is done
+            o.meta["booked"] = True
+            lat = o.latency_ms
+            if self.metrics is not None and lat is not None:
+                self.metrics.observe("order_seconds", lat / 1000.0, purpose=o.purpose)
+            if o.filled_qty:
+                log("ORDER_FILL", symbol=o.symbol, price=o.avg_price, qty=o.filled_qty,
+                    reason=f"{o.purpose} {o.status} ref={o.ref_price:.2f}",
+                    extra=f"{o.tag} lat_ms={lat:.0f} slip={o.slippage:.2f}", day_pnl=self.realized_pnl)
+            else:
+                log("ORDER_FAIL", symbol=o.symbol, reason=f"{o.purpose} {o.status}: {o.message}",
+                    extra=o.tag, day_pnl=self.realized_pnl)
+            if o.purpose == "protect":
+                self._on_protect_done(o)
+            elif o.purpose == "entry":
+                self._pending_entries.pop(o.tag, None)
+                m = o.meta
+                if o.filled_qty:
+                    p = self.open_position(o.symbol, m["side"], o.avg_price, o.filled_qty, m["is_core"],
+                                           m["note"], m["sl_pct"], m["tp_pct"], o.avg_price)
+                    p.entry_time = o.submitted_at or p.entry_time
+                    self.protect(p)
+                elif m["is_core"]:  # nothing bought: give the side its signal back
+                    if m["side"] == "CE":
+                        self.orb.long_armed = True
+                    else:
+                        self.orb.short_armed = True
+            else:
+                pos = o.meta["pos"]
+                self._exiting.pop(id(pos), None)
+                if o.filled_qty and pos in self.positions:
+                    self.close_position(pos, o.avg_price, o.meta["reason"], o.filled_qty)
+                b = o.meta.get("basket")
+                if b is not None:
+                    b["left"] -= 1
+                    b["end"] = max(b.get("end") or b["t0"], o.done_at or now_ist())
+                    if b["left"] == 0:
+                        self.basket_done(b["label"], b["n"], (b["end"] - b["t0"]).total_seconds())
+
+    def _on_protect_done(self, o):
+        pos, leg = o.meta["pos"], o.meta["leg"]
+        legs = self._protect.get(id(pos), {})
+        if legs.get(leg) is o:
+            del legs[leg]
+        if o.filled_qty:
+            if pos in self.positions:
+                self.close_position(pos, o.avg_price, "Stop-Loss (exchange)", o.filled_qty)
+            else:
+                log("ORDER_ERR", symbol=o.symbol, qty=o.filled_qty,
+                    reason=f"{leg} leg filled after the position was closed: check the broker position",
+                    extra=o.tag, day_pnl=self.realized_pnl)
+        if legs:
+            return
+        self._protect.pop(id(pos), None)
+        reason = self._exit_after_cancel.pop(id(pos), None)
+        if pos in self.positions:
+            if reason is not None:
+                self.exit_position(pos, reason)  # legs gone: plain market exit
+            elif o.filled_qty:
+                self.protect(pos)                # partial stop fill: protect what is left
+            else:
+                log("ORDER_FAIL", symbol=pos.symbol, reason=f"protection {o.status}; client-side SL/TP only",
+                    extra=o.tag, day_pnl=self.realized_pnl)
+
+    def tick_sleep(self) -> float:
+        if self.sched is not None:
+            return self.sched.next_wait()
+        if EXEC_PROTECTED_TICK_SLEEP_SEC and self.positions and all(self._protect.get(id(p)) for p in self.positions):
+            return EXEC_PROTECTED_TICK_SLEEP_SEC
+        return TICK_SLEEP_SEC
+
+    # ---- adaptive polling (scheduler.py) ----
+
+    def plan_index_poll(self, idx: float):
+        """Next index poll from the breakout buffers / OR band / strategy bands, by the next minute close."""
+        levels = [getattr(self.orb, n, None) for n in ("entry_hi_buf", "entry_lo_buf", "or_high", "or_low")]
+        for s in self.strategies:
+            levels.extend(s.trigger_levels())
+        now = now_ist().timestamp()
+        self.sched.plan(self.inst.index_symbol, idx, levels, deadline=now - now % 60 + 60, now=now)
+
+    def plan_position_poll(self, p: Position, cp: float):
+        """Next poll of an open position: the nearest price where tick() would act on it."""
+        legs = self._protect.get(id(p)) or {}
+        e = p.entry_price
+        levels = [None if "sl" in legs else p.sl_price, p.tp_price]
+        if BREAKEVEN_AT_PROFIT_PCT is not None and p.sl_price < e * (1 + BREAKEVEN_OFFSET_PCT / 100.0):
+            levels.append(e * (1 + BREAKEVEN_AT_PROFIT_PCT / 100.0))
+        steps = [lvl for lvl, _ in TRAIL_STEPS if lvl > p.last_trail_level_hit]
+        if steps:
+            levels.append(e * (1 + min(steps) / 100.0))
+        min_gain = CORE_MIN_PEAK_GAIN_BEFORE_DD_PCT if p.is_core else SCALP_MIN_PEAK_GAIN_BEFORE_DD_PCT
+        if p.peak_price >= e * (1 + min_gain / 100.0):
+            levels.append(p.peak_price * (1 - (CORE_DD_HARD_DROP_PCT if p.is_core else SCALP_DD_HARD_DROP_PCT) / 100.0))
+
+        now = now_ist().timestamp()
+        t0 = p.entry_time.timestamp()
+        deadlines = [t0 + TIME_BASED_EXIT_MIN * 60.0]
+        if now - t0 < IMPULSE_WINDOW_SEC:
+            levels.append(e * (1 + IMPULSE_LOSS_PCT / 100.0))
+            deadlines.append(t0 + IMPULSE_WINDOW_SEC)
+        if not p.is_core:
+            deadlines.append(t0 + SCALP_MAX_HOLD_MIN * 60.0)
+        self.sched.plan(p.symbol, cp, levels, deadline=min((d for d in deadlines if d > now), default=None), now=now)
+
+    def await_orders(self, timeout: float):
+        """Block (session end only) until every working order of this engine is reconciled."""
+        end = time.monotonic() + timeout
+        def working():
+            return self._pending_entries or self._exiting or self._exit_after_cancel
+
+        while self.orders is not None and working() and time.monotonic() < end:
+            time.sleep(min(0.2, self.orders.poll_sec))
+            self.reconcile_orders()
+        if working():
+            log("ORDER_ERR", reason=f"{len(self._pending_entries)} entries / "
+                                    f"{len(self._exiting) + len(self._exit_after_cancel)} exits "
+                                    f"still working after {timeout:.0f}s", day_pnl=self.realized_pnl)
+
+    def open_count(self) -> int:
+        """Open positions plus entries still working at the broker (concurrency / gates)."""
+        return len(self.positions) + len(self._pending_entries)
 
     def has_open_core_side(self, side: str) -> bool:
-        return any(p.side == side and p.is_core for p in self.positions)
+        return any(p.side == side and p.is_core for p in self.positions) or \
+            any(o.meta["side"] == side and o.meta["is_core"] for o in self._pending_entries.values())
 
     def first_position_safe(self) -> bool:
         return any(p.sl_price >= p.entry_price for p in self.positions)
 
+    def estimate_entry(self, side: str) -> Optional[float]:
+        """Premium the next `side` entry would pay; remembered for network-free diagnostics."""
+        est = self.dc.get_ltp(self.dc.pick_entry_symbol(side))
+        self._est_entry[side] = est
+        return est
+
+    def publish_open(self):
+        self.risk.update_open(self.inst.name, self.portfolio.unrealized, self.portfolio.at_sl)
+
+    def daily_loss_hit(self) -> bool:
+        # combined across every underlying sharing this RiskBook
+        mtm = self.risk.unrealized() if DAILY_LOSS_INCLUDES_MTM else 0.0
+        return self.risk.realized() + mtm <= -MAX_DAILY_LOSS_INR
+
     # ---- risk gate using provided sl% (core vs scalp) ----
     def can_new_entry_with_sl(self, est_entry_price: float, sl_pct: float) -> bool:
-        if self.realized_pnl <= -MAX_DAILY_LOSS_INR:
-            return False
-        if len(self.positions) >= MAX_CONCURRENT_POS:
-            return False
         if self.cooldown_until and now_ist() < self.cooldown_until:
             return False
-        if USE_PROJECTED_RISK_BLOCK and est_entry_price:
-            sl_price = est_entry_price * (1 - sl_pct / 100.0)
-            risk = (est_entry_price - sl_price) * LOT_SIZE + 2 * COST_PER_SIDE_INR
-            projected = self.realized_pnl - risk
-            if projected <= -MAX_DAILY_LOSS_INR:
-                return False
-        return True
+        mtm, at_sl = (self.risk.unrealized(), self.risk.at_sl()) if DAILY_LOSS_INCLUDES_MTM else (0.0, 0.0)
+        return bool(entry_gate(self.risk.realized(), self.open_count(), est_entry_price or 0.0,
+                               sl_pct, self.inst.lot_size, mtm=mtm, at_sl=at_sl))
 
     # Backward-compatible wrapper
     def can_new_entry(self, est_entry_price: float) -> bool:
         return self.can_new_entry_with_sl(est_entry_price, INIT_SL_PCT)
 
-    # Add a guard: can we open a scalp right now
-    def can_open_scalp(self, side: str) -> bool:
-        # cap total open scalps
+    # Add a guard: can we open a scalp right now (side=None -> side-independent checks only)
+    def can_open_scalp(self, side: Optional[str]) -> bool:
+        # cap total open scalps + min gap between any two scalp entries
         open_scalps = [p for p in self.positions if not p.is_core]
-        if len(open_scalps) >= SCALP_MAX_OPEN:
+        now = now_ist()
+        since = (now - self.last_scalp_entry_ts).total_seconds() if self.last_scalp_entry_ts else float("inf")
+        if not scalp_gate(len(open_scalps), since):
             return False
+        if side is None:
+            return True
         # cap per side
         if SCALP_MAX_PER_SIDE > 0 and any((p.side == side and not p.is_core) for p in open_scalps):
             return False
-        # min gap between any two scalp entries
-        now = now_ist()
-        if self.last_scalp_entry_ts and (now - self.last_scalp_entry_ts).total_seconds() < SCALP_ENTRY_MIN_GAP_SEC:
-            return False
         # min gap per side
         last_side_ts = self.last_scalp_entry_ts_by_side.get(side)
         if last_side_ts and (now - last_side_ts).total_seconds() < SCALP_ENTRY_MIN_GAP_SEC:
@@ -290,7 +817,46 @@ class Engine:
             return "trend_down"
         return "range"
 
-    def pick_secondary_signal(self, idx_ltp: float, rsi_val: Optional[float]) -> Optional[str]:
+    def market_snapshot(self, idx_ltp: float, rsi_val: Optional[float]) -> MarketSnapshot:
+        return MarketSnapshot(ts=now_ist(), idx_ltp=idx_ltp, rsi_val=rsi_val)
+
+    def strategy_gate(self, route: str) -> Optional[str]:
+        """Cheap, side-independent reason no entry on this route can happen now (None = open)."""
+        if route == "scalp" and not SCALP_ENABLED:
+            return "scalp_disabled"
+        if self.daily_loss_hit():
+            return "daily_loss_hit"
+        if self.open_count() >= MAX_CONCURRENT_POS:
+            return "max_concurrent"
+        now = now_ist()
+        if self.cooldown_until and now < self.cooldown_until:
+            return "cooldown"
+        if route == "scalp" and self.scalp_cooldown_until and now < self.scalp_cooldown_until:
+            return "scalp_cooldown"
+        # every strategy entry is opened as a scalp
+        if not self.can_open_scalp(None):
+            return "scalp_guard"
+        return None
+
+    def evaluate_strategies(self, idx_ltp: float, rsi_val: Optional[float]) -> dict:
+        """
+        Signals for this tick (name -> 'CE'/'PE'/None), evaluated concurrently on one snapshot.
+        Strategies whose route is gated off, or that need an LTP we don't have, are not run at all.
+        """
+        gates = {r: self.strategy_gate(r) for r in {s.route for s in self.strategies}}
+        active = [s for s in self.strategies
+                  if gates[s.route] is None and (idx_ltp is not None or not s.needs_ltp)]
+        self.strat_skips += len(self.strategies) - len(active)
+        if not active:
+            return {}
+        snap = self.market_snapshot(idx_ltp, rsi_val)
+        return self.executor.evaluate(active, snap, day_pnl=self.realized_pnl)
+
+    def pick_secondary_signal(self, idx_ltp: float, rsi_val: Optional[float],
+                              signals: Optional[dict] = None) -> Optional[str]:
+        """Regime router: picks among precomputed signals (evaluates them if not given)."""
+        if signals is None:
+            signals = self.evaluate_strategies(idx_ltp, rsi_val)
         regime = self.detect_regime(idx_ltp, rsi_val)
         # route: trend → Supertrend; range → VWAP reversion
         ordered = []
@@ -302,11 +868,7 @@ class Engine:
                                                                                 s.name != "vwap_reversion"]
 
         for s in ordered:
-            try:
-                sig = s.signal(idx_ltp, rsi_val)
-            except Exception as e:
-                log("STRAT_ERR", reason=f"{s.name}: {e}", day_pnl=self.realized_pnl)
-                continue
+            sig = signals.get(s.name)
             if sig:
                 return sig
         return None
@@ -322,10 +884,8 @@ class Engine:
             if pos.sl_price < be:
                 old = pos.sl_price
                 pos.sl_price = be
-                log("SL_TO_BE", symbol=pos.symbol, side=pos.side, price=ltp,
-                    reason=f"Profit {profit_pct:.1f}% -> SL {old:.2f} -> {pos.sl_price:.2f}",
-                    day_pnl=self.realized_pnl)
-                self.log_pos_state(pos, ltp, tag="SL_UPDATE", extra="breakeven")
+                publish(SLMoved(now_ist(), "SL_TO_BE", pos.symbol, pos.side, pos.qty, pos.entry_price, ltp,
+                                old, be, pos.tp_price, profit_pct, "breakeven", self.realized_pnl))
 
         # 2) Then apply step trailing (as before)
         for level, sl_from_entry_pct in sorted(TRAIL_STEPS, key=lambda x: x[0]):
@@ -335,10 +895,8 @@ class Engine:
                     old = pos.sl_price
                     pos.sl_price = new_sl
                     pos.last_trail_level_hit = level
-                    log("TRAIL_SL", symbol=pos.symbol, side=pos.side, price=ltp,
-                        reason=f"Profit {profit_pct:.1f}% -> SL {old:.2f} -> {pos.sl_price:.2f}",
-                        day_pnl=self.realized_pnl)
-                    self.log_pos_state(pos, ltp, tag="SL_UPDATE", extra=f"level={level}")
+                    publish(SLMoved(now_ist(), "TRAIL_SL", pos.symbol, pos.side, pos.qty, pos.entry_price, ltp,
+                                    old, new_sl, pos.tp_price, profit_pct, f"level={level}", self.realized_pnl))
 
     def dd_exit(self, pos: Position, ltp: float) -> bool:
         # separate cushions/thresholds
@@ -367,75 +925,70 @@ class Engine:
             if reduced_tp < pos.tp_price:
                 old = pos.tp_price
                 pos.tp_price = reduced_tp
-                log("ADJUST_TP", symbol=pos.symbol, side=pos.side, price=ltp,
-                    reason=f"TP {old:.2f} -> {pos.tp_price:.2f} (held {held_min:.1f}m, profit {profit_pct:.1f}%)",
-                    day_pnl=self.realized_pnl)
-                self.log_pos_state(pos, ltp, tag="TP_UPDATE",
-                                   extra=f"held={held_min:.1f}m profit={profit_pct:.1f}%")
-
-    # ============ RSI refresh / snapshots / momentum logs ============
-
-    def refresh_rsi_minutely(self, current_rsi: Optional[float]) -> Optional[float]:
-        if not USE_RSI:
-            return current_rsi
-        now = now_ist()
-        if now.second > 2:
-            return current_rsi
+                publish(TPAdjusted(now_ist(), pos.symbol, pos.side, pos.qty, pos.entry_price, ltp, old, reduced_tp,
+                                   pos.sl_price, held_min, profit_pct, self.realized_pnl))
+
+    # ============ Bars / RSI refresh / snapshots / momentum logs ============
+
+    def load_bars(self, candles: list):
+        """Reset the aggregator: prior-session seed + today's closed bars, then prime subscribers once."""
+        self.bars.reset()
+        if candles:
+            self.bars.seed(self.dc.seed_rows(self.inst.index_symbol, self.seed_bars,
+                                             before=candles[0][0], first_open=float(candles[0][1])))
+        self.bars.ingest(candles, now_ist().timestamp(), emit=False)
+        for s in self.strategies:
+            for tf in s.timeframes:
+                s.on_bar(tf, None)
+
+    def refresh_bars(self):
+        """Fetch today's 1m only until the last closed minute is in; fires finished-bar events."""
+        now = now_ist().timestamp()
+        if self.bars.up_to_date(now) or (now - self._last_bar_fetch) < BAR_REFRESH_RETRY_SEC:
+            return
+        self._last_bar_fetch = now
         try:
-            c = self.dc.get_1m_today(INDEX_SYMBOL)
-            if not c:
-                return current_rsi
-            rows = []
-            for ts, o, h, l, cl, v in c:
-                rows.append({"ts": utc_epoch_to_ist_dt(ts), "o": o, "h": h, "l": l, "c": cl, "v": v})
-            df = pd.DataFrame(rows)
-            post_open = df[df['ts'].dt.time >= ORB_START_IST]
-            new_rsi = compute_rsi_from_1m(post_open, period=RSI_PERIOD, tf_min=RSI_TIMEFRAME_MIN)
-            if new_rsi is not None:
-                self.rsi_push(new_rsi)
-            return new_rsi if new_rsi is not None else current_rsi
+            c = self.dc.get_1m_today(self.inst.index_symbol)
         except Exception:
-            return current_rsi
+            return
+        self.bars.ingest(c, now)
 
-    def snapshot_market(self, idx_ltp: float, rsi_val: Optional[float]):
-        orh = getattr(self.orb, "or_high", None)
-        orl = getattr(self.orb, "or_low", None)
-        hi_buf = getattr(self.orb, "entry_hi_buf", None)
-        lo_buf = getattr(self.orb, "entry_lo_buf", None)
+    def _on_rsi_bar(self, tf: int, bar):
+        if not USE_RSI:
+            return
+        new_rsi = compute_rsi(self.bars.frame(tf), period=RSI_PERIOD)
+        if new_rsi is not None:
+            self.rsi_val = new_rsi
+            self.rsi_push(new_rsi)
 
+    def tick_state(self, idx_ltp: float, rsi_val: Optional[float]) -> TickState:
+        """In-memory view of this tick for diagnostics/snapshots (no broker calls)."""
         cd_rem = 0
         if self.cooldown_until:
             cd_rem = max(0, int((self.cooldown_until - now_ist()).total_seconds()))
-
-        extra = ""
-        if orh is not None and orl is not None:
-            extra += f"IDX={idx_ltp:.2f} ORH={orh:.2f} ORL={orl:.2f} "
-        else:
-            extra += f"IDX={idx_ltp:.2f} ORH=NA ORL=NA "
-        if hi_buf is not None and lo_buf is not None:
-            extra += f"HI_BUF={hi_buf:.2f} LO_BUF={lo_buf:.2f} "
-        else:
-            extra += "HI_BUF=NA LO_BUF=NA "
-        extra += (
-            f"RSI={f'{rsi_val:.2f}' if rsi_val is not None else 'NA'} "
-            f"Armed(L/S)={self.orb.long_armed}/{self.orb.short_armed} "
-            f"CD={cd_rem}s OpenPos={len(self.positions)}"
+        mtm, at_sl = (self.risk.unrealized(), self.risk.at_sl()) if DAILY_LOSS_INCLUDES_MTM else (0.0, 0.0)
+        projected = {}
+        for side, est in self._est_entry.items():
+            projected[side] = None if not (USE_PROJECTED_RISK_BLOCK and est) else \
+                bool(projected_ok(self.risk.realized(), at_sl, est, INIT_SL_PCT, self.inst.lot_size))
+        return TickState(
+            idx=idx_ltp, rsi=rsi_val,
+            or_high=getattr(self.orb, "or_high", None), or_low=getattr(self.orb, "or_low", None),
+            hi_buf=getattr(self.orb, "entry_hi_buf", None), lo_buf=getattr(self.orb, "entry_lo_buf", None),
+            rsi_ok={"CE": self.orb.rsi_allows("UP", rsi_val), "PE": self.orb.rsi_allows("DOWN", rsi_val)},
+            armed={"CE": self.orb.long_armed, "PE": self.orb.short_armed},
+            core_open={"CE": self.has_open_core_side("CE"), "PE": self.has_open_core_side("PE")},
+            daily_loss_hit=self.daily_loss_hit(), cooldown_sec=cd_rem, n_open=self.open_count(),
+            projected_ok=projected, mtm=self.portfolio.unrealized, at_sl=self.portfolio.at_sl,
         )
-        log("SNAPSHOT", reason=extra, day_pnl=self.realized_pnl)
 
-        if self.positions:
-            for p in self.positions:
-                try:
-                    cp = self.dc.get_ltp(p.symbol)
-                except Exception:
-                    cp = float('nan')
-                line = (
-                    f"{'CORE' if p.is_core else 'SCALP'} {p.side} [{p.symbol}] "
-                    f"EP={p.entry_price:.2f} CP={cp:.2f} SL={p.sl_price:.2f} TP={p.tp_price:.2f}"
-                )
-                log("SNAPSHOT_POS", reason=line, day_pnl=self.realized_pnl)
-        else:
-            log("SNAPSHOT_POS", reason="None", day_pnl=self.realized_pnl)
+    def snapshot_market(self, idx_ltp: float, rsi_val: Optional[float]):
+        held = tuple(copy.copy(p) for p in self.positions)
+        publish(Snapshot(now_ist(), self.inst.index_symbol, self.tick_state(idx_ltp, rsi_val), held,
+                         tuple(self.portfolio.ltp(p) for p in self.positions), self.realized_pnl))
+        if self.sched is not None:
+            log("POLL_BUDGET", reason=f"{self.sched.used_per_min()}/{self.sched.budget:g} polls/min, "
+                                      f"stretch x{self.sched.scale:.2f}", day_pnl=self.realized_pnl)
 
     def _rsi_regime(self, rsi_val: Optional[float]) -> str:
         if rsi_val is None:
@@ -466,16 +1019,15 @@ class Engine:
             return
         regime = self._rsi_regime(rsi_val)
         if regime != self.last_rsi_regime:
-            log("MOMENTUM_SHIFT",
-                reason=f"RSI regime {self.last_rsi_regime or 'NA'} -> {regime} (RSI={rsi_val if rsi_val is not None else 'NA'})",
-                day_pnl=self.realized_pnl)
+            publish(Signal(now_ist(), "MOMENTUM_SHIFT",
+                           f"RSI regime {self.last_rsi_regime or 'NA'} -> {regime} (RSI={rsi_val if rsi_val is not None else 'NA'})",
+                           self.realized_pnl))
             self.last_rsi_regime = regime
 
         zone = self._price_zone(idx_ltp)
         if zone != self.last_price_zone:
-            log("PRICE_STATE",
-                reason=f"Zone {self.last_price_zone or 'NA'} -> {zone} (IDX={idx_ltp:.2f})",
-                day_pnl=self.realized_pnl)
+            publish(Signal(now_ist(), "PRICE_STATE",
+                           f"Zone {self.last_price_zone or 'NA'} -> {zone} (IDX={idx_ltp:.2f})", self.realized_pnl))
             self.last_price_zone = zone
 
     #Helpers
@@ -528,6 +1080,7 @@ class Engine:
     # ============ Diagnostics (throttled & only on change) ============
 
     def log_signal_diagnostics(self, idx_ltp: float, rsi_val: Optional[float], force: bool = False):
+        """Why CE/PE were not entered, from the tick's in-memory state (cheap enough for every tick)."""
         if not ENABLE_DIAGNOSTICS:
             return
 
@@ -536,308 +1089,418 @@ class Engine:
             if (now_ts - self._last_diag_ts).total_seconds() < DIAG_INTERVAL_SEC:
                 return
 
-        def build_reasons(side: str) -> str:
-            reasons = []
-            if side == "CE":
-                raw = (self.orb.entry_hi_buf is not None) and (idx_ltp > self.orb.entry_hi_buf)
-                if not raw:
-                    reasons.append("no_breakout_above_buffer")
-                if raw and not self.orb.rsi_allows("UP", rsi_val):
-                    reasons.append("rsi_block")
-                if PREVENT_DUPLICATE_SIDE and self.has_open_core_side('CE'):
-                    reasons.append("duplicate_core")
-                if REARM_ON_PULLBACK and not self.orb.long_armed:
-                    reasons.append("not_armed")
-            else:
-                raw = (self.orb.entry_lo_buf is not None) and (idx_ltp < self.orb.entry_lo_buf)
-                if not raw:
-                    reasons.append("no_breakdown_below_buffer")
-                if raw and not self.orb.rsi_allows("DOWN", rsi_val):
-                    reasons.append("rsi_block")
-                if PREVENT_DUPLICATE_SIDE and self.has_open_core_side('PE'):
-                    reasons.append("duplicate_core")
-                if REARM_ON_PULLBACK and not self.orb.short_armed:
-                    reasons.append("not_armed")
-
-            if self.realized_pnl <= -MAX_DAILY_LOSS_INR:
-                reasons.append("daily_loss_hit")
-            if self.cooldown_until and now_ist() < self.cooldown_until:
-                reasons.append("cooldown")
-            if len(self.positions) >= MAX_CONCURRENT_POS:
-                reasons.append("max_concurrent")
-
-            if raw:
-                try:
-                    sym = self.dc.pick_atm_symbol(side)
-                    est = self.dc.get_ltp(sym)
-                    if USE_PROJECTED_RISK_BLOCK:
-                        sl_price = est * (1 - INIT_SL_PCT / 100.0)
-                        risk = (est - sl_price) * LOT_SIZE + 2 * COST_PER_SIDE_INR
-                        projected = self.realized_pnl - risk
-                        if projected <= -MAX_DAILY_LOSS_INR:
-                            reasons.append("projected_risk_breach")
-                except Exception as e:
-                    reasons.append(f"est_entry_failed:{str(e)[:80]}")
+        st = self.tick_state(idx_ltp, rsi_val)
+        masks = {side: block_mask(st, side, PREVENT_DUPLICATE_SIDE, REARM_ON_PULLBACK, MAX_CONCURRENT_POS)
+                 for side in ("CE", "PE")}
 
-            return ", ".join(reasons) if reasons else "ok"
-
-        ce_reasons = build_reasons("CE")
-        pe_reasons = build_reasons("PE")
-
-        if DIAG_ONLY_ON_CHANGE:
-            if ce_reasons == (self._last_diag_reasons.get("CE") or "") and \
-               pe_reasons == (self._last_diag_reasons.get("PE") or "") and \
-               not force:
-                return
+        if DIAG_ONLY_ON_CHANGE and not force and masks == self._last_diag_reasons:
+            return
 
-        log("DIAG_NO_ENTRY",
-            reason=f"CE blocked: {ce_reasons} | IDX={idx_ltp:.2f} RSI={rsi_val if rsi_val is not None else 'NA'}",
-            day_pnl=self.realized_pnl)
-        log("DIAG_NO_ENTRY",
-            reason=f"PE blocked: {pe_reasons} | IDX={idx_ltp:.2f} RSI={rsi_val if rsi_val is not None else 'NA'}",
-            day_pnl=self.realized_pnl)
+        publish(Diag(now_ts, st, masks, self.realized_pnl))
 
         self._last_diag_ts = now_ts
-        self._last_diag_reasons["CE"] = ce_reasons
-        self._last_diag_reasons["PE"] = pe_reasons
+        self._last_diag_reasons = masks
 
     # ============ Main loop ============
 
-    def run(self):
+    def start_session(self, allow_yday: bool = USE_YDAY_WHEN_TODAY_EMPTY):
+        profiler.session_start(self.inst.name)  # PROFILE_ENABLED: samples this (loop) thread until end_session
         # 0) Respect START_IMMEDIATELY: optionally wait till 09:30 IST
         if not START_IMMEDIATELY and now_ist().time() < ORB_END_IST:
             log("INFO", reason="Waiting for ORB end (09:30 IST)", day_pnl=self.realized_pnl)
             tgt = IST.localize(dt.datetime.combine(now_ist().date(), ORB_END_IST))
+            if WARMUP_ENABLED:
+                try:
+                    self.warm_up()
+                except Exception as e:  # only a head start: the session fetches what it needs itself
+                    log("WARMUP_ERR", reason=f"{type(e).__name__}: {str(e)[:160]}", day_pnl=self.realized_pnl)
+            last_ka = time.monotonic()
             while now_ist() < tgt:
                 time.sleep(1)
+                if WARMUP_ENABLED and time.monotonic() - last_ka >= WARMUP_KEEPALIVE_SEC:
+                    self._keepalive()
+                    last_ka = time.monotonic()
 
-        # 1) Build ORB levels (with off-hours fallback if enabled)
-        c = self.dc.get_1m_today(INDEX_SYMBOL)
-        if (not c) and USE_YDAY_WHEN_TODAY_EMPTY:
+        # 1) Today's 1m (with off-hours fallback if enabled) -> warm-started bar aggregator
+        c = self.dc.get_1m_today(self.inst.index_symbol)
+        if (not c) and allow_yday:
             log("INFO", reason="No 1m data for today yet; using last trading day for TESTING", day_pnl=self.realized_pnl)
-            c = self.dc.get_1m_last_trading(INDEX_SYMBOL)
+            c = self.dc.get_1m_last_trading(self.inst.index_symbol)
         if not c:
             raise RuntimeError("History failed (1m).")
+        self.load_bars(c)
+
+        # 2) Resume from today's checkpoint, else build ORB levels
+        if not self.resume_from_checkpoint():
+            self.rsi_val = self.orb.compute_orb(c, rsi_frame=self.bars.frame(RSI_TIMEFRAME_MIN))
+            self.rsi_push(self.rsi_val)
+            if self.ckpt is not None:
+                self.ckpt.clear_journal()  # fresh session: no trades carried over from an unresumed run
+            self.checkpoint(force=True)
+
+    def tick(self) -> Optional[float]:
+        """One pass of the trading loop. Returns seconds to wait before the next tick, None once squared off."""
+        rsi_val = self.rsi_val
+        self.reconcile_orders()
+
+        # Square-off
+        if now_ist().time() >= SQUARE_OFF_IST:
+            self.exit_many([(p, "Square-off") for p in self.positions], "square-off")
+            if self.orders is not None:
+                self.await_orders(EXEC_SQUAREOFF_WAIT_SEC)
+                # entries that filled while waiting
+                self.exit_many([(p, "Square-off") for p in self.positions], "square-off")
+                self.await_orders(EXEC_SQUAREOFF_WAIT_SEC)
+            log("SESSION_END", symbol=self.inst.index_symbol, reason="Square-off reached", day_pnl=self.realized_pnl)
+            return None
 
-        rsi_val = self.orb.compute_orb(c)
-        self.rsi_push(rsi_val)
-        try:
-            while True:
-                # Square-off
-                if now_ist().time() >= SQUARE_OFF_IST:
-                    for p in list(self.positions):
-                        self.exit_position(p, reason="Square-off")
-                    log("SESSION_END", reason="Square-off reached", day_pnl=self.realized_pnl)
-                    break
+        # Index LTP (adaptive polling: reuse the last one until the index is due again)
+        idx_polled = False
+        if self.sched is not None and self.last_idx is not None and not self.sched.due(self.inst.index_symbol):
+            idx = self.last_idx
+        else:
+            try:
+                idx = self.dc.get_ltp(self.inst.index_symbol)
+            except Exception:
+                return 1.0
+            idx_polled = True
+            if self.sched is not None:
+                self.sched.observe(self.inst.index_symbol, idx)
+        self.last_idx = idx
+
+        # Momentum / price-zone logs
+        self.maybe_log_momentum_price_changes(idx, rsi_val)
+
+        # 15-min snapshot
+        now_ts = now_ist()
+        if self.last_snapshot_ts is None or (now_ts - self.last_snapshot_ts).total_seconds() >= SNAPSHOT_INTERVAL_SEC:
+            self.snapshot_market(idx, rsi_val)
+            self.last_snapshot_ts = now_ts
+
+        # New closed 1m bar(s) -> aggregator events (RSI on RSI_TIMEFRAME_MIN, strategy levels)
+        self.refresh_bars()
+        rsi_val = self.rsi_val
+
+        # ---- Optional time-based re-arm (in addition to your pullback/OR band rules) ----
+        for side in ("CE", "PE"):
+            armed = self.orb.long_armed if side == "CE" else self.orb.short_armed
+            if not armed and self._last_core_entry_time.get(side):
+                if (now_ist() - self._last_core_entry_time[side]).total_seconds() >= CORE_REARM_MIN_SECS:
+                    if side == "CE":
+                        self.orb.long_armed = True
+                    else:
+                        self.orb.short_armed = True
+                    publish(Signal(now_ist(), "REARM", f"{side} timed re-arm after {CORE_REARM_MIN_SECS}s", self.realized_pnl))
 
-                # Index LTP
+        # ---- Manage positions (exits that fire are sent together after the loop) ----
+        self._exit_batch = []
+        try:
+            for p in list(self.positions):
+                if self.sched is not None and not self.sched.due(p.symbol):
+                    continue
                 try:
-                    idx = self.dc.get_ltp(INDEX_SYMBOL)
+                    cp = self.dc.get_ltp(p.symbol)
                 except Exception:
-                    time.sleep(1.0)
                     continue
+                if self.sched is not None:  # planned again below once SL/TP/trail have moved
+                    self.sched.observe(p.symbol, cp)
+                    self.plan_position_poll(p, cp)
 
-                # Momentum / price-zone logs
-                self.maybe_log_momentum_price_changes(idx, rsi_val)
-
-                # 15-min snapshot
-                now_ts = now_ist()
-                if self.last_snapshot_ts is None or (now_ts - self.last_snapshot_ts).total_seconds() >= SNAPSHOT_INTERVAL_SEC:
-                    self.snapshot_market(idx, rsi_val)
-                    self.last_snapshot_ts = now_ts
-
-                # Optional: refresh RSI once per minute
-                rsi_val = self.refresh_rsi_minutely(rsi_val)
-
-                # ---- Optional time-based re-arm (in addition to your pullback/OR band rules) ----
-                for side in ("CE", "PE"):
-                    armed = self.orb.long_armed if side == "CE" else self.orb.short_armed
-                    if not armed and self._last_core_entry_time.get(side):
-                        if (now_ist() - self._last_core_entry_time[side]).total_seconds() >= CORE_REARM_MIN_SECS:
-                            if side == "CE":
-                                self.orb.long_armed = True
-                            else:
-                                self.orb.short_armed = True
-                            log("REARM", reason=f"{side} timed re-arm after {CORE_REARM_MIN_SECS}s", day_pnl=self.realized_pnl)
-
-                # ---- Manage positions ----
-                for p in list(self.positions):
-                    try:
-                        cp = self.dc.get_ltp(p.symbol)
-                    except Exception:
-                        continue
-
-                    p.record(now_ist(), cp)
-
-                    if self.impulse_check(p, cp):
-                        continue
+                p.record(now_ist(), cp)
+                if self.exit_pending(p):  # exit order working: mark only
+                    self.portfolio.mark(p, cp)
+                    continue
 
-                    # Trailing SL steps
-                    self.trail_sl(p, cp)
+                if self.impulse_check(p, cp):
+                    continue
 
-                    # Adaptive DD exit
-                    if self.dd_exit(p, cp):
-                        continue
+                # Trailing SL steps
+                self.trail_sl(p, cp)
 
-                    # Dynamic TP (time decay control)
-                    self.dynamic_tp(p, cp)
+                # Adaptive DD exit
+                if self.dd_exit(p, cp):
+                    continue
 
-                    # Hard SL/TP
-                    if cp <= p.sl_price:
-                        self.exit_position(p, reason="Stop-Loss")
-                        continue
-                    if cp >= p.tp_price:
-                        self.exit_position(p, reason="Take-Profit")
-                        continue
+                # Dynamic TP (time decay control)
+                self.dynamic_tp(p, cp)
 
-                    # Scalp max holding time exit
-                    held_min = (now_ist() - p.entry_time).total_seconds() / 60.0
-                    if not p.is_core and held_min >= SCALP_MAX_HOLD_MIN:
-                        self.exit_position(p, reason=f"Scalp time exit {held_min:.1f}m")
-                        continue
+                # Hard SL/TP (a working exchange-side stop executes the SL itself)
+                legs = self._protect.get(id(p)) or {}
+                if cp <= p.sl_price and "sl" not in legs:
+                    self.exit_position(p, reason="Stop-Loss")
+                    continue
+                if cp >= p.tp_price:
+                    self.exit_position(p, reason="Take-Profit")
+                    continue
 
-                # Daily loss hard gate for new entries
-                if self.realized_pnl <= -MAX_DAILY_LOSS_INR:
-                    time.sleep(0.8)
+                # Scalp max holding time exit
+                held_min = (now_ist() - p.entry_time).total_seconds() / 60.0
+                if not p.is_core and held_min >= SCALP_MAX_HOLD_MIN:
+                    self.exit_position(p, reason=f"Scalp time exit {held_min:.1f}m")
                     continue
 
-                # ---- Core ORB signals ----
-                try_long = bool(getattr(self.orb, "entry_hi_buf", None)) and (idx > self.orb.entry_hi_buf) and self.orb.rsi_allows("UP", rsi_val)
-                try_short = bool(getattr(self.orb, "entry_lo_buf", None)) and (idx < self.orb.entry_lo_buf) and self.orb.rsi_allows("DOWN", rsi_val)
-
-                if REARM_ON_PULLBACK:
-                    try_long = try_long and self.orb.long_armed
-                    try_short = try_short and self.orb.short_armed
-
-                entered_this_tick = False
-                side, is_core, note = None, True, "CORE"
-
-                if try_long or try_short:
-                    side = 'CE' if try_long else 'PE'
-                    if side and not self.rsi_momentum_allows(side, rsi_val):
-                        # momentum not decisive; block this tick
-                        side = None
-                    # prevent duplicate same-side core
-                    if PREVENT_DUPLICATE_SIDE and self.has_open_core_side(side):
-                        side = None
-                    # opposite scalp if core blocked and first pos safe
-                    if side is None and ALLOW_OPPOSITE_IF_SAFE:
-                        opp = 'PE' if try_long else 'CE'
-                        if self.first_position_safe() and len(self.positions) < MAX_CONCURRENT_POS:
-                            side = opp
-                            is_core = False
-                            note = "SCALP"
-
-                if side:
+                # Still open: mark with this tick's LTP and (possibly trailed) SL
+                self.portfolio.mark(p, cp)
+                self.sync_protection(p)
+                if self.sched is not None:
+                    self.plan_position_poll(p, cp)
+        finally:
+            batch, self._exit_batch = self._exit_batch, None
+        self.exit_many(batch, "tick")
+        self.publish_open()
+
+        # Throttled on-change checkpoint (peak/SL/TP/arming moved this tick)
+        self.checkpoint()
+        if self.sched is not None and idx_polled:  # planned after refresh_bars so new bands count
+            self.plan_index_poll(idx)
+
+        # Daily loss hard gate for new entries
+        if self.daily_loss_hit():
+            return self.tick_sleep()
+
+        # ---- Core ORB signals ----
+        try_long = bool(getattr(self.orb, "entry_hi_buf", None)) and (idx > self.orb.entry_hi_buf) and self.orb.rsi_allows("UP", rsi_val)
+        try_short = bool(getattr(self.orb, "entry_lo_buf", None)) and (idx < self.orb.entry_lo_buf) and self.orb.rsi_allows("DOWN", rsi_val)
+
+        if REARM_ON_PULLBACK:
+            try_long = try_long and self.orb.long_armed
+            try_short = try_short and self.orb.short_armed
+
+        entered_this_tick = False
+        side, is_core, note = None, True, "CORE"
+
+        if try_long or try_short:
+            side = 'CE' if try_long else 'PE'
+            if side and not self.rsi_momentum_allows(side, rsi_val):
+                # momentum not decisive; block this tick
+                side = None
+            # prevent duplicate same-side core
+            if PREVENT_DUPLICATE_SIDE and self.has_open_core_side(side):
+                side = None
+            # opposite scalp if core blocked and first pos safe
+            if side is None and ALLOW_OPPOSITE_IF_SAFE:
+                opp = 'PE' if try_long else 'CE'
+                if self.first_position_safe() and self.open_count() < MAX_CONCURRENT_POS:
+                    side = opp
+                    is_core = False
+                    note = "SCALP"
+
+        if side:
+            try:
+                est_entry = self.estimate_entry(side)
+            except Exception:
+                est_entry = None
+
+            if is_core:
+                if self.can_new_entry_with_sl(est_entry or 0.0, INIT_SL_PCT):
+                    self.create_position(side=side, is_core=True, note=note)
+                    entered_this_tick = True
+                    # Disarm this side for core until pullback / OR-band / timed re-arm
+                    if side == 'CE':
+                        self.orb.long_armed = False
+                    else:
+                        self.orb.short_armed = False
+            else:
+                if self.can_new_entry_with_sl(est_entry or 0.0, SCALP_SL_PCT):
+                    self.create_scalp_position(side)
+                    entered_this_tick = True
+
+        # ---- All strategy signals for this tick, evaluated concurrently ----
+        signals = self.evaluate_strategies(idx, rsi_val) if not entered_this_tick else {}
+
+        # ---- BB Range Scalp (if no core entered this tick) ----
+        if SCALP_ENABLED and not entered_this_tick:
+            can_scalp = (
+                    (self.scalp_cooldown_until is None or now_ist() >= self.scalp_cooldown_until)
+                    and not self.daily_loss_hit()
+                    and self.open_count() < MAX_CONCURRENT_POS
+            )
+            if can_scalp:
+                # first scalp-route strategy (cost order) that fired
+                scalp_side = next((signals[s.name] for s in self.scalp_strats if signals.get(s.name)), None)
+                if scalp_side and self.can_open_scalp(scalp_side):
                     try:
-                        est_sym = self.dc.pick_atm_symbol(side)
-                        est_entry = self.dc.get_ltp(est_sym)
+                        est_entry = self.estimate_entry(scalp_side)
                     except Exception:
                         est_entry = None
 
-                    if is_core:
-                        if self.can_new_entry_with_sl(est_entry or 0.0, INIT_SL_PCT):
-                            self.create_position(side=side, is_core=True, note=note)
-                            entered_this_tick = True
-                            # Disarm this side for core until pullback / OR-band / timed re-arm
-                            if side == 'CE':
-                                self.orb.long_armed = False
-                            else:
-                                self.orb.short_armed = False
-                    else:
-                        if self.can_new_entry_with_sl(est_entry or 0.0, SCALP_SL_PCT):
-                            self.create_scalp_position(side)
-                            entered_this_tick = True
-
-                # ---- BB Range Scalp (if no core entered this tick) ----
-                if SCALP_ENABLED and not entered_this_tick:
-                    can_scalp = (
-                            (self.scalp_cooldown_until is None or now_ist() >= self.scalp_cooldown_until)
-                            and self.realized_pnl > -MAX_DAILY_LOSS_INR
-                            and len(self.positions) < MAX_CONCURRENT_POS
-                    )
-                    if can_scalp:
-                        scalp_side = self.bb_scalp.signal()  # 'CE'/'PE'/None
-                        if scalp_side and self.can_open_scalp(scalp_side):
-                            try:
-                                est_sym = self.dc.pick_atm_symbol(scalp_side)
-                                est_entry = self.dc.get_ltp(est_sym)
-                            except Exception:
-                                est_entry = None
-
-                            if self.can_new_entry_with_sl(est_entry or 0.0, SCALP_SL_PCT):
-                                self.create_scalp_position(scalp_side)
-                                entered_this_tick = True
-
-                # ---- Secondary strategies (if no core entered this tick) ----
-                if not entered_this_tick:
-                    try:
-                        sec_side = self.pick_secondary_signal(idx, rsi_val)  # 'CE'/'PE'/None
-                    except Exception as e:
-                        log("STRAT_ERR", reason=f"secondary signal error: {e}", day_pnl=self.realized_pnl)
-                        sec_side = None
-
-                    # RSI slope gate first (decisive momentum)
-                    if sec_side and not self.rsi_momentum_allows(sec_side, rsi_val):
-                        try:
-                            slope = self.rsi_slope()
-                            slope_txt = f"{slope:.2f}" if slope is not None else "NA"
-                        except Exception:
-                            slope_txt = "NA"
-                        log("SIG_BLOCK", reason=f"{sec_side} blocked by RSI slope (ΔRSI={slope_txt})", day_pnl=self.realized_pnl)
-                        sec_side = None
-
-                    # Optional: scalp concurrency guard (if you implemented can_open_scalp)
-                    if sec_side and hasattr(self, "can_open_scalp") and not self.can_open_scalp(sec_side):
-                        log("SIG_BLOCK", reason=f"{sec_side} scalp blocked by can_open_scalp()",
-                            day_pnl=self.realized_pnl)
-                        sec_side = None
-
-                    # Try to estimate entry (ATM option) for projected risk check
-                    est_entry = None
-                    if sec_side:
-                        try:
-                            est_sym = self.dc.pick_atm_symbol(sec_side)
-                            est_entry = self.dc.get_ltp(est_sym)
-                        except Exception as e:
-                            log("QUOTES_ERR", reason=f"estimate failed for {sec_side}: {e}", day_pnl=self.realized_pnl)
-
-                    # Projected-risk gate + place scalp
-                    if sec_side and est_entry and self.can_new_entry_with_sl(est_entry, SCALP_SL_PCT):
-                        self.create_scalp_position(sec_side)
+                    if self.can_new_entry_with_sl(est_entry or 0.0, SCALP_SL_PCT):
+                        self.create_scalp_position(scalp_side)
                         entered_this_tick = True
-                    else:
-                        # Keep sec_side=None so diagnostics can run below if nothing entered
-                        sec_side = None
 
-                # If nothing entered, log diagnostics (throttled & on-change)
-                if not entered_this_tick:
-                    self.log_signal_diagnostics(idx, rsi_val)
+        # ---- Secondary strategies (if no core entered this tick) ----
+        if not entered_this_tick:
+            try:
+                sec_side = self.pick_secondary_signal(idx, rsi_val, signals)  # 'CE'/'PE'/None
+            except Exception as e:
+                log("STRAT_ERR", reason=f"secondary signal error: {e}", day_pnl=self.realized_pnl)
+                sec_side = None
+
+            # RSI slope gate first (decisive momentum)
+            if sec_side and not self.rsi_momentum_allows(sec_side, rsi_val):
+                try:
+                    slope = self.rsi_slope()
+                    slope_txt = f"{slope:.2f}" if slope is not None else "NA"
+                except Exception:
+                    slope_txt = "NA"
+                publish(Signal(now_ist(), "SIG_BLOCK", f"{sec_side} blocked by RSI slope (ΔRSI={slope_txt})", self.realized_pnl))
+                sec_side = None
+
+            # Optional: scalp concurrency guard (if you implemented can_open_scalp)
+            if sec_side and hasattr(self, "can_open_scalp") and not self.can_open_scalp(sec_side):
+                publish(Signal(now_ist(), "SIG_BLOCK", f"{sec_side} scalp blocked by can_open_scalp()", self.realized_pnl))
+                sec_side = None
+
+            # Try to estimate entry (ATM option) for projected risk check
+            est_entry = None
+            if sec_side:
+                try:
+                    est_entry = self.estimate_entry(sec_side)
+                except Exception as e:
+                    log("QUOTES_ERR", reason=f"estimate failed for {sec_side}: {e}", day_pnl=self.realized_pnl)
+
+            # Projected-risk gate + place scalp
+            if sec_side and est_entry and self.can_new_entry_with_sl(est_entry, SCALP_SL_PCT):
+                self.create_scalp_position(sec_side)
+                entered_this_tick = True
+            else:
+                # Keep sec_side=None so diagnostics can run below if nothing entered
+                sec_side = None
+
+        # If nothing entered, log diagnostics (throttled & on-change)
+        if not entered_this_tick:
+            self.log_signal_diagnostics(idx, rsi_val)
 
-                time.sleep(0.8)
+        return self.tick_sleep()
 
+    def end_session(self):
+        # ---- EoD summary (even on exceptions) ----
+        stats = summarize(self.trades)
+
+        def srow(name, value):
+            try:
+                num = float(value)
+            except Exception:
+                num = 0.0
+            log("SUMMARY", reason=name, pnl=num, extra=str(value), day_pnl=self.realized_pnl)
+
+        for k in [
+            "total", "wins", "losses", "flats", "win_rate",
+            "total_pnl", "avg_pnl", "avg_win", "avg_loss",
+            "profit_factor", "avg_hold", "best", "worst"
+        ]:
+            srow(k, stats[k])
+        srow("max_drawdown", self.max_drawdown)
+
+        # Console
+        print("\n========== EOD SUMMARY ==========")
+        for k, v in stats.items():
+            print(f"{k:>12}: {v}")
+        print(f"{'max_drawdown':>12}: {self.max_drawdown:.2f}")
+        print("=================================\n")
+        profiler.session_end()
+        self.executor.shutdown()  # restarted by the next session's first evaluation (service mode)
+        BUS.flush()  # the day's rows are on disk before the next session rotates the log
+
+    def metric_samples(self) -> list:
+        """State gauges for metrics.py, read from memory (same source as snapshots/diagnostics)."""
+        u = (("underlying", self.inst.name),)
+        now = now_ist()
+
+        def left(ts):
+            return max(0.0, (ts - now).total_seconds()) if ts else 0.0
+
+        out = [
+            ("realized_pnl", u, self.realized_pnl),
+            ("unrealized_pnl", u, self.portfolio.unrealized),
+            ("pnl_at_stops", u, self.portfolio.at_sl),
+            ("open_positions", u, len(self.positions)),
+            ("trades_closed", u, len(self.trades)),
+            ("daily_loss_hit", u, float(self.daily_loss_hit())),
+            ("cooldown_seconds", u + (("kind", "core"),), left(self.cooldown_until)),
+            ("cooldown_seconds", u + (("kind", "scalp"),), left(self.scalp_cooldown_until)),
+            ("armed", u + (("side", "CE"),), float(bool(self.orb.long_armed))),
+            ("armed", u + (("side", "PE"),), float(bool(self.orb.short_armed))),
+        ]
+        if self.last_idx is not None:
+            out.append(("index_ltp", u, self.last_idx))
+        if self.sched is not None:
+            out += [("poll_calls_per_min", u, self.sched.used_per_min()), ("poll_budget_scale", u, self.sched.scale)]
+        if self.rsi_val is not None:
+            out.append(("rsi", u, self.rsi_val))
+        for name in ("or_high", "or_low", "entry_hi_buf", "entry_lo_buf"):
+            v = getattr(self.orb, name, None)
+            if v is not None:
+                out.append((name, u, v))
+        for p in self.positions:
+            pl = u + (("symbol", p.symbol), ("side", p.side), ("kind", "core" if p.is_core else "scalp"))
+            ltp = self.portfolio.ltp(p)
+            out += [("position_entry", pl, p.entry_price), ("position_sl", pl, p.sl_price),
+                    ("position_tp", pl, p.tp_price)]
+            if ltp is not None:
+                out.append(("position_ltp", pl, ltp))
+        return out
+
+    def publish_metrics(self, tick_sec: float):
+        if self.metrics is None:
+            return
+        self.metrics.inc("ticks_total", underlying=self.inst.name)
+        self.metrics.observe("tick_seconds", tick_sec, underlying=self.inst.name)
+        self.metrics.publish(self.inst.name, self.metric_samples())
+
+    def run(self, allow_yday: bool = USE_YDAY_WHEN_TODAY_EMPTY):
+        self.start_session(allow_yday)
+        try:
+            while True:
+                t0 = time.perf_counter()
+                pause = self.tick()
+                self.publish_metrics(time.perf_counter() - t0)
+                if pause is None:
+                    break
+                time.sleep(pause)
         finally:
-            # ---- EoD summary (even on exceptions) ----
-            stats = summarize(self.trades)
+            self.end_session()
+
+    # ============ Persistent service mode ============
 
-            def srow(name, value):
+    def roll_session(self, reauth=None):
+        """
+        New trading day without a restart: rotate the CSV log, expiry and checkpoint,
+        reset per-day state, keep the bar store, symbol/seed caches and broker client warm.
+        """
+        day = now_ist().date()
+        rotate_log(day)
+        self.dc.roll_day(expiry_code_for(day) if AUTO_ROLL_EXPIRY else (self.inst.expiry_code or expiry_code_for(day)))
+        self.reset_session_state()
+        try:
+            self.session_header()
+        except Exception as e:
+            if reauth is None:
+                raise
+            log("AUTH_WARN", reason=f"Re-authenticating after: {str(e)[:120]}")
+            self.fyers = reauth()
+            self.dc.fyers = self.fyers
+            if self.orders is not None:
+                self.orders.rebind(self.fyers)
+            self.session_header()
+
+    def run_forever(self, reauth=None):
+        """Daemon loop: one session per weekday, sleeping until SERVICE_WAKE_IST in between."""
+        session_day = now_ist().date()  # __init__ already prepared today's session
+        while True:
+            now = now_ist()
+            if now.weekday() < 5 and now.time() < SQUARE_OFF_IST:
                 try:
-                    num = float(value)
-                except Exception:
-                    num = 0.0
-                log("SUMMARY", reason=name, pnl=num, extra=str(value), day_pnl=self.realized_pnl)
-
-            for k in [
-                "total", "wins", "losses", "flats", "win_rate",
-                "total_pnl", "avg_pnl", "avg_win", "avg_loss",
-                "profit_factor", "avg_hold", "best", "worst"
-            ]:
-                srow(k, stats[k])
-            srow("max_drawdown", self.max_drawdown)
-
-            # Console
-            print("\n========== EOD SUMMARY ==========")
-            for k, v in stats.items():
-                print(f"{k:>12}: {v}")
-            print(f"{'max_drawdown':>12}: {self.max_drawdown:.2f}")
-            print("=================================\n")
+                    if now.date() != session_day:
+                        self.roll_session(reauth)
+                        session_day = now.date()
+                    # no 1m bars for today at ORB end (holiday) -> skip the day instead of replaying yesterday
+                    self.run(allow_yday=False)
+                except Exception as e:
+                    log("SESSION_SKIP", reason=f"{type(e).__name__}: {str(e)[:160]}", day_pnl=self.realized_pnl)
+                session_day = now.date()
+
+            wake = IST.localize(dt.datetime.combine(now_ist().date() + dt.timedelta(days=1), SERVICE_WAKE_IST))
+            log("SERVICE_SLEEP", reason=f"Next wake {wake.strftime('%Y-%m-%d %H:%M')}")
+            while now_ist() < wake:
+                time.sleep(min(60.0, max(1.0, (wake - now_ist()).total_seconds())))
@@ -0,0 +1,303 @@
+# events.py
+import time, atexit, logging, threading, datetime as dt
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from config import EVENT_FLUSH_SEC
+from diagnostics import TickState, diag_rows, snapshot_rows
+
+
+def pos_state_row(tag: str, symbol: str, side: str, qty: int, entry: float, ltp: float, sl: float, tp: float,
+                  day_pnl: float, extra: str = "") -> dict:
+    snap = f"EP={entry:.2f} CP={ltp:.2f} SL={sl:.2f} TP={tp:.2f}"
+    if extra:
+        snap += f" | {extra}"
+    return dict(event=tag, symbol=symbol, side=side, price=ltp, qty=qty, reason=snap, day_pnl=day_pnl)
+
+
+# ============ Typed events ============
+# Values are copied in by the trading thread; rows() (the CSV form, logging_utils columns
+# without the timestamp) is only built on the subscriber side.
+
+@dataclass(frozen=True)
+class Event:
+    ts: dt.datetime
+
+    def rows(self) -> List[dict]:
+        raise NotImplementedError
+
+
+@dataclass(frozen=True)
+class Row(Event):
+    """Free-form log row: everything that is not one of the typed events below."""
+    event: str
+    symbol: str = ""
+    side: str = ""
+    price: float = 0.0
+    qty: int = 0
+    reason: str = ""
+    pnl: float = 0.0
+    day_pnl: float = 0.0
+    extra: str = ""
+
+    def rows(self):
+        return [dict(event=self.event, symbol=self.symbol, side=self.side, price=self.price, qty=self.qty,
+                     reason=self.reason, pnl=self.pnl, day_pnl=self.day_pnl, extra=self.extra)]
+
+
+@dataclass(frozen=True)
+class Enter(Event):
+    symbol: str
+    side: str
+    price: float
+    qty: int
+    core: bool
+    ltp: float
+    sl: float
+    tp: float
+    day_pnl: float
+
+    def rows(self):
+        return [dict(event="ENTER", symbol=self.symbol, side=self.side, price=self.price, qty=self.qty,
+                     reason=f"New {'CORE' if self.core else 'SCALP'}", day_pnl=self.day_pnl),
+                pos_state_row("ENTER_STATE", self.symbol, self.side, self.qty, self.price, self.ltp,
+                              self.sl, self.tp, self.day_pnl)]
+
+
+@dataclass(frozen=True)
+class Exit(Event):
+    symbol: str
+    side: str
+    price: float
+    qty: int
+    reason: str
+    pnl: float
+    day_pnl: float
+    entry: float
+    sl: float
+    tp: float
+    held_qty: int          # position size before this exit
+    closed: bool           # False for a partial exit
+    pos: Any = field(default=None, compare=False, repr=False)   # the Position (path recorder)
+
+    def rows(self):
+        return [pos_state_row("EXIT_STATE", self.symbol, self.side, self.held_qty, self.entry, self.price,
+                              self.sl, self.tp, self.day_pnl - self.pnl, f"reason={self.reason}"),
+                dict(event="EXIT", symbol=self.symbol, side=self.side, price=self.price, qty=self.qty,
+                     reason=self.reason, pnl=self.pnl, day_pnl=self.day_pnl)]
+
+
+@dataclass(frozen=True)
+class SLMoved(Event):
+    kind: str              # SL_TO_BE / TRAIL_SL
+    symbol: str
+    side: str
+    qty: int
+    entry: float
+    ltp: float
+    old: float
+    new: float
+    tp: float
+    profit_pct: float
+    note: str              # SL_UPDATE extra: "breakeven" / "level=..."
+    day_pnl: float
+
+    def rows(self):
+        return [dict(event=self.kind, symbol=self.symbol, side=self.side, price=self.ltp,
+                     reason=f"Profit {self.profit_pct:.1f}% -> SL {self.old:.2f} -> {self.new:.2f}",
+                     day_pnl=self.day_pnl),
+                pos_state_row("SL_UPDATE", self.symbol, self.side, self.qty, self.entry, self.ltp,
+                              self.new, self.tp, self.day_pnl, self.note)]
+
+
+@dataclass(frozen=True)
+class TPAdjusted(Event):
+    symbol: str
+    side: str
+    qty: int
+    entry: float
+    ltp: float
+    old: float
+    new: float
+    sl: float
+    held_min: float
+    profit_pct: float
+    day_pnl: float
+
+    def rows(self):
+        return [dict(event="ADJUST_TP", symbol=self.symbol, side=self.side, price=self.ltp,
+                     reason=f"TP {self.old:.2f} -> {self.new:.2f} (held {self.held_min:.1f}m, profit {self.profit_pct:.1f}%)",
+                     day_pnl=self.day_pnl),
+                pos_state_row("TP_UPDATE", self.symbol, self.side, self.qty, self.entry, self.ltp, self.sl,
+                              self.new, self.day_pnl, f"held={self.held_min:.1f}m profit={self.profit_pct:.1f}%")]
+
+
+@dataclass(frozen=True)
+class Signal(Event):
+    """Signal-side state change: MOMENTUM_SHIFT, PRICE_STATE, REARM, SIG_BLOCK."""
+    event: str
+    reason: str
+    day_pnl: float
+
+    def rows(self):
+        return [dict(event=self.event, reason=self.reason, day_pnl=self.day_pnl)]
+
+
+@dataclass(frozen=True)
+class Diag(Event):
+    state: TickState
+    masks: Dict[str, int]
+    day_pnl: float
+
+    def rows(self):
+        return [dict(event=e, reason=r, extra=x, day_pnl=self.day_pnl) for e, r, x in diag_rows(self.state, self.masks)]
+
+
+@dataclass(frozen=True)
+class Snapshot(Event):
+    symbol: str
+    state: TickState
+    positions: Tuple[Any, ...]        # copies taken at publish time
+    marks: Tuple[Optional[float], ...]
+    day_pnl: float
+
+    def rows(self):
+        ltp = dict(zip(map(id, self.positions), self.marks))
+        return [dict(event=e, symbol=self.symbol if e == "SNAPSHOT" else "", reason=r, day_pnl=self.day_pnl)
+                for e, r in snapshot_rows(self.state, self.positions, lambda p: ltp.get(id(p)))]
+
+
+# ============ Bus ============
+
+class _Sub:
+    def __init__(self, name: str, handler: Callable[[List[Event]], None], kinds, maxlen: Optional[int]):
+        self.name = name
+        self.handler = handler
+        self.kinds = kinds
+        self.q: deque = deque(maxlen=maxlen)
+        self.dropped = 0
+        self.busy = False
+        self.thread: Optional[threading.Thread] = None
+
+    def wants(self, ev: Event) -> bool:
+        return self.kinds is None or isinstance(ev, self.kinds)
+
+    def handle(self, batch: List[Event]):
+        try:
+            self.handler(batch)
+        except Exception:
+            logging.exception(f"event subscriber '{self.name}' failed on {len(batch)} events")
+
+    def drain(self):
+        self.busy = True
+        batch = []
+        try:
+            while True:
+                batch.append(self.q.popleft())
+        except IndexError:
+            pass
+        if batch:
+            self.handle(batch)
+        self.busy = False
+
+
+class EventBus:
+    """
+    Fan-out of typed events to named subscribers (CSV writer, metrics, path recorder, ...).
+    Until start() publish() calls each subscriber inline, so replays and tools stay
+    deterministic. After start() the publisher only appends to each subscriber's deque (atomic
+    in CPython, no lock) and every subscriber drains its own deque in batches on its own thread
+    every `flush_sec`: a slow sink never delays the tick or the other sinks. A subscriber with
+    `maxlen` drops its oldest events when it falls behind (counted in dropped()); without one
+    it keeps everything.
+    """
+    def __init__(self, flush_sec: float = EVENT_FLUSH_SEC):
+        self.flush_sec = flush_sec
+        self._subs: Tuple[_Sub, ...] = ()    # replaced, never mutated: publish() iterates without a lock
+        self._lock = threading.Lock()        # subscribe / start / stop only
+        self._stop = threading.Event()
+        self._started = False
+
+    def subscribe(self, name: str, handler: Callable[[List[Event]], None], kinds: Optional[Sequence[type]] = None,
+                  maxlen: Optional[int] = None):
+        """Add (or, with an existing name, replace) a subscriber; kinds limits it to those event types."""
+        sub = _Sub(name, handler, tuple(kinds) if kinds else None, maxlen)
+        with self._lock:
+            old = [s for s in self._subs if s.name == name]
+            self._subs = tuple(s for s in self._subs if s.name != name) + (sub,)
+            if self._started:
+                self._run(sub)
+        for s in old:
+            s.drain()
+
+    def unsubscribe(self, name: str):
+        with self._lock:
+            old = [s for s in self._subs if s.name == name]
+            self._subs = tuple(s for s in self._subs if s.name != name)
+        for s in old:
+            s.drain()
+
+    def publish(self, ev: Event):
+        if not self._started:
+            for s in self._subs:
+                if s.wants(ev):
+                    s.handle([ev])
+            return
+        for s in self._subs:
+            if s.wants(ev):
+                if s.q.maxlen is not None and len(s.q) >= s.q.maxlen:
+                    s.dropped += 1
+                s.q.append(ev)
+
+    def dropped(self) -> Dict[str, int]:
+        return {s.name: s.dropped for s in self._subs}
+
+    # ---- background delivery ----
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._stop.clear()
+            for s in self._subs:
+                self._run(s)
+        atexit.register(self.stop)
+
+    def _run(self, sub: _Sub):
+        def loop():
+            while not self._stop.is_set() and sub in self._subs:
+                sub.drain()
+                self._stop.wait(self.flush_sec)
+            sub.drain()
+        sub.thread = threading.Thread(target=loop, name=f"events-{sub.name}", daemon=True)
+        sub.thread.start()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until every queued event has been handled (session end, log rotation)."""
+        if not self._started:
+            return True
+        end = time.monotonic() + timeout
+        while any(s.q or s.busy for s in self._subs):
+            if time.monotonic() >= end:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self):
+        """Deliver what is queued and go back to inline delivery."""
+        with self._lock:
+            if not self._started:
+                return
+            self._stop.set()
+            subs = self._subs
+        for s in subs:
+            if s.thread is not None:
+                s.thread.join(timeout=5.0)
+        with self._lock:
+            self._started = False
+        for s in subs:   # anything published while the threads wound down
+            s.drain()
+
+
+BUS = EventBus()
+publish = BUS.publish
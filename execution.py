@@ -0,0 +1,380 @@
+# execution.py
+import queue, random, threading, itertools, time, datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+from config import (EXEC_PRODUCT_TYPE, EXEC_POLL_SEC, EXEC_ORDER_TIMEOUT_SEC,
+                    EXEC_FAKE_LATENCY_SEC, EXEC_FAKE_SLIPPAGE_TICKS, EXEC_FAKE_PARTIAL_PROB, TICK_SIZE,
+                    EXEC_BASKET_WORKERS)
+from logging_utils import ist_now
+from data import parse_quotes
+
+# Fyers order book status codes / order types
+FYERS_STATUS = {1: "CANCELLED", 2: "FILLED", 4: "TRANSIT", 5: "REJECTED", 6: "PENDING", 7: "EXPIRED"}
+TERMINAL = {"FILLED", "CANCELLED", "REJECTED", "EXPIRED"}
+LIMIT, MARKET, STOP_MARKET = 1, 2, 3
+BUY, SELL = 1, -1
+
+
+def tick_round(px: float, tick: float = TICK_SIZE) -> float:
+    return round(round(px / tick) * tick, 2)
+
+
+@dataclass
+class Order:
+    tag: str
+    owner: str               # engine (underlying) that drains this order's updates
+    symbol: str
+    side: int                # BUY / SELL
+    qty: int
+    purpose: str             # "entry" | "exit"
+    ref_price: float         # LTP the decision was taken at (slippage baseline)
+    order_type: int = MARKET
+    limit_price: float = 0.0
+    stop_price: float = 0.0
+    submitted_at: Optional[dt.datetime] = None
+    broker_id: Optional[str] = None
+    status: str = "NEW"
+    filled_qty: int = 0
+    avg_price: float = 0.0
+    done_at: Optional[dt.datetime] = None
+    message: str = ""
+    meta: dict = field(default_factory=dict)
+
+    @property
+    def terminal(self) -> bool:
+        return self.status in TERMINAL
+
+    @property
+    def latency_ms(self) -> Optional[float]:
+        """Submit -> terminal status as observed by the poller (resolution EXEC_POLL_SEC)."""
+        if self.submitted_at is None or self.done_at is None:
+            return None
+        return (self.done_at - self.submitted_at).total_seconds() * 1000.0
+
+    @property
+    def slippage(self) -> float:
+        """Adverse fill vs decision price, per unit (positive = paid more / received less)."""
+        return (self.avg_price - self.ref_price) * self.side if self.filled_qty else 0.0
+
+
+class OrderManager:
+    """
+    Non-blocking order path over the Fyers order APIs (place_order / orderbook / modify_order /
+    cancel_order). The tick loop only enqueues: one worker thread sends requests in order, one
+    poller thread reads the order book every `poll_sec`, and every state change is queued per
+    owner for the engine to reconcile on its next tick (drain). Unfilled remainders are
+    cancelled after `timeout_sec`. A basket (submit_many) is placed concurrently by up to
+    `basket_workers` threads, so the last order of a square-off is not queued behind the others.
+    """
+    def __init__(self, fyers, logger, poll_sec: float = EXEC_POLL_SEC, timeout_sec: float = EXEC_ORDER_TIMEOUT_SEC,
+                 product: str = EXEC_PRODUCT_TYPE, basket_workers: int = EXEC_BASKET_WORKERS):
+        self.fyers = fyers
+        self.log = logger
+        self.poll_sec = poll_sec
+        self.timeout_sec = timeout_sec
+        self.product = product
+        self._seq = itertools.count(1)
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._updates: Dict[str, "queue.Queue"] = {}
+        self._live: Dict[str, Order] = {}        # broker id -> working order
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, basket_workers), thread_name_prefix="orders-basket")
+        threading.Thread(target=self._work, name="orders-send", daemon=True).start()
+        threading.Thread(target=self._poll_loop, name="orders-poll", daemon=True).start()
+
+    # ---- engine side (never blocks on the network) ----
+    def new_order(self, owner: str, symbol: str, side: int, qty: int, purpose: str, ref_price: float,
+                  **kw) -> Order:
+        return Order(tag=f"{owner[:6]}{next(self._seq)}", owner=owner, symbol=symbol, side=side, qty=qty,
+                     purpose=purpose, ref_price=ref_price, **kw)
+
+    def submit(self, order: Order) -> Order:
+        order.submitted_at = ist_now()
+        order.status = "SUBMITTING"
+        self._jobs.put(("place", order, None))
+        return order
+
+    def submit_many(self, orders: List[Order]) -> List[Order]:
+        """Send several orders together (one job, placed concurrently)."""
+        now = ist_now()
+        for o in orders:
+            o.submitted_at = now
+            o.status = "SUBMITTING"
+        if orders:
+            self._jobs.put(("basket", orders, None))
+        return orders
+
+    def modify(self, order: Order, **fields):
+        """Change stop/limit price or qty of a working order (fields in Fyers names: stopPrice, limitPrice, qty)."""
+        self._jobs.put(("modify", order, fields))
+
+    def cancel(self, order: Order):
+        self._jobs.put(("cancel", order, None))
+
+    def drain(self, owner: str) -> List[Order]:
+        """Orders of `owner` that changed since the last drain (each once, current state)."""
+        q = self._queue(owner)
+        out: Dict[int, Order] = {}
+        while True:
+            try:
+                o = q.get_nowait()
+            except queue.Empty:
+                return list(out.values())
+            out[id(o)] = o
+
+    def working(self) -> int:
+        with self._lock:
+            return len(self._live) + self._jobs.qsize()
+
+    def cancel_stale(self, symbols: Iterable[str]) -> int:
+        """
+        Cancel working orders on `symbols` that this manager does not track, i.e. left at the
+        broker by a previous process (a resumed position's old stop). Blocking; returns how many.
+        """
+        resp = self.fyers.orderbook()
+        if not isinstance(resp, dict) or resp.get("s") != "ok":
+            raise RuntimeError(str(resp)[:160])
+        want = set(symbols)
+        with self._lock:
+            mine = set(self._live)
+        n = 0
+        for row in resp.get("orderBook") or []:
+            if row.get("symbol") in want and str(row.get("id")) not in mine \
+                    and FYERS_STATUS.get(row.get("status")) in ("PENDING", "TRANSIT"):
+                self.fyers.cancel_order(data={"id": row.get("id")})
+                n += 1
+        return n
+
+    def rebind(self, fyers):
+        """New broker client after re-auth (paper mode keeps its FakeExchange, with the new feed)."""
+        if isinstance(self.fyers, FakeExchange):
+            self.fyers.feed = fyers
+        else:
+            self.fyers = fyers
+
+    def stop(self):
+        self._stop.set()
+        self._jobs.put(None)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued place/modify/cancel has been sent; False on timeout."""
+        end = time.monotonic() + timeout
+        while self._jobs.unfinished_tasks:
+            if time.monotonic() >= end:
+                return False
+            time.sleep(0.002)
+        return True
+
+    # ---- background ----
+    def _queue(self, owner: str) -> "queue.Queue":
+        with self._lock:
+            return self._updates.setdefault(owner, queue.Queue())
+
+    def _emit(self, order: Order):
+        self._queue(order.owner).put(order)
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self._jobs.get()
+            if job is None:
+                return
+            try:
+                self._run(job)
+            finally:
+                self._jobs.task_done()
+
+    def _run(self, job):
+        kind, order, fields = job
+        if kind == "place":
+            self._place_safe(order)
+            return
+        if kind == "basket":
+            list(self._pool.map(self._place_safe, order))
+            return
+        try:
+            if kind == "modify" and order.broker_id and not order.terminal:
+                resp = self.fyers.modify_order(data={"id": order.broker_id, **fields})
+                if not isinstance(resp, dict) or resp.get("s") != "ok":
+                    self.log("ORDER_ERR", symbol=order.symbol, reason=f"modify {order.tag}: {str(resp)[:160]}")
+                else:
+                    order.stop_price = fields.get("stopPrice", order.stop_price)
+                    order.limit_price = fields.get("limitPrice", order.limit_price)
+            elif kind == "cancel" and order.broker_id and not order.terminal:
+                self.fyers.cancel_order(data={"id": order.broker_id})
+        except Exception as e:
+            self.log("ORDER_ERR", symbol=order.symbol, reason=f"{kind} {order.tag}: {type(e).__name__}: {str(e)[:160]}")
+
+    def _place_safe(self, order: Order):
+        try:
+            self._place(order)
+        except Exception as e:
+            self.log("ORDER_ERR", symbol=order.symbol, reason=f"place {order.tag}: {type(e).__name__}: {str(e)[:160]}")
+            self._finish(order, "REJECTED", str(e)[:160])
+
+    def _place(self, order: Order):
+        payload = {
+            "symbol": order.symbol, "qty": order.qty, "type": order.order_type, "side": order.side,
+            "productType": self.product, "limitPrice": order.limit_price, "stopPrice": order.stop_price,
+            "validity": "DAY", "disclosedQty": 0, "offlineOrder": False, "orderTag": order.tag,
+        }
+        resp = self.fyers.place_order(data=payload)
+        if not isinstance(resp, dict) or resp.get("s") != "ok" or not resp.get("id"):
+            self._finish(order, "REJECTED", str(resp)[:160])
+            return
+        order.broker_id = str(resp["id"])
+        order.status = "PENDING"
+        with self._lock:
+            self._live[order.broker_id] = order
+
+    def _finish(self, order: Order, status: str, message: str = ""):
+        order.status = status
+        order.message = message
+        order.done_at = ist_now()
+        with self._lock:
+            self._live.pop(order.broker_id, None)
+        self._emit(order)
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_sec):
+            with self._lock:
+                idle = not self._live
+            if idle:
+                continue
+            try:
+                self.poll()
+            except Exception as e:
+                self.log("ORDER_ERR", reason=f"orderbook: {type(e).__name__}: {str(e)[:160]}")
+
+    def poll(self):
+        """One order-book read; emits every order whose fill or status changed."""
+        resp = self.fyers.orderbook()
+        if not isinstance(resp, dict) or resp.get("s") != "ok":
+            raise RuntimeError(str(resp)[:160])
+        now = ist_now()
+        for row in resp.get("orderBook") or []:
+            with self._lock:
+                order = self._live.get(str(row.get("id")))
+            if order is None:
+                continue
+            status = FYERS_STATUS.get(row.get("status"), order.status)
+            filled = int(row.get("filledQty") or 0)
+            if status in TERMINAL:
+                order.filled_qty = filled
+                order.avg_price = float(row.get("tradedPrice") or order.avg_price)
+                self._finish(order, status, str(row.get("message") or ""))
+                continue
+            if filled != order.filled_qty:
+                order.filled_qty = filled
+                order.avg_price = float(row.get("tradedPrice") or order.avg_price)
+                status = "PARTIAL"
+                order.status = status
+                self._emit(order)
+            order.status = status
+            if order.order_type == MARKET and not order.meta.get("cancel_sent") \
+                    and (now - order.submitted_at).total_seconds() > self.timeout_sec:
+                order.meta["cancel_sent"] = True
+                self.cancel(order)   # unfilled remainder; the cancel shows up as a terminal status
+
+
+class FakeExchange:
+    """
+    Local stand-in for the Fyers order endpoints, for paper trading and replays. Market data
+    (quotes / history / get_profile) is passed through to `feed` (real client or SyntheticBroker).
+    Orders rest for `latency_sec` of ist_now() time (virtual under replay), then market orders
+    fill at the feed LTP moved `slippage_ticks` against us; with `partial_prob` a fill comes in
+    two halves one latency apart. SL-M orders trigger when the LTP crosses stopPrice, limit
+    orders fill at their price once the LTP reaches it.
+    """
+    def __init__(self, feed, latency_sec: float = EXEC_FAKE_LATENCY_SEC, slippage_ticks: int = EXEC_FAKE_SLIPPAGE_TICKS,
+                 partial_prob: float = EXEC_FAKE_PARTIAL_PROB, tick_size: float = TICK_SIZE,
+                 seed: Optional[int] = None):
+        self.feed = feed
+        self.latency = dt.timedelta(seconds=latency_sec)
+        self.slip = slippage_ticks * tick_size
+        self.partial_prob = partial_prob
+        self.rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._book: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):  # quotes / history / get_profile ...
+        return getattr(self.feed, name)
+
+    def _ltp(self, symbol: str) -> Optional[float]:
+        hit = parse_quotes(self.feed.quotes({"symbols": symbol})).get(symbol)
+        return hit[0] if hit else None
+
+    def place_order(self, data: dict) -> dict:
+        oid = f"FAKE{next(self._ids)}"
+        with self._lock:
+            self._book[oid] = {
+                "id": oid, "symbol": data["symbol"], "qty": int(data["qty"]), "side": int(data["side"]),
+                "type": int(data["type"]), "limitPrice": float(data.get("limitPrice") or 0.0),
+                "stopPrice": float(data.get("stopPrice") or 0.0), "status": 6, "filledQty": 0,
+                "tradedPrice": 0.0, "orderTag": data.get("orderTag", ""), "message": "",
+                "_due": ist_now() + self.latency,
+                "_split": self.rng.random() < self.partial_prob and int(data["qty"]) > 1,
+            }
+        return {"s": "ok", "id": oid}
+
+    def modify_order(self, data: dict) -> dict:
+        with self._lock:
+            o = self._book.get(str(data.get("id")))
+            if o is None or o["status"] != 6:
+                return {"s": "error", "message": "order not open"}
+            for k in ("limitPrice", "stopPrice"):
+                if k in data:
+                    o[k] = float(data[k])
+            if "qty" in data:
+                o["qty"] = max(int(data["qty"]), o["filledQty"])
+        return {"s": "ok", "id": o["id"]}
+
+    def cancel_order(self, data: dict) -> dict:
+        with self._lock:
+            o = self._book.get(str(data.get("id")))
+            if o is None or o["status"] != 6:
+                return {"s": "error", "message": "order not open"}
+            o["status"], o["message"] = 1, "cancelled"
+        return {"s": "ok", "id": o["id"]}
+
+    def _fill(self, o: dict, qty: int, px: float):
+        total = o["filledQty"] + qty
+        o["tradedPrice"] = (o["tradedPrice"] * o["filledQty"] + px * qty) / total
+        o["filledQty"] = total
+        if total >= o["qty"]:
+            o["status"] = 2
+
+    def orderbook(self, data=None) -> dict:
+        now = ist_now()
+        with self._lock:
+            working = [o for o in self._book.values() if o["status"] == 6 and now >= o["_due"]]
+        for o in working:
+            ltp = self._ltp(o["symbol"])
+            if ltp is None:
+                continue
+            with self._lock:
+                if o["status"] != 6:
+                    continue
+                if o["type"] == MARKET:
+                    px = round(max(ltp + o["side"] * self.slip, TICK_SIZE), 2)
+                elif o["type"] == STOP_MARKET:
+                    crossed = ltp <= o["stopPrice"] if o["side"] == SELL else ltp >= o["stopPrice"]
+                    if not crossed:
+                        continue
+                    px = round(max(ltp + o["side"] * self.slip, TICK_SIZE), 2)
+                else:
+                    reached = ltp >= o["limitPrice"] if o["side"] == SELL else ltp <= o["limitPrice"]
+                    if not reached:
+                        continue
+                    px = o["limitPrice"]
+                left = o["qty"] - o["filledQty"]
+                if o["_split"] and o["filledQty"] == 0:
+                    self._fill(o, max(1, left // 2), px)
+                    o["_due"] = now + self.latency
+                else:
+                    self._fill(o, left, px)
+        with self._lock:
+            rows = [{k: v for k, v in o.items() if not k.startswith("_")} for o in self._book.values()]
+        return {"s": "ok", "orderBook": rows}
@@ -0,0 +1,247 @@
+# exit_optimizer.py
+import os, sys, glob, json, time, itertools, datetime as dt
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from config import (LOG_DIR, COST_PER_SIDE_INR, INIT_SL_PCT, INIT_TP_PCT, TRAIL_STEPS,
+                    BREAKEVEN_AT_PROFIT_PCT, BREAKEVEN_OFFSET_PCT,
+                    CORE_DD_HARD_DROP_PCT, SCALP_DD_HARD_DROP_PCT,
+                    CORE_MIN_PEAK_GAIN_BEFORE_DD_PCT, SCALP_MIN_PEAK_GAIN_BEFORE_DD_PCT,
+                    IMPULSE_WINDOW_SEC, IMPULSE_WIN_PCT, IMPULSE_LOSS_PCT,
+                    MOMENTUM_FAST_MIN, SLOW_PROFIT_PCT, REDUCED_TP_PCT, TIME_BASED_EXIT_MIN,
+                    SCALP_SL_PCT, SCALP_TP_PCT, SCALP_MAX_HOLD_MIN,
+                    FILL_MODEL_ENABLED, EXIT_OPT_MAX_CELLS)
+from fills import FillModel, fees, SELL
+from logging_utils import logger_row as log
+
+# exit reasons, in the order Engine.tick checks them
+REASONS = ("impulse", "dd", "stop", "target", "scalp_time", "path_end")
+
+
+# ============ Recorded paths ============
+
+def path_file_for(day) -> str:
+    return os.path.join(LOG_DIR, f"exit_paths_{day.strftime('%Y%m%d')}.jsonl")
+
+
+def append_path(pos, exit_time: dt.datetime, price: float, qty: int, reason: str, pnl: float):
+    """One JSON line per closed position: the actual exit plus its premium path (seconds since entry, LTP)."""
+    t0 = pos.entry_time
+    rec = {
+        "symbol": pos.symbol, "side": pos.side, "core": pos.is_core,
+        "entry_time": t0.isoformat(), "entry_price": pos.entry_price, "qty": qty,
+        "exit_time": exit_time.isoformat(), "exit_price": price, "reason": reason, "pnl": pnl,
+        "path": [[round((ts - t0).total_seconds(), 3), ltp] for ts, ltp in pos.history],
+    }
+    with open(path_file_for(exit_time), "a", encoding="utf-8") as f:
+        f.write(json.dumps(rec) + "\n")
+
+
+def record_exit_paths(batch):
+    """Event-bus subscriber for events.Exit: append_path for every full close."""
+    for ev in batch:
+        if ev.closed and ev.pos is not None:
+            try:
+                append_path(ev.pos, ev.ts, ev.price, ev.qty, ev.reason, ev.pnl)
+            except Exception as e:
+                log("PATHS_ERR", symbol=ev.symbol, reason=str(e), day_pnl=ev.day_pnl)
+
+
+def load_paths(paths: Optional[Sequence[str]] = None) -> List[dict]:
+    """Records written by append_path (default: every exit_paths_*.jsonl in LOG_DIR)."""
+    paths = paths or sorted(glob.glob(os.path.join(LOG_DIR, "exit_paths_*.jsonl")))
+    out = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            out.extend(json.loads(line) for line in f if line.strip())
+    return out
+
+
+@dataclass
+class PathSet:
+    """Trades as padded (N, T) arrays; padding repeats the last tick with age +inf."""
+    ltp: np.ndarray
+    age: np.ndarray
+    n: np.ndarray          # ticks per trade
+    entry: np.ndarray
+    qty: np.ndarray
+    core: np.ndarray       # bool
+    actual_pnl: np.ndarray
+    actual_hold: np.ndarray  # seconds
+
+    @classmethod
+    def from_records(cls, recs: Sequence[dict]) -> "PathSet":
+        recs = [r for r in recs if len(r.get("path") or ()) >= 1 and r.get("entry_price")]
+        if not recs:
+            raise ValueError("no recorded position paths (record them with EXIT_PATHS_RECORD = True)")
+        N, T = len(recs), max(len(r["path"]) for r in recs)
+        ps = cls(np.zeros((N, T)), np.full((N, T), np.inf), np.zeros(N, np.int64), np.zeros(N),
+                 np.zeros(N), np.zeros(N, bool), np.zeros(N), np.zeros(N))
+        for i, r in enumerate(recs):
+            a = np.asarray(r["path"], dtype=np.float64)
+            k = len(a)
+            ps.age[i, :k], ps.ltp[i, :k], ps.ltp[i, k:] = a[:, 0], a[:, 1], a[-1, 1]
+            ps.n[i] = k
+            ps.entry[i], ps.qty[i], ps.core[i] = r["entry_price"], r["qty"], r["core"]
+            ps.actual_pnl[i] = r["pnl"]
+            ps.actual_hold[i] = (dt.datetime.fromisoformat(r["exit_time"])
+                                 - dt.datetime.fromisoformat(r["entry_time"])).total_seconds()
+        return ps
+
+
+# ============ Parameters ============
+
+def live_grid() -> Dict[str, list]:
+    """Single point = the live config; widen any axis to scan it."""
+    return {
+        "core_sl_pct": [INIT_SL_PCT], "core_tp_pct": [INIT_TP_PCT],
+        "scalp_sl_pct": [SCALP_SL_PCT], "scalp_tp_pct": [SCALP_TP_PCT],
+        "trail_steps": [tuple(sorted(TRAIL_STEPS))],
+        "breakeven_at_pct": [BREAKEVEN_AT_PROFIT_PCT], "breakeven_offset_pct": [BREAKEVEN_OFFSET_PCT],
+        "core_dd_pct": [CORE_DD_HARD_DROP_PCT], "scalp_dd_pct": [SCALP_DD_HARD_DROP_PCT],
+        "core_min_peak_gain_pct": [CORE_MIN_PEAK_GAIN_BEFORE_DD_PCT],
+        "scalp_min_peak_gain_pct": [SCALP_MIN_PEAK_GAIN_BEFORE_DD_PCT],
+        "impulse_window_sec": [IMPULSE_WINDOW_SEC], "impulse_win_pct": [IMPULSE_WIN_PCT],
+        "impulse_loss_pct": [IMPULSE_LOSS_PCT],
+        "momentum_fast_min": [MOMENTUM_FAST_MIN], "slow_profit_pct": [SLOW_PROFIT_PCT],
+        "reduced_tp_pct": [REDUCED_TP_PCT], "time_based_exit_min": [TIME_BASED_EXIT_MIN],
+        "scalp_max_hold_min": [SCALP_MAX_HOLD_MIN],
+    }
+
+
+def _params(grid: Dict[str, list]) -> pd.DataFrame:
+    keys = list(grid)
+    df = pd.DataFrame(list(itertools.product(*(grid[k] for k in keys))), columns=keys)
+    df["breakeven_at_pct"] = df["breakeven_at_pct"].fillna(np.inf).astype(np.float64)
+    return df
+
+
+# ============ Exit state machine, batched ============
+
+def _first_true(mask: np.ndarray, none: int) -> np.ndarray:
+    return np.where(mask.any(axis=-1), mask.argmax(axis=-1), none)
+
+
+def _exits(ps: PathSet, prm: pd.DataFrame):
+    """
+    Exit tick and reason (P, N) for P parameter rows over N paths, as Engine.tick applies them:
+    impulse check, breakeven + step trail (SL only ratchets up, so it is the max of every step
+    the peak has reached), DD from peak, dynamic TP (reduced once triggered), hard SL/TP, scalp
+    max hold. Paths that end before any rule fires exit on their last tick ("path_end").
+    """
+    N, T = ps.ltp.shape
+    core = ps.core[None, :, None]
+
+    def col(core_name, scalp_name=None):
+        c = prm[core_name].to_numpy(np.float64)[:, None, None]
+        if scalp_name is None:
+            return c
+        return np.where(core, c, prm[scalp_name].to_numpy(np.float64)[:, None, None])
+
+    prof = (ps.ltp / ps.entry[:, None] - 1.0) * 100.0
+    peak = np.maximum.accumulate(np.maximum(ps.ltp, ps.entry[:, None]), axis=1)
+    peak_prof = (peak / ps.entry[:, None] - 1.0) * 100.0
+    drop = (peak - ps.ltp) * 100.0 / peak
+    age, held = ps.age, ps.age / 60.0
+    live = np.isfinite(age)
+
+    # breakeven + trail ladder -> stop level (% from entry) at every tick
+    stop = np.maximum(-col("core_sl_pct", "scalp_sl_pct"),
+                      np.where(peak_prof[None] >= col("breakeven_at_pct"), col("breakeven_offset_pct"), -np.inf))
+    ladders = list(prm["trail_steps"])
+    for k in range(max((len(x) for x in ladders), default=0)):
+        lv = np.array([x[k][0] if k < len(x) else np.inf for x in ladders])[:, None, None]
+        sv = np.array([x[k][1] if k < len(x) else -np.inf for x in ladders])[:, None, None]
+        stop = np.maximum(stop, np.where(peak_prof[None] >= lv, sv, -np.inf))
+
+    w = col("impulse_window_sec")
+    impulse = (age[None] >= 5) & (((age[None] <= w) & (prof[None] <= col("impulse_loss_pct")))
+                                  | ((age[None] >= w) & (age[None] < w + 2.0) & (prof[None] < col("impulse_win_pct"))))
+    dd = (peak_prof[None] >= col("core_min_peak_gain_pct", "scalp_min_peak_gain_pct")) \
+        & (drop[None] >= col("core_dd_pct", "scalp_dd_pct"))
+    slow = (held[None] > col("momentum_fast_min")) & (held[None] >= col("time_based_exit_min")) \
+        & (prof[None] >= col("slow_profit_pct"))
+    tp0 = col("core_tp_pct", "scalp_tp_pct")
+    tp = np.where(np.logical_or.accumulate(slow, axis=2), np.minimum(tp0, col("reduced_tp_pct")), tp0)
+    scalp_time = ~core & (held[None] >= col("scalp_max_hold_min"))
+
+    rules = (impulse, dd, prof[None] <= stop, prof[None] >= tp, scalp_time)
+    first = np.stack([_first_true(r & live[None], T) for r in rules])   # (rules, P, N)
+    t_exit = first.min(axis=0)
+    reason = np.where(t_exit < T, first.argmin(axis=0), len(rules))
+    t_exit = np.where(t_exit < T, t_exit, ps.n[None, :] - 1)
+    return t_exit, reason
+
+
+def _pnl(ps: PathSet, t_exit: np.ndarray, fill: Optional[FillModel]) -> np.ndarray:
+    px = np.take_along_axis(np.broadcast_to(ps.ltp, t_exit.shape + ps.ltp.shape[1:]),
+                            t_exit[..., None], axis=-1)[..., 0]
+    if fill is not None:
+        px = fill.modelled(SELL, px, ps.qty[None, :])
+        return (px - ps.entry[None, :]) * ps.qty[None, :] - fees(ps.entry[None, :], px, ps.qty[None, :])
+    return (px - ps.entry[None, :]) * ps.qty[None, :] - 2 * COST_PER_SIDE_INR
+
+
+def optimize(ps: PathSet, grid: Optional[Dict[str, list]] = None) -> pd.DataFrame:
+    """
+    Replay every recorded path under each grid combination (see live_grid) and compare with the
+    exits that actually happened. Fills are at the LTP of the exit tick (through the paper fill
+    model when enabled), entries as recorded. A rule set that holds longer than the live exit
+    cannot see past the recorded path, so it exits at the path end -- `path_end_share` says how
+    much of a row rests on that.
+    """
+    g = live_grid()
+    g.update(grid or {})
+    prm = _params(g)
+    t_start = time.perf_counter()
+    fill = FillModel() if FILL_MODEL_ENABLED else None
+    N, T = ps.ltp.shape
+    step = max(1, int(EXIT_OPT_MAX_CELLS // max(1, N * T)))
+    pnl, hold, why = [], [], []
+    for p0 in range(0, len(prm), step):
+        part = prm.iloc[p0:p0 + step]
+        t_exit, reason = _exits(ps, part)
+        pnl.append(_pnl(ps, t_exit, fill))
+        hold.append(np.take_along_axis(np.broadcast_to(np.where(np.isfinite(ps.age), ps.age, 0.0), t_exit.shape + (T,)),
+                                       t_exit[..., None], axis=-1)[..., 0])
+        why.append(reason)
+    pnl, hold, why = np.concatenate(pnl), np.concatenate(hold), np.concatenate(why)
+
+    out = prm.copy()
+    out["trail_steps"] = out["trail_steps"].map(str)
+    out["trades"] = N
+    out["total_pnl"] = pnl.sum(axis=1)
+    out["delta_pnl"] = out["total_pnl"] - ps.actual_pnl.sum()
+    out["win_rate"] = (pnl > 0).mean(axis=1) * 100.0
+    out["better_share"] = (pnl > ps.actual_pnl[None, :] + 1e-9).mean(axis=1)
+    out["avg_hold_min"] = hold.mean(axis=1) / 60.0
+    out["delta_hold_min"] = out["avg_hold_min"] - ps.actual_hold.mean() / 60.0
+    for i, r in enumerate(REASONS):
+        out[f"{r}_share"] = (why == i).mean(axis=1)
+    out = out.sort_values("total_pnl", ascending=False, ignore_index=True)
+    secs = time.perf_counter() - t_start
+    out.attrs["actual_pnl"] = float(ps.actual_pnl.sum())
+    out.attrs["combos_per_sec"] = len(out) / secs if secs > 0 else float("inf")
+    return out
+
+
+if __name__ == "__main__":
+    # python exit_optimizer.py [exit_paths_*.jsonl ...]
+    ps = PathSet.from_records(load_paths(sys.argv[1:] or None))
+    live = optimize(ps)
+    res = optimize(ps, {
+        "trail_steps": [tuple(sorted(TRAIL_STEPS)), ((10, 0), (20, 10), (30, 20)), ((15, 0), (30, 15)), ()],
+        "breakeven_at_pct": [None, 5.0, 10.0],
+        "core_dd_pct": [6.0, 10.0, 15.0],
+        "scalp_dd_pct": [5.0, 8.0],
+        "impulse_window_sec": [60, 120, 300],
+        "impulse_loss_pct": [-2.0, -3.0, -5.0],
+        "slow_profit_pct": [10, 15],
+        "reduced_tp_pct": [15, 25],
+        "scalp_max_hold_min": [5, 8, 12],
+    })
+    print(f"live config replayed: {live.loc[0, 'total_pnl']:.0f} vs actual {live.attrs['actual_pnl']:.0f} "
+          f"({live.loc[0, 'path_end_share']:.0%} at path end)\n")
+    print(res.head(25).to_string())
+    print(f"\n{len(res)} rule sets x {len(ps.n)} trades, {res.attrs['combos_per_sec']:.0f} rule sets/sec")
@@ -0,0 +1,94 @@
+# fills.py
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from config import (LOT_SIZE, TICK_SIZE, FILL_HALF_SPREAD_TICKS, FILL_SLIPPAGE_TICKS, FILL_IMPACT_TICKS_PER_LOT,
+                    FILL_LATENCY_MS, FILL_DRIFT_BPS_PER_SEC,
+                    FEE_BROKERAGE_PER_ORDER, FEE_STT_SELL_PCT, FEE_EXCHANGE_PCT, FEE_SEBI_PCT,
+                    FEE_STAMP_BUY_PCT, FEE_GST_PCT)
+
+BUY, SELL = 1, -1
+
+
+def fees(buy_px, sell_px, qty, buy_share=1.0, brokerage=FEE_BROKERAGE_PER_ORDER, stt_sell_pct=FEE_STT_SELL_PCT,
+         exchange_pct=FEE_EXCHANGE_PCT, sebi_pct=FEE_SEBI_PCT, stamp_buy_pct=FEE_STAMP_BUY_PCT,
+         gst_pct=FEE_GST_PCT):
+    """
+    Charges of one option round trip (buy then sell `qty` units), scalars or numpy arrays:
+    brokerage per order, STT on the sell premium, exchange + SEBI on turnover, stamp duty on
+    the buy premium, GST on brokerage + exchange + SEBI. `buy_share`: fraction of the entry
+    order this sell closes, so the exits of a split position pay the entry brokerage once.
+    """
+    buy_val, sell_val = buy_px * qty, sell_px * qty
+    turnover = buy_val + sell_val
+    exch = turnover * (exchange_pct + sebi_pct) / 100.0
+    brk = brokerage * (1.0 + buy_share)
+    return (brk + exch + sell_val * stt_sell_pct / 100.0 + buy_val * stamp_buy_pct / 100.0
+            + (brk + exch) * gst_pct / 100.0)
+
+
+@dataclass(frozen=True)
+class FillModel:
+    """
+    Paper fill prices. With a book in the quote (`depth` bids/ask levels, else top-of-book
+    bid/ask) a buy lifts the ask and a sell hits the bid, walking depth for size; without one
+    the LTP is moved against us by half a spread + slippage + impact per extra lot. Either way
+    the price drifts adversely for the decision-to-exchange latency. Array-friendly without
+    a book, so backtests and sweeps price every trade in one pass.
+    """
+    half_spread_ticks: float = FILL_HALF_SPREAD_TICKS
+    slippage_ticks: float = FILL_SLIPPAGE_TICKS
+    impact_ticks_per_lot: float = FILL_IMPACT_TICKS_PER_LOT
+    latency_ms: float = FILL_LATENCY_MS
+    drift_bps_per_sec: float = FILL_DRIFT_BPS_PER_SEC
+    tick: float = TICK_SIZE
+    lot_size: int = LOT_SIZE
+
+    def _drift(self, px):
+        return px * self.drift_bps_per_sec * self.latency_ms / 1000.0 / 1e4
+
+    def modelled(self, side: int, ltp, qty):
+        extra_lots = np.maximum(qty / self.lot_size - 1.0, 0.0)
+        adverse = (self.half_spread_ticks + self.slippage_ticks + self.impact_ticks_per_lot * extra_lots) * self.tick
+        return np.maximum(ltp + side * (adverse + self._drift(ltp)), self.tick)
+
+    def from_book(self, side: int, qty: int, quote: Optional[dict]) -> Optional[float]:
+        """Average price for `qty` against the quote's book, None without one."""
+        if not quote:
+            return None
+        depth = quote.get("depth") or {}
+        levels = depth.get("ask" if side == BUY else "bids") or []
+        if levels:
+            left, cost, last = qty, 0.0, None
+            for lv in levels:
+                px, vol = float(lv.get("price") or 0.0), int(lv.get("volume") or 0)
+                if px <= 0 or vol <= 0:
+                    continue
+                take = min(left, vol)
+                cost += take * px
+                left -= take
+                last = px
+                if left <= 0:
+                    break
+            if last is not None:
+                # beyond the visible book: pay impact past the last level
+                if left > 0:
+                    cost += left * (last + side * self.impact_ticks_per_lot * self.tick * left / self.lot_size)
+                return cost / qty
+        top = quote.get("ask" if side == BUY else "bid")
+        if top is None or float(top) <= 0:
+            return None
+        extra_lots = max(qty / self.lot_size - 1.0, 0.0)
+        return float(top) + side * self.impact_ticks_per_lot * self.tick * extra_lots
+
+    def price(self, side: int, ltp: float, qty: int, quote: Optional[dict] = None) -> float:
+        book = self.from_book(side, qty, quote)
+        if book is None:
+            return round(float(self.modelled(side, ltp, qty)), 2)
+        return round(max(book + side * self._drift(book), self.tick), 2)
+
+    def net_pnl(self, entry_ltp, exit_ltp, qty):
+        """Round-trip PnL after modelled fills and fees (scalars or numpy arrays)."""
+        buy = self.modelled(BUY, entry_ltp, qty)
+        sell = self.modelled(SELL, exit_ltp, qty)
+        return (sell - buy) * qty - fees(buy, sell, qty)
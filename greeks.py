@@ -0,0 +1,107 @@
+# greeks.py
+from typing import Optional, Tuple
+import numpy as np
+
+# Black-Scholes on numpy arrays (one strike ladder per call). No scipy: the normal CDF
+# uses the Abramowitz-Stegun 7.1.26 erf approximation (|error| < 1.5e-7).
+
+_P = 0.3275911
+_A = (0.254829592, -0.284496736, 1.421413741, -1.453152027, 1.061405429)
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+def norm_cdf(x):
+    x = np.asarray(x, dtype=np.float64)
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + _P * z)
+    poly = t * (_A[0] + t * (_A[1] + t * (_A[2] + t * (_A[3] + t * _A[4]))))
+    erf = 1.0 - poly * np.exp(-z * z)
+    return 0.5 * (1.0 + np.sign(x) * erf)
+
+
+def norm_pdf(x):
+    x = np.asarray(x, dtype=np.float64)
+    return _INV_SQRT_2PI * np.exp(-0.5 * x * x)
+
+
+def _d1d2(S, K, T, r, sigma) -> Tuple[np.ndarray, np.ndarray]:
+    vt = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma * sigma) * T) / vt
+    return d1, d1 - vt
+
+
+def bs_price(S, K, T, r, sigma, is_call):
+    d1, d2 = _d1d2(S, K, T, r, sigma)
+    disc = K * np.exp(-r * T)
+    call = S * norm_cdf(d1) - disc * norm_cdf(d2)
+    return np.where(is_call, call, call - S + disc)  # put via parity
+
+
+def bs_delta(S, K, T, r, sigma, is_call):
+    d1, _ = _d1d2(S, K, T, r, sigma)
+    nd1 = norm_cdf(d1)
+    return np.where(is_call, nd1, nd1 - 1.0)
+
+
+def bs_vega(S, K, T, r, sigma):
+    d1, _ = _d1d2(S, K, T, r, sigma)
+    return S * norm_pdf(d1) * np.sqrt(T)
+
+
+def implied_vol(price, S, K, T, r, is_call, lo: float = 1e-3, hi: float = 5.0,
+                tol: float = 1e-4, max_iter: int = 50) -> np.ndarray:
+    """
+    IV for every strike at once: Newton steps, falling back to bisection whenever a step
+    leaves the current bracket. Prices outside the no-arbitrage range give NaN.
+    """
+    price = np.asarray(price, dtype=np.float64)
+    K = np.asarray(K, dtype=np.float64)
+    is_call = np.asarray(is_call, dtype=bool)
+    S = np.broadcast_to(np.asarray(S, dtype=np.float64), K.shape)
+    disc = K * np.exp(-r * T)
+    intrinsic = np.where(is_call, np.maximum(S - disc, 0.0), np.maximum(disc - S, 0.0))
+    upper = np.where(is_call, S, disc)
+    ok = np.isfinite(price) & (price > intrinsic) & (price < upper)
+
+    a = np.full(K.shape, lo)
+    b = np.full(K.shape, hi)
+    sig = np.full(K.shape, 0.2)
+    for _ in range(max_iter):
+        f = bs_price(S, K, T, r, sig, is_call) - price
+        done = np.abs(f) < tol
+        if np.all(done | ~ok):
+            break
+        b = np.where(f > 0, sig, b)
+        a = np.where(f <= 0, sig, a)
+        vega = bs_vega(S, K, T, r, sig)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = sig - f / vega
+        inside = (vega > 1e-8) & (newton > a) & (newton < b)
+        sig = np.where(done, sig, np.where(inside, newton, 0.5 * (a + b)))
+    return np.where(ok, sig, np.nan)
+
+
+def select_strike(spot: float, strikes, prices, T: float, r: float, is_call: bool,
+                  target_delta: Optional[float] = None,
+                  band: Optional[Tuple[float, float]] = None) -> Optional[Tuple[int, float, float]]:
+    """
+    Index of the ladder strike whose |delta| is nearest target_delta, or (band mode) whose premium
+    lies in band and is nearest its middle. Returns (index, iv, delta) or None if nothing qualifies.
+    """
+    K = np.asarray(strikes, dtype=np.float64)
+    px = np.asarray(prices, dtype=np.float64)
+    calls = np.full(K.shape, bool(is_call))
+    iv = implied_vol(px, spot, K, T, r, calls)
+    with np.errstate(invalid="ignore"):
+        delta = bs_delta(spot, K, T, r, iv, calls)
+    if target_delta is not None:
+        score = np.abs(np.abs(delta) - target_delta)
+    elif band is not None:
+        lo, hi = band
+        score = np.where((px >= lo) & (px <= hi) & np.isfinite(iv), np.abs(px - 0.5 * (lo + hi)), np.nan)
+    else:
+        raise ValueError("select_strike needs target_delta or band")
+    if not np.isfinite(score).any():
+        return None
+    i = int(np.nanargmin(score))
+    return i, float(iv[i]), float(delta[i])
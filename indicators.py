@@ -14,7 +14,11 @@ def compute_rsi_from_1m(candles_df: pd.DataFrame, period=14, tf_min=5) -> Option
     l = df['l'].resample(f'{tf_min}min').min()
     c = df['c'].resample(f'{tf_min}min').last()
     agg = pd.DataFrame({'o': o, 'h': h, 'l': l, 'c': c}).dropna()
-    if len(agg) < period + 5:
+    return compute_rsi(agg, period=period)
+
+def compute_rsi(agg: pd.DataFrame, period=14) -> Optional[float]:
+    """RSI on already-aggregated bars (e.g. BarAggregator.frame(tf)); same rules as compute_rsi_from_1m."""
+    if agg is None or len(agg) < period + 5:
         return None
     delta = agg['c'].diff()
     gain = delta.clip(lower=0.0)
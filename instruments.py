@@ -0,0 +1,26 @@
+# instruments.py
+from dataclasses import dataclass
+from config import INSTRUMENTS, INDEX_SYMBOL, EXPIRY_CODE, LOT_SIZE
+
+
+@dataclass(frozen=True)
+class Instrument:
+    name: str               # e.g. NIFTY
+    index_symbol: str       # underlying index quote symbol
+    option_root: str        # prefix in option symbols, e.g. NSE:<root>25SEP24500CE
+    strike_step: int
+    lot_size: int
+    expiry_code: str = ""   # "" -> derive from the date (data.expiry_code_for)
+
+
+def get_instrument(name: str) -> Instrument:
+    meta = INSTRUMENTS.get(name)
+    if meta is None:
+        raise ValueError(f"unknown underlying '{name}' (configured: {sorted(INSTRUMENTS)})")
+    return Instrument(name=name, **meta)
+
+
+def default_instrument() -> Instrument:
+    """NIFTY as configured by the single-underlying knobs (INDEX_SYMBOL / LOT_SIZE / EXPIRY_CODE)."""
+    return Instrument(name="NIFTY", index_symbol=INDEX_SYMBOL, option_root="NIFTY",
+                      strike_step=50, lot_size=LOT_SIZE, expiry_code=EXPIRY_CODE)
@@ -1,8 +1,13 @@
 import os, csv, logging, datetime as dt
 from config import LOG_DIR, IST
+from events import BUS, Row
 
 os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, f"orb_sim_{dt.datetime.now().strftime('%Y%m%d')}.csv")
+
+def log_file_for(day) -> str:
+    return os.path.join(LOG_DIR, f"orb_sim_{day.strftime('%Y%m%d')}.csv")
+
+LOG_FILE = log_file_for(dt.datetime.now())
 
 logging.basicConfig(
     level=logging.INFO,
@@ -10,18 +15,50 @@ logging.basicConfig(
     datefmt="%H:%M:%S"
 )
 
+_clock = None  # virtual clock for synthetic/replay runs: callable -> aware IST datetime
+
+def set_clock(fn=None):
+    """Install (or with None, remove) a virtual clock behind ist_now()."""
+    global _clock
+    _clock = fn
+
 def ist_now():
-    return dt.datetime.now(IST)
+    return _clock() if _clock is not None else dt.datetime.now(IST)
 
 def init_csv():
     if not os.path.exists(LOG_FILE):
         with open(LOG_FILE, "w", newline="", encoding="utf-8") as f:
             csv.writer(f).writerow(["timestamp","event","symbol","side","price","qty","reason","pnl","day_pnl","extra"])
 
+def rotate_log(day=None):
+    """Point the CSV logger at the file for `day` (service mode rolls this once per session)."""
+    global LOG_FILE
+    BUS.flush()  # queued rows belong to the previous file
+    LOG_FILE = log_file_for(day or ist_now())
+    init_csv()
+
 def logger_row(event, symbol="", side="", price=0.0, qty=0, reason="", pnl=0.0, day_pnl=0.0, extra=""):
+    BUS.publish(Row(ist_now(), event, symbol, side, price, qty, reason, pnl, day_pnl, extra))
+
+def logger_rows(rows):
+    """Several logger_row(**kw) rows stamped with the same time."""
+    ts = ist_now()
+    for r in rows:
+        BUS.publish(Row(ts, **r))
+
+def write_events(batch):
+    """CSV + console sink for the event bus: every row of the batch with one file open/write."""
+    out = []
+    for ev in batch:
+        ts = ev.ts.strftime("%Y-%m-%d %H:%M:%S")
+        for r in ev.rows():
+            r = {"symbol": "", "side": "", "price": 0.0, "qty": 0, "reason": "", "pnl": 0.0, "day_pnl": 0.0,
+                 "extra": "", **r}
+            out.append([ts, r["event"], r["symbol"], r["side"], f"{r['price']:.2f}", r["qty"], r["reason"],
+                        f"{r['pnl']:.2f}", f"{r['day_pnl']:.2f}", r["extra"]])
+            logging.info(f"{r['event']} | {r['symbol']} {r['side']} @ {r['price']:.2f} | {r['reason']} | "
+                         f"PnL:{r['pnl']:.2f} Day:{r['day_pnl']:.2f} {r['extra']}")
     with open(LOG_FILE, "a", newline="", encoding="utf-8") as f:
-        csv.writer(f).writerow([
-            ist_now().strftime("%Y-%m-%d %H:%M:%S"), event, symbol, side,
-            f"{price:.2f}", qty, reason, f"{pnl:.2f}", f"{day_pnl:.2f}", extra
-        ])
-    logging.info(f"{event} | {symbol} {side} @ {price:.2f} | {reason} | PnL:{pnl:.2f} Day:{day_pnl:.2f} {extra}")
+        csv.writer(f).writerows(out)
+
+BUS.subscribe("csv", write_events)
@@ -1,6 +1,43 @@
+import sys
 from auth import get_fyers
+from config import METRICS_ENABLED, EXECUTION_MODE, EVENT_BUS_ASYNC, EVENT_METRICS_MAXLEN
 from engine import Engine
+from multi import MultiEngine
+from logging_utils import logger_row as log
+from events import BUS
+from profiler import install_signal
 
 if __name__ == "__main__":
-    fyers = get_fyers()
-    Engine(fyers).run()
+    install_signal()  # kill -USR1 <pid>: start / stop+write a profile (POSIX)
+    metrics = None
+    auth = get_fyers
+    if METRICS_ENABLED:
+        # local /metrics + /state endpoint; broker calls counted and timed through the proxy
+        from metrics import Metrics, MeteredBroker, serve
+        metrics = Metrics()
+        BUS.subscribe("metrics", metrics.on_events, maxlen=EVENT_METRICS_MAXLEN)
+        serve(metrics, logger=log)
+        auth = lambda: MeteredBroker(get_fyers(), metrics)
+    if EVENT_BUS_ASYNC:
+        BUS.start()  # CSV / metrics / path recording off the trading thread
+    fyers = auth()
+    orders = None
+    if EXECUTION_MODE != "sim":
+        # entries/exits as broker orders, reconciled against fills ("paper": local fake exchange)
+        from execution import OrderManager, FakeExchange
+        orders = OrderManager(FakeExchange(fyers) if EXECUTION_MODE == "paper" else fyers, log)
+    if "--service" in sys.argv:
+        # long-running: roll sessions daily without a restart
+        Engine(fyers, metrics=metrics, orders=orders).run_forever(reauth=auth)
+    elif "--hub" in sys.argv:
+        # one broker-polling process for every engine on this machine
+        from market_hub import MarketHub
+        MarketHub(fyers, log).serve()
+    elif "--attach" in sys.argv:
+        from market_hub import SharedDataClient
+        Engine(fyers, data_client=SharedDataClient(fyers, log), metrics=metrics, orders=orders).run()
+    elif "--multi" in sys.argv:
+        # config.UNDERLYINGS in one process, one batched quote call per cycle
+        MultiEngine(fyers, metrics=metrics, orders=orders).run()
+    else:
+        Engine(fyers, metrics=metrics, orders=orders).run()
@@ -0,0 +1,319 @@
+# market_hub.py
+import time, datetime as dt
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from config import (HUB_NAME, HUB_SLOTS, HUB_BAR_CAPACITY, HUB_POLL_SEC, HUB_LADDER_WIDTH,
+                    HUB_MAX_AGE_SEC, UNDERLYINGS, BAR_STORE_DIR)
+from bar_store import BarStore
+from data import DataClient, QuoteBoard, ist_now, expiry_code_for, nearest_strike
+from instruments import Instrument, get_instrument
+
+_MAGIC = 0x4F524248  # "ORBH"
+_NAME_LEN = 48
+_SPINS = 64
+
+# header slots (int64)
+H_MAGIC, H_SLOTS, H_CAP, H_USED, H_BEAT_MS, H_DAY = range(6)
+
+
+class _Layout:
+    """
+    numpy views over one shared memory block:
+      header  int64[8]                  magic, slots, capacity, slots in use, heartbeat (epoch ms), day (yyyymmdd)
+      names   S48[slots]                symbol per slot (append-only; H_USED is bumped after the name is written)
+      qseq    uint64[slots]             quote seqlock (odd while the publisher writes)
+      quote   float64[slots, 2]         ltp, quote time (epoch s)
+      bseq    uint64[slots]             bar seqlock
+      bcount  int64[slots]              closed 1m bars of the current session
+      bars    float64[slots, cap, 6]    [epoch, o, h, l, c, v] rows, written once per session
+    """
+    def __init__(self, buf, slots: int, cap: int):
+        off = 0
+
+        def take(shape, dtype):
+            nonlocal off
+            a = np.ndarray(shape, dtype=dtype, buffer=buf, offset=off)
+            off += a.nbytes
+            return a
+
+        self.header = take((8,), np.int64)
+        self.names = take((slots,), f"S{_NAME_LEN}")
+        self.qseq = take((slots,), np.uint64)
+        self.quote = take((slots, 2), np.float64)
+        self.bseq = take((slots,), np.uint64)
+        self.bcount = take((slots,), np.int64)
+        self.bars = take((slots, cap, 6), np.float64)
+        self.nbytes = off
+
+    @staticmethod
+    def size(slots: int, cap: int) -> int:
+        return 64 + slots * (_NAME_LEN + 8 + 16 + 8 + 8 + cap * 48)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # readers must not unlink the publisher's block when they exit
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# ============ Publisher ============
+
+class MarketHub:
+    """
+    Single market-data publisher for every engine process on the machine.
+    Owns the broker connection; each cycle one batched quotes call (QuoteBoard) covers the
+    index of every underlying plus an ATM +/- HUB_LADDER_WIDTH CE/PE ladder, and closed 1m
+    index bars are appended once per minute. Readers attach with SharedDataClient.
+    Writes follow a seqlock protocol per slot; there is exactly one writer.
+    """
+    def __init__(self, fyers, logger, names: Sequence[str] = UNDERLYINGS, hub_name: str = HUB_NAME,
+                 slots: int = HUB_SLOTS, capacity: int = HUB_BAR_CAPACITY):
+        self.log = logger
+        self.board = QuoteBoard(fyers, logger)
+        store = BarStore(BAR_STORE_DIR)
+        self.insts: List[Instrument] = [get_instrument(n) for n in names]
+        self.dcs: Dict[str, DataClient] = {i.name: DataClient(fyers, logger, i, board=self.board, store=store)
+                                           for i in self.insts}
+        size = _Layout.size(slots, capacity)
+        try:
+            self.shm = shared_memory.SharedMemory(name=hub_name, create=True, size=size)
+        except FileExistsError:
+            # left behind by a publisher that did not shut down cleanly
+            old = shared_memory.SharedMemory(name=hub_name)
+            old.close()
+            old.unlink()
+            self.shm = shared_memory.SharedMemory(name=hub_name, create=True, size=size)
+        self.L = _Layout(self.shm.buf, slots, capacity)
+        self.L.header[:] = 0
+        self.L.qseq[:] = 0
+        self.L.bseq[:] = 0
+        self.L.bcount[:] = 0
+        self.L.header[H_SLOTS] = slots
+        self.L.header[H_CAP] = capacity
+        self.L.header[H_MAGIC] = _MAGIC
+        self._slot: Dict[str, int] = {}
+        self._ladder: Dict[str, Tuple[int, List[str]]] = {}  # underlying -> (atm, symbols)
+        self._day: Optional[dt.date] = None
+        self.log("HUB_START", reason=f"{hub_name}: {', '.join(names)} ({size / 1e6:.1f} MB, {slots} slots)")
+
+    # ---- slots ----
+    def slot(self, symbol: str) -> Optional[int]:
+        i = self._slot.get(symbol)
+        if i is not None:
+            return i
+        i = int(self.L.header[H_USED])
+        if i >= len(self.L.names):
+            self.log("HUB_FULL", symbol=symbol, reason=f"all {i} slots in use")
+            return None
+        self.L.names[i] = symbol.encode()[:_NAME_LEN]
+        self.L.header[H_USED] = i + 1  # publish only after the name is in place
+        self._slot[symbol] = i
+        return i
+
+    def write_quote(self, i: int, ltp: float, ts: float):
+        L = self.L
+        s = L.qseq[i]
+        L.qseq[i] = s + 1
+        L.quote[i, 0] = ltp
+        L.quote[i, 1] = ts
+        L.qseq[i] = s + 2
+
+    def append_bars(self, i: int, rows: np.ndarray):
+        L = self.L
+        n = int(L.bcount[i])
+        k = min(len(rows), L.bars.shape[1] - n)
+        if k <= 0:
+            return
+        s = L.bseq[i]
+        L.bseq[i] = s + 1
+        L.bars[i, n:n + k] = rows[:k]
+        L.bcount[i] = n + k
+        L.bseq[i] = s + 2
+
+    def roll_day(self, day: dt.date):
+        """Session change: bar rings restart at row 0 (quotes and symbol slots are kept)."""
+        L = self.L
+        for i in range(int(L.header[H_USED])):
+            s = L.bseq[i]
+            L.bseq[i] = s + 1
+            L.bcount[i] = 0
+            L.bseq[i] = s + 2
+        L.header[H_DAY] = int(day.strftime("%Y%m%d"))
+        for dc in self.dcs.values():
+            dc.roll_day(dc.inst.expiry_code or expiry_code_for(day))
+        self._ladder.clear()
+        self._day = day
+
+    # ---- publishing ----
+    def ladder(self, inst: Instrument) -> List[str]:
+        spot = self.board.get(inst.index_symbol)
+        if spot is None:
+            return self._ladder.get(inst.name, (None, []))[1]
+        atm = nearest_strike(spot, inst.strike_step)
+        hit = self._ladder.get(inst.name)
+        if hit is not None and hit[0] == atm:
+            return hit[1]
+        dc = self.dcs[inst.name]
+        dc.resolve_strike_ladder(spot, HUB_LADDER_WIDTH)
+        syms: List[str] = []
+        for k in range(-HUB_LADDER_WIDTH, HUB_LADDER_WIDTH + 1):
+            for t in ("CE", "PE"):
+                try:
+                    syms.append(dc.resolve_option_symbol(dc.expiry_code, atm + k * inst.strike_step, t))
+                except Exception:
+                    pass
+        self._ladder[inst.name] = (atm, syms)
+        return syms
+
+    def publish_quotes(self):
+        watch = [i.index_symbol for i in self.insts]
+        for inst in self.insts:
+            watch.extend(self.ladder(inst))
+        self.board.refresh(watch)
+        for sym in watch:
+            px = self.board.get(sym)
+            if px is None:
+                continue
+            i = self.slot(sym)
+            if i is not None:
+                self.write_quote(i, px, time.time())
+
+    def publish_bars(self, now: float):
+        for inst in self.insts:
+            i = self.slot(inst.index_symbol)
+            if i is None:
+                continue
+            n = int(self.L.bcount[i])
+            last = self.L.bars[i, n - 1, 0] if n else 0.0
+            if n and last + 120 > now:
+                continue  # most recent closed minute already published
+            rows = self.dcs[inst.name].get_1m_today(inst.index_symbol)
+            new = [r for r in rows or () if r[0] > last and r[0] + 60 <= now]
+            if new:
+                self.append_bars(i, np.asarray(new, dtype=np.float64)[:, :6])
+
+    def cycle(self):
+        day = ist_now().date()
+        if day != self._day:
+            self.roll_day(day)
+        self.publish_quotes()
+        self.publish_bars(time.time())
+        self.L.header[H_BEAT_MS] = int(time.time() * 1000)
+
+    def serve(self):
+        try:
+            while True:
+                t0 = time.monotonic()
+                try:
+                    self.cycle()
+                except Exception as e:
+                    self.log("HUB_ERR", reason=f"{type(e).__name__}: {str(e)[:160]}")
+                time.sleep(max(0.0, HUB_POLL_SEC - (time.monotonic() - t0)))
+        finally:
+            self.close()
+
+    def close(self):
+        self.L = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+# ============ Readers ============
+
+class HubReader:
+    """Lock-free reader over a MarketHub block; retries a slot read while the publisher is mid-write."""
+    def __init__(self, hub_name: str = HUB_NAME):
+        self.shm = _attach(hub_name)
+        head = np.ndarray((8,), dtype=np.int64, buffer=self.shm.buf)
+        if int(head[H_MAGIC]) != _MAGIC:
+            raise RuntimeError(f"shared memory '{hub_name}' is not a market hub")
+        self.L = _Layout(self.shm.buf, int(head[H_SLOTS]), int(head[H_CAP]))
+        self._slot: Dict[str, int] = {}
+
+    def alive(self, max_age_sec: float = HUB_MAX_AGE_SEC) -> bool:
+        return (time.time() * 1000 - int(self.L.header[H_BEAT_MS])) <= max_age_sec * 1000
+
+    def slot(self, symbol: str) -> Optional[int]:
+        i = self._slot.get(symbol)
+        if i is not None:
+            return i
+        used = int(self.L.header[H_USED])
+        for j in range(len(self._slot), used):
+            self._slot[self.L.names[j].decode()] = j
+        return self._slot.get(symbol)
+
+    def quote(self, symbol: str) -> Optional[Tuple[float, float]]:
+        """(ltp, epoch seconds) or None if the hub does not carry the symbol."""
+        i = self.slot(symbol)
+        if i is None:
+            return None
+        L = self.L
+        for _ in range(_SPINS):
+            s1 = int(L.qseq[i])
+            if s1 == 0:
+                return None  # slot allocated, nothing published yet
+            if s1 & 1:
+                continue
+            ltp, ts = float(L.quote[i, 0]), float(L.quote[i, 1])
+            if int(L.qseq[i]) == s1:
+                return ltp, ts
+        return None
+
+    def bars(self, symbol: str) -> Optional[np.ndarray]:
+        """
+        Read-only view (no copy) of today's closed 1m rows. Rows are written once per session,
+        so the view stays valid until the publisher rolls to the next day.
+        """
+        i = self.slot(symbol)
+        if i is None:
+            return None
+        L = self.L
+        for _ in range(_SPINS):
+            s1 = int(L.bseq[i])
+            if s1 & 1:
+                continue
+            n = int(L.bcount[i])
+            if int(L.bseq[i]) == s1:
+                v = L.bars[i, :n]
+                v.flags.writeable = False
+                return v
+        return None
+
+    def close(self):
+        self.L = None
+        self.shm.close()
+
+
+class SharedDataClient(DataClient):
+    """
+    DataClient for engines attached to a MarketHub: LTPs and today's 1m index bars come from
+    shared memory; anything the hub does not carry (or a stale hub) falls back to the broker.
+    """
+    def __init__(self, fyers, logger, instrument: Optional[Instrument] = None, hub_name: str = HUB_NAME,
+                 store: Optional[BarStore] = None):
+        super().__init__(fyers, logger, instrument, store=store)
+        self.hub = HubReader(hub_name)
+
+    def get_ltp(self, symbol: str) -> float:
+        if self.hub.alive():
+            q = self.hub.quote(symbol)
+            if q is not None and time.time() - q[1] <= HUB_MAX_AGE_SEC:
+                return q[0]
+        return super().get_ltp(symbol)
+
+    def get_1m_today(self, symbol: str) -> List[list]:
+        if self.hub.alive() and int(self.hub.L.header[H_DAY]) == int(ist_now().strftime("%Y%m%d")):
+            v = self.hub.bars(symbol)
+            if v is not None and len(v):
+                return list(v)  # row views into shared memory
+        return super().get_1m_today(symbol)
+
+    def _can_quote_symbol(self, symbol: str) -> bool:
+        if self.hub.alive() and self.hub.quote(symbol) is not None:
+            return True
+        return super()._can_quote_symbol(symbol)
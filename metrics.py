@@ -0,0 +1,173 @@
+# metrics.py
+import json, time, threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import MappingProxyType
+from typing import Dict, Optional, Sequence, Tuple
+from config import METRICS_HOST, METRICS_PORT, METRICS_LATENCY_BUCKETS_MS
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels, float]   # (metric name, labels, value)
+
+
+class Metrics:
+    """
+    Counters / latency histograms written by the trading side, plus per-engine state gauges.
+    Writers share a small lock among themselves; readers (the HTTP thread) only ever grab the
+    immutable snapshot reference that publish() swaps in, so a scrape never blocks a tick.
+    """
+    def __init__(self, buckets_ms: Sequence[float] = METRICS_LATENCY_BUCKETS_MS):
+        self.bounds = [b / 1000.0 for b in buckets_ms]
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._hists: Dict[Tuple[str, Labels], list] = {}   # key -> [bucket counts..., +Inf, sum]
+        self._state: Dict[str, Tuple[Sample, ...]] = {}
+        self._lock = threading.Lock()
+        self._snap = MappingProxyType({"counters": (), "hists": (), "state": MappingProxyType({}), "ts": 0.0})
+
+    # ---- writers ----
+    def inc(self, name: str, n: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + n
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = [0] * (len(self.bounds) + 1) + [0.0]
+            h[bisect_left(self.bounds, seconds)] += 1
+            h[-1] += seconds
+
+    def on_events(self, batch):
+        """Event-bus subscriber: events per type; every logged *_ERR row also counts as an error."""
+        for ev in batch:
+            self.inc("events_total", type=type(ev).__name__)
+            name = getattr(ev, "event", "")
+            if name.endswith("_ERR"):
+                self.inc("errors_total", event=name)
+
+    def publish(self, source: str, samples: Sequence[Sample] = ()):
+        """Replace one engine's state gauges and swap in a fresh read-only snapshot."""
+        with self._lock:
+            self._state = {**self._state, source: tuple(samples)}
+            snap = {
+                "counters": tuple(self._counters.items()),
+                "hists": tuple((k, tuple(v)) for k, v in self._hists.items()),
+                "state": MappingProxyType(self._state),
+                "ts": time.time(),
+            }
+        self._snap = MappingProxyType(snap)   # single reference store: atomic for readers
+
+    # ---- readers ----
+    def snapshot(self):
+        return self._snap
+
+    def render(self) -> str:
+        """Prometheus text exposition of the last published snapshot (samples grouped per family)."""
+        snap = self._snap
+        fams: Dict[str, Tuple[str, list]] = {}
+
+        def add(name, kind, labels, value, suffix=""):
+            lab = ",".join(f'{k}="{_esc(v)}"' for k, v in labels)
+            fams.setdefault(f"orb_{name}", (kind, []))[1].append(
+                f"orb_{name}{suffix}{{{lab}}} {value:g}" if lab else f"orb_{name}{suffix} {value:g}")
+
+        for (name, labels), v in sorted(snap["counters"]):
+            add(name, "counter", labels, v)
+        for (name, labels), h in sorted(snap["hists"]):
+            cum = 0
+            for b, c in zip(self.bounds + [float("inf")], h[:-1]):
+                cum += c
+                add(name, "histogram", labels + (("le", "+Inf" if b == float("inf") else f"{b:g}"),), cum, "_bucket")
+            add(name, "histogram", labels, h[-1], "_sum")
+            add(name, "histogram", labels, cum, "_count")
+        for source in sorted(snap["state"]):
+            for name, labels, v in snap["state"][source]:
+                add(name, "gauge", labels, v)
+        add("snapshot_age_seconds", "gauge", (), max(0.0, time.time() - snap["ts"]) if snap["ts"] else -1.0)
+
+        out = []
+        for full, (kind, rows) in fams.items():
+            out.append(f"# TYPE {full} {kind}")
+            out.extend(rows)
+        return "\n".join(out) + "\n"
+
+    def state_json(self) -> str:
+        snap = self._snap
+        return json.dumps({
+            "ts": snap["ts"],
+            "state": {src: [{"metric": n, **dict(l), "value": v} for n, l, v in rows]
+                      for src, rows in snap["state"].items()},
+        })
+
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MeteredBroker:
+    """Broker proxy counting quotes/history calls, failures and round-trip latency."""
+    def __init__(self, fyers, metrics: Metrics):
+        self._fyers = fyers
+        self._m = metrics
+
+    def _call(self, api: str, payload: dict) -> dict:
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            resp = getattr(self._fyers, api)(payload)
+            ok = isinstance(resp, dict) and resp.get("s") in ("ok", "no_data")
+            return resp
+        finally:
+            self._m.observe("broker_seconds", time.perf_counter() - t0, api=api)
+            self._m.inc("broker_calls_total", api=api)
+            if not ok:
+                self._m.inc("broker_errors_total", api=api)
+
+    def quotes(self, payload: dict) -> dict:
+        return self._call("quotes", payload)
+
+    def history(self, payload: dict) -> dict:
+        return self._call("history", payload)
+
+    def __getattr__(self, name):
+        return getattr(self._fyers, name)
+
+
+def serve(metrics: Metrics, host: str = METRICS_HOST, port: int = METRICS_PORT,
+          logger=None) -> Optional[ThreadingHTTPServer]:
+    """
+    GET /metrics (Prometheus text) and /state (JSON gauges) from a daemon thread.
+    Returns None (and logs) if the port cannot be bound; trading goes on without it.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] == "/metrics":
+                body, ctype = metrics.render(), "text/plain; version=0.0.4"
+            elif self.path.split("?")[0] == "/state":
+                body, ctype = metrics.state_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):  # keep scrapes out of the trading log
+            pass
+
+    try:
+        httpd = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        if logger:
+            logger("METRICS_ERR", reason=f"cannot bind {host}:{port}: {e}")
+        return None
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    if logger:
+        logger("METRICS", reason=f"serving http://{host}:{port}/metrics")
+    return httpd
@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 import datetime as dt
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 @dataclass
 class Position:
@@ -16,8 +16,20 @@ class Position:
     is_core: bool = True
     notes: str = ""
     history: List[Tuple[dt.datetime, float]] = field(default_factory=list)
+    entry_qty: int = 0        # qty bought; qty shrinks on partial exits (0 = qty)
+
+    def __post_init__(self):
+        if not self.entry_qty:
+            self.entry_qty = self.qty
 
     def record(self, ts: dt.datetime, ltp: float):
         self.history.append((ts, ltp))
         if ltp > self.peak_price:
             self.peak_price = ltp
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Immutable per-tick view shared by all strategies; bar-derived levels come from their on_bar."""
+    ts: dt.datetime
+    idx_ltp: float
+    rsi_val: Optional[float]
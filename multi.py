@@ -0,0 +1,66 @@
+# multi.py
+import time
+from typing import List, Optional, Sequence
+from config import UNDERLYINGS, BAR_STORE_DIR, TICK_SLEEP_SEC, USE_YDAY_WHEN_TODAY_EMPTY
+from logging_utils import logger_row as log
+from bar_store import BarStore
+from data import DataClient, QuoteBoard
+from instruments import get_instrument
+from risk import RiskBook
+from metrics import Metrics
+from execution import OrderManager
+from engine import Engine
+
+
+class MultiEngine:
+    """
+    Several underlyings (config.UNDERLYINGS) in one process on one shared data plane:
+    - one broker client, one QuoteBoard refreshed with a single batched quotes call per cycle
+      (every index + every open option), one BarStore, one RiskBook
+    - one Engine per underlying with its own state, checkpoint and strategies
+    - MAX_DAILY_LOSS_INR applies to the combined realized PnL (RiskBook)
+    """
+    def __init__(self, fyers, names: Sequence[str] = UNDERLYINGS, metrics: Optional[Metrics] = None,
+                 orders: Optional[OrderManager] = None):
+        self.fyers = fyers
+        self.board = QuoteBoard(fyers, log)
+        self.store = BarStore(BAR_STORE_DIR)
+        self.risk = RiskBook()
+        self.engines: List[Engine] = []
+        for name in names:
+            inst = get_instrument(name)
+            dc = DataClient(fyers, log, inst, board=self.board, store=self.store)
+            self.engines.append(Engine(fyers, inst, dc, self.risk, metrics, orders))
+
+    def watchlist(self, engines: List[Engine]) -> List[str]:
+        syms = [e.inst.index_symbol for e in engines]
+        for e in engines:
+            syms.extend(p.symbol for p in e.positions)
+        return syms
+
+    def run(self, allow_yday: bool = USE_YDAY_WHEN_TODAY_EMPTY):
+        live: List[Engine] = []
+        try:
+            for e in self.engines:
+                try:
+                    e.start_session(allow_yday)
+                    live.append(e)
+                except Exception as ex:
+                    log("SESSION_SKIP", symbol=e.inst.index_symbol, reason=f"{type(ex).__name__}: {str(ex)[:160]}")
+
+            while live:
+                self.board.refresh(self.watchlist(live))
+                pause: Optional[float] = None
+                for e in list(live):
+                    t0 = time.perf_counter()
+                    p = e.tick()
+                    e.publish_metrics(time.perf_counter() - t0)
+                    if p is None:
+                        live.remove(e)
+                    else:
+                        pause = p if pause is None else min(pause, p)
+                if live:
+                    time.sleep(pause if pause is not None else TICK_SLEEP_SEC)
+        finally:
+            for e in self.engines:
+                e.end_session()
@@ -0,0 +1,305 @@
+# orb_backtest.py
+import sys, time, itertools, datetime as dt
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from config import (ORB_START_IST, ORB_END_IST, SQUARE_OFF_IST, ENTRY_BUFFER_PCT,
+                    USE_RSI, RSI_PERIOD, RSI_TIMEFRAME_MIN, RSI_LONG_MIN, RSI_SHORT_MAX,
+                    INIT_SL_PCT, INIT_TP_PCT, TRAIL_STEPS, BREAKEVEN_AT_PROFIT_PCT, BREAKEVEN_OFFSET_PCT,
+                    LOT_SIZE, COST_PER_SIDE_INR, INDEX_SYMBOL,
+                    BT_PREMIUM_PCT_OF_SPOT, BT_DELTA, BT_THETA_PCT_PER_HOUR, BT_MAX_CELLS,
+                    FILL_MODEL_ENABLED)
+from fills import FillModel
+
+IST_OFFSET_SEC = 5 * 3600 + 30 * 60   # IST has no DST: minute-of-day straight from the epoch
+SESSION_OPEN_MIN = 9 * 60 + 15
+SESSION_MINUTES = 375                 # 09:15 .. 15:29 (1m candles)
+
+
+def minute_col(t: dt.time) -> int:
+    """Column of the 1m candle starting at IST time t."""
+    return t.hour * 60 + t.minute - SESSION_OPEN_MIN
+
+
+def live_ladder() -> Tuple[Tuple[float, float], ...]:
+    """TRAIL_STEPS plus the breakeven step, as the engine applies them."""
+    steps = list(TRAIL_STEPS)
+    if BREAKEVEN_AT_PROFIT_PCT is not None:
+        steps.append((BREAKEVEN_AT_PROFIT_PCT, BREAKEVEN_OFFSET_PCT))
+    return tuple(sorted(steps))
+
+
+def default_grid() -> Dict[str, list]:
+    """Single point = the live config; widen any axis to scan it."""
+    return {
+        "orb_end": [ORB_END_IST],
+        "entry_buffer_pct": [ENTRY_BUFFER_PCT],
+        "rsi_long_min": [RSI_LONG_MIN],
+        "rsi_short_max": [RSI_SHORT_MAX],
+        "sl_pct": [INIT_SL_PCT],
+        "tp_pct": [INIT_TP_PCT],
+        "trail_steps": [live_ladder()],
+    }
+
+
+# ============ Data: days x minutes ============
+
+@dataclass
+class Sessions:
+    days: List[str]
+    o: np.ndarray   # (D, T) float64; missing minutes forward-filled from the last close
+    h: np.ndarray
+    l: np.ndarray
+    c: np.ndarray
+
+
+def sessions_from_rows(day_rows: Dict[str, List[list]]) -> Sessions:
+    """Broker 1m rows ([epoch, o, h, l, c, v]) per day -> aligned days x minutes matrices."""
+    days = sorted(d for d, rows in day_rows.items() if rows)
+    D, T = len(days), SESSION_MINUTES
+    ohlc = np.full((4, D, T), np.nan)
+    for i, d in enumerate(days):
+        r = np.asarray(day_rows[d], dtype=np.float64)
+        m = ((r[:, 0].astype(np.int64) + IST_OFFSET_SEC) // 60) % 1440 - SESSION_OPEN_MIN
+        ok = (m >= 0) & (m < T)
+        ohlc[:, i, m[ok]] = r[ok, 1:5].T
+
+    o, h, l, c = ohlc
+    have = ~np.isnan(c)
+    last = np.maximum.accumulate(np.where(have, np.arange(T), 0), axis=1)
+    c = np.take_along_axis(c, last, axis=1)
+    o = np.where(have, o, c)
+    h = np.where(have, h, c)
+    l = np.where(have, l, c)
+    return Sessions(days, o, h, l, c)
+
+
+def load_sessions(dc, symbol: str, start: dt.date, end: dt.date) -> Sessions:
+    """Weekdays in [start, end] via DataClient.get_1m_day (bar store first, broker once per day)."""
+    rows: Dict[str, List[list]] = {}
+    d = start
+    while d <= end:
+        if d.weekday() < 5:
+            ds = d.strftime("%Y-%m-%d")
+            rows[ds] = dc.get_1m_day(symbol, ds)
+        d += dt.timedelta(days=1)
+    return sessions_from_rows(rows)
+
+
+def rsi_by_minute(s: Sessions, period: int = RSI_PERIOD, tf: int = RSI_TIMEFRAME_MIN) -> np.ndarray:
+    """
+    (D, T) RSI as the engine sees it at each minute's close: same rolling-mean RSI as
+    indicators.compute_rsi on closed tf bars, continuous across sessions (warm start).
+    """
+    D, T = s.c.shape
+    nb = -(-T // tf)
+    bar_c = s.c[:, np.minimum(np.arange(nb) * tf + tf - 1, T - 1)].ravel()
+    delta = np.diff(bar_c, prepend=np.nan)
+    gain = np.clip(np.nan_to_num(delta), 0.0, None)
+    loss = np.clip(np.nan_to_num(-delta), 0.0, None)
+    cg = np.concatenate(([0.0], np.cumsum(gain)))
+    cl = np.concatenate(([0.0], np.cumsum(loss)))
+    k = np.arange(len(bar_c))
+    lo = np.maximum(k + 1 - period, 0)
+    avg_g = (cg[k + 1] - cg[lo]) / period
+    avg_l = (cl[k + 1] - cl[lo]) / period
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_l == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_g / avg_l))
+    rsi[k < period + 4] = np.nan  # compute_rsi needs period + 5 bars
+
+    # bar j of day d is closed once minute j*tf + tf - 1 has closed; before today's first
+    # bar closes the index falls back to the previous session's last bar
+    m = np.arange(T)
+    flat = np.arange(D)[:, None] * nb + ((m + 1) // tf - 1)[None, :]
+    out = np.full((D, T), np.nan)
+    ok = flat >= 0
+    out[ok] = rsi[flat[ok]]
+    return out
+
+
+# ============ Entries ============
+
+def first_true(mask: np.ndarray, none: int) -> np.ndarray:
+    idx = mask.argmax(axis=-1)
+    return np.where(mask.any(axis=-1), idx, none)
+
+
+def orb_entries(s: Sessions, rsi: np.ndarray, orb_end: dt.time, buffer_pct: float,
+                rsi_long: Sequence[float], rsi_short: Sequence[float]):
+    """
+    First core ORB breakout per day (close beyond OR high/low +/- buffer with RSI agreeing),
+    for every (rsi_long, rsi_short) pair. Returns t0 (L, S, D) with T = no entry, and side (+1 CE / -1 PE).
+    """
+    T = s.c.shape[1]
+    a, e = minute_col(ORB_START_IST), minute_col(orb_end)
+    orh = np.fmax.reduce(s.h[:, a:e], axis=1)
+    orl = np.fmin.reduce(s.l[:, a:e], axis=1)
+    c, r = s.c[:, e:], rsi[:, e:]
+    up = c > (orh * (1 + buffer_pct / 100.0))[:, None]
+    dn = c < (orl * (1 - buffer_pct / 100.0))[:, None]
+    if USE_RSI:
+        t_up = first_true(up[None] & (r[None] > np.asarray(rsi_long, float)[:, None, None]), T - e) + e
+        t_dn = first_true(dn[None] & (r[None] < np.asarray(rsi_short, float)[:, None, None]), T - e) + e
+    else:
+        t_up = np.broadcast_to(first_true(up, T - e) + e, (len(rsi_long), len(c)))
+        t_dn = np.broadcast_to(first_true(dn, T - e) + e, (len(rsi_short), len(c)))
+    t_up, t_dn = t_up[:, None, :], t_dn[None, :, :]
+    t0 = np.minimum(t_up, t_dn)
+    side = np.where(t_up <= t_dn, 1, -1)  # engine checks the long side first
+    return t0, side
+
+
+# ============ Exits ============
+
+def ladder_arrays(ladders: Sequence[Sequence[Tuple[float, float]]]) -> Tuple[np.ndarray, np.ndarray]:
+    k = max(1, max(len(x) for x in ladders))
+    lv = np.full((len(ladders), k), np.inf, dtype=np.float32)
+    sv = np.full((len(ladders), k), -np.inf, dtype=np.float32)
+    for i, steps in enumerate(ladders):
+        for j, (level, sl) in enumerate(sorted(steps)):
+            lv[i, j], sv[i, j] = level, sl
+    return lv, sv
+
+
+def exit_pnl(s: Sessions, t0: np.ndarray, side: np.ndarray, sl_pct: np.ndarray, tp_pct: np.ndarray,
+             lv: np.ndarray, sv: np.ndarray, lot_size: int = LOT_SIZE) -> np.ndarray:
+    """
+    Per-day PnL (X, D) of one entry set t0/side (D,) under X exit combos (sl, tp, ladder rows lv/sv).
+    Premium model: P = P0 + delta * favourable index move - theta * minutes held, P0 = % of spot.
+    Within a minute the stop is checked against the low before the target against the high
+    (conservative), and the ladder only uses the peak reached in earlier minutes.
+    Exits at SL/TP level, else at the square-off candle's close.
+    """
+    D, T = s.c.shape
+    X = len(sl_pct)
+    out = np.zeros((X, D), dtype=np.float64)
+    traded = t0 < T
+    if not traded.any():
+        return out
+    rows = np.nonzero(traded)[0]
+    t0, sgn = t0[rows], side[rows].astype(np.float64)
+    a = int(t0.min()) + 1
+    sq = min(minute_col(SQUARE_OFF_IST), T - 1)
+    if a > sq:
+        return out
+    h, l, c = s.h[rows, a:sq + 1], s.l[rows, a:sq + 1], s.c[rows, a:sq + 1]
+    s0 = s.c[rows, t0]
+    p0 = s0 * BT_PREMIUM_PCT_OF_SPOT / 100.0
+    held = (np.arange(a, sq + 1)[None, :] - t0[:, None]).astype(np.float64)
+    decay = p0[:, None] * (BT_THETA_PCT_PER_HOUR / 100.0) * held / 60.0
+
+    fav_hi = np.where(sgn[:, None] > 0, h - s0[:, None], s0[:, None] - l)
+    fav_lo = np.where(sgn[:, None] > 0, l - s0[:, None], s0[:, None] - h)
+    scale = 100.0 * BT_DELTA / p0[:, None]
+    live = held > 0
+    hp = np.where(live, fav_hi * scale - decay * 100.0 / p0[:, None], -np.inf).astype(np.float32)
+    lp = np.where(live, fav_lo * scale - decay * 100.0 / p0[:, None], np.inf).astype(np.float32)
+    end_pct = (np.where(sgn > 0, c[:, -1] - s0, s0 - c[:, -1]) * BT_DELTA - decay[:, -1]) * 100.0 / p0
+
+    peak_prev = np.maximum.accumulate(hp, axis=1)
+    peak_prev = np.concatenate([np.full((len(rows), 1), -np.inf, np.float32), peak_prev[:, :-1]], axis=1)
+
+    n = hp.shape[1]
+    step = max(1, int(BT_MAX_CELLS // max(1, len(rows) * n)))
+    for x0 in range(0, X, step):
+        xs = slice(x0, min(X, x0 + step))
+        stop = np.broadcast_to(-sl_pct[xs, None, None].astype(np.float32), (xs.stop - xs.start, len(rows), n)).copy()
+        for k in range(lv.shape[1]):
+            hit = peak_prev[None] >= lv[xs, k, None, None]
+            np.maximum(stop, np.where(hit, sv[xs, k, None, None], -np.inf), out=stop)
+        t_sl = first_true(lp[None] <= stop, n)
+        t_tp = first_true(hp[None] >= tp_pct[xs, None, None], n)
+        sl_at = np.take_along_axis(stop, np.minimum(t_sl, n - 1)[..., None], axis=2)[..., 0]
+        pct = np.where(t_sl <= t_tp, sl_at, tp_pct[xs, None])
+        pct = np.where((t_sl == n) & (t_tp == n), end_pct[None, :], pct)
+        if FILL_MODEL_ENABLED:  # spread/slippage on both premiums + exchange fees and taxes
+            out[xs, rows] = FillModel(lot_size=lot_size).net_pnl(p0[None, :], p0[None, :] * (1.0 + pct / 100.0), lot_size)
+        else:
+            out[xs, rows] = pct / 100.0 * p0[None, :] * lot_size - 2 * COST_PER_SIDE_INR
+    return out
+
+
+# ============ Scan ============
+
+def pnl_stats(pnl: np.ndarray, traded: np.ndarray) -> Dict[str, np.ndarray]:
+    n = traded.sum(axis=1)
+    wins = ((pnl > 0) & traded).sum(axis=1)
+    gross_w = np.where(pnl > 0, pnl, 0.0).sum(axis=1)
+    gross_l = -np.where(pnl < 0, pnl, 0.0).sum(axis=1)
+    eq = np.cumsum(pnl, axis=1)
+    dd = (np.maximum.accumulate(np.maximum(eq, 0.0), axis=1) - eq).max(axis=1) if pnl.shape[1] else np.zeros(len(pnl))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "trades": n,
+            "total_pnl": pnl.sum(axis=1),
+            "avg_pnl": np.where(n > 0, pnl.sum(axis=1) / np.maximum(n, 1), 0.0),
+            "win_rate": np.where(n > 0, wins * 100.0 / np.maximum(n, 1), 0.0),
+            "profit_factor": np.where(gross_l > 0, gross_w / gross_l, np.inf),
+            "max_drawdown": dd,
+        }
+
+
+def scan(s: Sessions, grid: Optional[Dict[str, list]] = None, lot_size: int = LOT_SIZE) -> pd.DataFrame:
+    """
+    Screen every combination of the grid axes (see default_grid) over all sessions.
+    One core trade per day at most: ORB re-arming, scalps and secondary strategies, DD/dynamic-TP
+    exits and the RSI-slope filter are not modelled -- use replay of the Engine to confirm a pick.
+    """
+    g = default_grid()
+    g.update(grid or {})
+    t_start = time.perf_counter()
+    rsi = rsi_by_minute(s) if USE_RSI else np.full(s.c.shape, np.nan)
+
+    exits = list(itertools.product(g["sl_pct"], g["tp_pct"], range(len(g["trail_steps"]))))
+    sl = np.array([e[0] for e in exits], dtype=np.float64)
+    tp = np.array([e[1] for e in exits], dtype=np.float64)
+    lv, sv = ladder_arrays(g["trail_steps"])
+    lv, sv = lv[[e[2] for e in exits]], sv[[e[2] for e in exits]]
+
+    T = s.c.shape[1]
+    memo: Dict[bytes, np.ndarray] = {}
+    frames = []
+    for orb_end, buf in itertools.product(g["orb_end"], g["entry_buffer_pct"]):
+        t0s, sides = orb_entries(s, rsi, orb_end, buf, g["rsi_long_min"], g["rsi_short_max"])
+        for i, rl in enumerate(g["rsi_long_min"]):
+            for j, rs in enumerate(g["rsi_short_max"]):
+                t0, side = t0s[i, j], sides[i, j]
+                key = t0.tobytes() + side.tobytes()
+                pnl = memo.get(key)
+                if pnl is None:  # many entry combos trade the same days at the same minutes
+                    pnl = memo[key] = exit_pnl(s, t0, side, sl, tp, lv, sv, lot_size)
+                st = pnl_stats(pnl, np.broadcast_to(t0 < T, pnl.shape))
+                frames.append(pd.DataFrame({
+                    "orb_end": orb_end.strftime("%H:%M"), "entry_buffer_pct": buf,
+                    "rsi_long_min": rl, "rsi_short_max": rs,
+                    "sl_pct": sl, "tp_pct": tp, "trail_steps": [str(g["trail_steps"][e[2]]) for e in exits],
+                    **st,
+                }))
+    df = pd.concat(frames, ignore_index=True).sort_values("total_pnl", ascending=False, ignore_index=True)
+    secs = time.perf_counter() - t_start
+    df.attrs["combos_per_sec"] = len(df) / secs if secs > 0 else float("inf")
+    df.attrs["days"] = len(s.days)
+    return df
+
+
+if __name__ == "__main__":
+    # python orb_backtest.py 2023-01-01 2025-09-30 [SYMBOL]
+    from auth import get_fyers
+    from data import DataClient
+    from logging_utils import logger_row as log
+
+    start, end = (dt.date.fromisoformat(x) for x in sys.argv[1:3])
+    sym = sys.argv[3] if len(sys.argv) > 3 else INDEX_SYMBOL
+    sess = load_sessions(DataClient(get_fyers(), log), sym, start, end)
+    res = scan(sess, {
+        "orb_end": [dt.time(9, 20), dt.time(9, 30), dt.time(9, 45), dt.time(10, 0)],
+        "entry_buffer_pct": [0.0, 0.05, 0.1, 0.2],
+        "rsi_long_min": [50, 55, 60],
+        "rsi_short_max": [40, 45, 50],
+        "sl_pct": [10, 15, 20, 25],
+        "tp_pct": [20, 25, 35, 50],
+        "trail_steps": [live_ladder(), ((20, 0), (40, 20)), ()],
+    })
+    print(res.head(25).to_string())
+    print(f"\n{len(res)} combos over {res.attrs['days']} sessions, {res.attrs['combos_per_sec']:.0f} combos/sec")
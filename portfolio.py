@@ -0,0 +1,58 @@
+# portfolio.py
+from typing import Dict, Optional, Tuple
+from models import Position
+
+
+class Portfolio:
+    """
+    Incremental mark-to-market of one engine's open positions, fed with the LTPs the tick
+    already fetched. Totals are kept as running sums, so gates/diagnostics/snapshots read them
+    in O(1) without quoting again.
+      unrealized : sum((ltp - entry) * qty) - exit costs, i.e. what closing everything now would book
+      at_sl      : sum((sl - entry) * qty) - exit costs, i.e. what would be booked if every stop fills
+      exposure   : premium at risk (ltp * qty) per side
+    """
+    def __init__(self, cost_per_side: float = 0.0):
+        self.cost = 2 * cost_per_side
+        self.reset()
+
+    def reset(self):
+        self._pos: Dict[int, Tuple[str, int, float, float, float]] = {}  # id -> (side, qty, entry, ltp, sl)
+        self.unrealized = 0.0
+        self.at_sl = 0.0
+        self.exposure: Dict[str, float] = {"CE": 0.0, "PE": 0.0}
+        self.count: Dict[str, int] = {"CE": 0, "PE": 0}
+
+    def _add(self, side: str, qty: int, entry: float, ltp: float, sl: float, sign: int):
+        self.unrealized += sign * ((ltp - entry) * qty - self.cost)
+        self.at_sl += sign * ((sl - entry) * qty - self.cost)
+        self.exposure[side] = self.exposure.get(side, 0.0) + sign * ltp * qty
+        self.count[side] = self.count.get(side, 0) + sign
+
+    def open(self, p: Position, ltp: Optional[float] = None):
+        ltp = p.entry_price if ltp is None else ltp
+        self._pos[id(p)] = (p.side, p.qty, p.entry_price, ltp, p.sl_price)
+        self._add(p.side, p.qty, p.entry_price, ltp, p.sl_price, +1)
+
+    def mark(self, p: Position, ltp: float):
+        """New LTP and current SL (trailing may have moved it) for one position."""
+        old = self._pos.get(id(p))
+        if old is None:
+            self.open(p, ltp)
+            return
+        self._add(*old, -1)
+        self._pos[id(p)] = (p.side, p.qty, p.entry_price, ltp, p.sl_price)
+        self._add(p.side, p.qty, p.entry_price, ltp, p.sl_price, +1)
+
+    def close(self, p: Position):
+        old = self._pos.pop(id(p), None)
+        if old is not None:
+            self._add(*old, -1)
+        if not self._pos:  # drop float residue once flat
+            self.unrealized = self.at_sl = 0.0
+            self.exposure = {"CE": 0.0, "PE": 0.0}
+
+    def ltp(self, p: Position) -> Optional[float]:
+        """Last mark of a position (None if never marked)."""
+        hit = self._pos.get(id(p))
+        return hit[3] if hit is not None else None
@@ -0,0 +1,156 @@
+# profiler.py
+import os, sys, time, signal, threading, tracemalloc
+from collections import Counter
+from typing import List, Optional
+from config import (LOG_DIR, PROFILE_ENABLED, PROFILE_SAMPLE_MS, PROFILE_TRACE_MALLOC,
+                    PROFILE_MEM_INTERVAL_SEC, PROFILE_TOP_ALLOCS)
+from logging_utils import logger_row as log, ist_now
+
+
+def _frame_name(f) -> str:
+    return f"{os.path.splitext(os.path.basename(f.f_code.co_filename))[0]}:{f.f_code.co_name}"
+
+
+class Profiler:
+    """
+    Wall-clock sampling profiler for one thread (the trading loop) plus periodic tracemalloc
+    snapshots. A daemon thread reads the target's current frame every `sample_ms`, so the loop
+    itself runs unmodified; sampling is in real time, so replays are profiled just the same.
+    stop() writes into LOG_DIR:
+      profile_<tag>_<ts>.folded     collapsed stacks (flamegraph.pl / speedscope input)
+      profile_<tag>_<ts>_alloc.txt  top allocations, growth since start, traced-memory timeline
+    """
+    def __init__(self, tag: str = "engine", sample_ms: float = PROFILE_SAMPLE_MS,
+                 trace_malloc: bool = PROFILE_TRACE_MALLOC, mem_interval_sec: float = PROFILE_MEM_INTERVAL_SEC,
+                 top: int = PROFILE_TOP_ALLOCS):
+        self.tag = tag
+        self.interval = sample_ms / 1000.0
+        self.trace_malloc = trace_malloc
+        self.mem_interval = mem_interval_sec
+        self.top = top
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._owns_tracing = False
+        self._snap0 = self._snap1 = None
+        self._mem: List[tuple] = []   # (seconds since start, current bytes, peak bytes)
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None
+
+    def start(self, thread_id: Optional[int] = None):
+        if self.active:
+            return
+        self._target = thread_id or threading.get_ident()
+        self._t0 = time.perf_counter()
+        if self.trace_malloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracing = True
+            self._snap0 = tracemalloc.take_snapshot()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"profiler-{self.tag}", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        next_mem = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            f = sys._current_frames().get(self._target)
+            if f is not None:
+                names = []
+                while f is not None:
+                    names.append(_frame_name(f))
+                    f = f.f_back
+                self.stacks[";".join(reversed(names))] += 1
+                self.samples += 1
+            now = time.perf_counter()
+            if self.trace_malloc and now >= next_mem and tracemalloc.is_tracing():
+                cur, peak = tracemalloc.get_traced_memory()
+                self._mem.append((now - self._t0, cur, peak))
+                next_mem = now + self.mem_interval
+
+    def stop(self) -> List[str]:
+        """Stop sampling and write the reports; returns the paths written."""
+        if not self.active:
+            return []
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        wall = time.perf_counter() - self._t0
+        if self.trace_malloc and tracemalloc.is_tracing():
+            self._snap1 = tracemalloc.take_snapshot()
+            cur, peak = tracemalloc.get_traced_memory()
+            self._mem.append((wall, cur, peak))
+            if self._owns_tracing:
+                tracemalloc.stop()
+                self._owns_tracing = False
+
+        base = os.path.join(LOG_DIR, f"profile_{self.tag}_{ist_now().strftime('%Y%m%d_%H%M%S')}")
+        paths = [base + ".folded"]
+        with open(paths[0], "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        if self._snap1 is not None:
+            paths.append(base + "_alloc.txt")
+            with open(paths[1], "w", encoding="utf-8") as f:
+                f.write(f"# {self.samples} samples over {wall:.1f}s wall ({self.interval * 1e3:g} ms interval)\n\n")
+                f.write(f"## top {self.top} allocation sites at stop\n")
+                for st in self._snap1.statistics("lineno")[:self.top]:
+                    f.write(f"{st.size / 1024:12.1f} KiB {st.count:9d} blocks  {st.traceback}\n")
+                if self._snap0 is not None:
+                    f.write(f"\n## top {self.top} growth since start\n")
+                    for st in self._snap1.compare_to(self._snap0, "lineno")[:self.top]:
+                        f.write(f"{st.size_diff / 1024:+12.1f} KiB {st.count_diff:+9d} blocks  {st.traceback}\n")
+                f.write("\n## traced memory (sec, current KiB, peak KiB)\n")
+                for t, cur, peak in self._mem:
+                    f.write(f"{t:10.1f} {cur / 1024:12.1f} {peak / 1024:12.1f}\n")
+        self._snap0 = self._snap1 = None
+        log("PROFILE", reason=f"{self.samples} samples, {wall:.1f}s -> {', '.join(os.path.basename(p) for p in paths)}")
+        return paths
+
+
+# ---- process-wide session hooks (Engine.start_session / end_session) ----
+
+_active: Optional[Profiler] = None
+
+
+def session_start(tag: str):
+    """Profile the calling (trading-loop) thread when PROFILE_ENABLED; no-op if already running."""
+    global _active
+    if PROFILE_ENABLED and _active is None:
+        _active = Profiler(tag)
+        _active.start()
+
+
+def session_end() -> List[str]:
+    """Write and clear whatever profile is running (config- or signal-started)."""
+    global _active
+    prof, _active = _active, None
+    return prof.stop() if prof is not None else []
+
+
+def install_signal(tag: str = "engine", signum: Optional[int] = getattr(signal, "SIGUSR1", None)) -> bool:
+    """
+    `kill -USR1 <pid>` toggles profiling of the main thread: the first signal starts it, the
+    next one writes the reports. Returns False where the signal is unavailable (Windows) or
+    when not called from the main thread.
+    """
+    if signum is None:
+        return False
+
+    def toggle(_sig, _frame):
+        global _active
+        if _active is None:
+            _active = Profiler(tag)
+            _active.start()
+            log("PROFILE", reason="started by signal")
+        else:
+            session_end()
+
+    try:
+        signal.signal(signum, toggle)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,66 @@
+# risk.py
+import threading
+from typing import Dict, Tuple
+from config import (MAX_DAILY_LOSS_INR, MAX_CONCURRENT_POS, USE_PROJECTED_RISK_BLOCK, COST_PER_SIDE_INR,
+                    SCALP_MAX_OPEN, SCALP_ENTRY_MIN_GAP_SEC)
+
+
+# ---- pure entry gates (Engine and risk_sim.py); scalars or numpy arrays ----
+
+def entry_gate(realized, n_open, est_entry, sl_pct, lot_size, mtm=0.0, at_sl=0.0,
+               max_daily_loss=MAX_DAILY_LOSS_INR, max_concurrent=MAX_CONCURRENT_POS,
+               projected_block=USE_PROJECTED_RISK_BLOCK, cost_per_side=COST_PER_SIDE_INR):
+    """
+    Daily-loss, concurrency and projected-risk checks of Engine.can_new_entry_with_sl (cooldown aside).
+    mtm / at_sl: open positions' PnL now / if every stop fills (Portfolio); 0 = realized-only gates.
+    """
+    ok = (realized + mtm > -max_daily_loss) & (n_open < max_concurrent)
+    if projected_block:
+        ok = ok & ((est_entry <= 0) | projected_ok(realized, at_sl, est_entry, sl_pct, lot_size,
+                                                    max_daily_loss, cost_per_side))
+    return ok
+
+
+def projected_ok(realized, at_sl, est_entry, sl_pct, lot_size,
+                 max_daily_loss=MAX_DAILY_LOSS_INR, cost_per_side=COST_PER_SIDE_INR):
+    """Day PnL stays above the loss limit even if the new trade and every open stop are hit."""
+    risk = est_entry * (sl_pct / 100.0) * lot_size + 2 * cost_per_side
+    return realized + at_sl - risk > -max_daily_loss
+
+
+def scalp_gate(n_open_scalps, since_last_scalp_sec, max_open=SCALP_MAX_OPEN, min_gap_sec=SCALP_ENTRY_MIN_GAP_SEC):
+    """Side-independent part of Engine.can_open_scalp."""
+    return (n_open_scalps < max_open) & (since_last_scalp_sec >= min_gap_sec)
+
+
+class RiskBook:
+    """
+    Realized PnL and open-position MTM / PnL-at-stops per engine (underlying) for the combined
+    daily-loss and projected-risk gates. A single-engine run owns its own book.
+    """
+    def __init__(self):
+        self._realized: Dict[str, float] = {}
+        self._open: Dict[str, Tuple[float, float]] = {}  # name -> (unrealized, at_sl)
+        self._lock = threading.Lock()
+
+    def update(self, name: str, realized_pnl: float):
+        with self._lock:
+            self._realized[name] = realized_pnl
+
+    def update_open(self, name: str, unrealized: float, at_sl: float):
+        with self._lock:
+            self._open[name] = (unrealized, at_sl)
+
+    def realized(self) -> float:
+        return sum(self._realized.values())
+
+    def unrealized(self) -> float:
+        return sum(v[0] for v in self._open.values())
+
+    def at_sl(self) -> float:
+        return sum(v[1] for v in self._open.values())
+
+    def reset(self):
+        with self._lock:
+            self._realized.clear()
+            self._open.clear()
@@ -0,0 +1,218 @@
+# risk_sim.py
+import os, csv, sys, glob, time, itertools, datetime as dt
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from config import (LOG_DIR, LOT_SIZE, INIT_SL_PCT, SCALP_SL_PCT,
+                    MAX_DAILY_LOSS_INR, MAX_CONCURRENT_POS, USE_PROJECTED_RISK_BLOCK,
+                    RISK_SIM_SESSIONS, RISK_SIM_CHUNK)
+from risk import entry_gate, scalp_gate
+
+_MAX_CELLS = 8_000_000  # settings x sessions x trade slots per pass
+
+
+# ============ Trade history ============
+
+def _ts(s: str) -> dt.datetime:
+    return dt.datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
+
+
+def trades_from_logs(paths: Optional[Sequence[str]] = None) -> List[dict]:
+    """ENTER/EXIT pairs from the CSV logs (FIFO per symbol), in the Engine.trades dict shape."""
+    paths = paths or sorted(glob.glob(os.path.join(LOG_DIR, "orb_sim_*.csv")))
+    out: List[dict] = []
+    for path in paths:
+        open_: Dict[str, List[dict]] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                ev = row.get("event")
+                if ev == "ENTER":
+                    open_.setdefault(row["symbol"], []).append(row)
+                elif ev == "EXIT" and open_.get(row["symbol"]):
+                    e = open_[row["symbol"]].pop(0)
+                    out.append({
+                        "entry_time": _ts(e["timestamp"]), "exit_time": _ts(row["timestamp"]),
+                        "pnl": float(row["pnl"]), "core": "CORE" in e["reason"],
+                        "entry_price": float(e["price"]), "symbol": row["symbol"],
+                    })
+    return out
+
+
+@dataclass
+class TradePool:
+    """Historical sessions as padded (days, K) arrays, trades sorted by entry time within a day."""
+    pnl: np.ndarray
+    entry: np.ndarray      # entry premium (projected-risk estimate)
+    sl_pct: np.ndarray
+    scalp: np.ndarray      # bool
+    start: np.ndarray      # seconds of day; +inf on padding
+    end: np.ndarray
+    count: np.ndarray      # trades per day
+
+    @classmethod
+    def from_trades(cls, trades: Sequence[dict]) -> "TradePool":
+        """Engine.trades dicts (replays/backtests) or trades_from_logs(); needs entry_price."""
+        days: Dict[dt.date, List[dict]] = {}
+        for t in trades:
+            days.setdefault(t["entry_time"].date(), []).append(t)
+        if not days:
+            raise ValueError("no trades to resample")
+        D, K = len(days), max(len(v) for v in days.values())
+        pool = cls(np.zeros((D, K)), np.zeros((D, K)), np.zeros((D, K)), np.zeros((D, K), bool),
+                   np.full((D, K), np.inf), np.full((D, K), np.inf), np.zeros(D, np.int64))
+
+        def sod(ts: dt.datetime) -> float:
+            return ts.hour * 3600 + ts.minute * 60 + ts.second
+
+        for i, (_, ts) in enumerate(sorted(days.items())):
+            ts.sort(key=lambda t: t["entry_time"])
+            pool.count[i] = len(ts)
+            for j, t in enumerate(ts):
+                pool.pnl[i, j] = t["pnl"]
+                pool.entry[i, j] = t.get("entry_price") or 0.0
+                pool.scalp[i, j] = not t["core"]
+                pool.sl_pct[i, j] = INIT_SL_PCT if t["core"] else SCALP_SL_PCT
+                pool.start[i, j] = sod(t["entry_time"])
+                pool.end[i, j] = sod(t["exit_time"])
+        return pool
+
+    def sample(self, rng: np.random.Generator, m: int, mode: str = "day") -> "TradePool":
+        """
+        m synthetic sessions.
+        "day":   whole historical sessions (block bootstrap, block = one day; keeps intraday clustering)
+        "trade": per-session trade count from the empirical distribution, trades drawn i.i.d. from all days
+        """
+        if mode == "day":
+            i = rng.integers(len(self.count), size=m)
+            return TradePool(self.pnl[i], self.entry[i], self.sl_pct[i], self.scalp[i],
+                             self.start[i], self.end[i], self.count[i])
+        if mode != "trade":
+            raise ValueError(f"unknown resampling mode '{mode}'")
+        valid = np.isfinite(self.start)
+        flat = np.nonzero(valid.ravel())[0]
+        K = self.pnl.shape[1]
+        n = self.count[rng.integers(len(self.count), size=m)]
+        pick = flat[rng.integers(len(flat), size=(m, K))]
+        live = np.arange(K)[None, :] < n[:, None]
+        start = np.where(live, self.start.ravel()[pick], np.inf)
+        order = np.argsort(start, axis=1)
+        pick = np.take_along_axis(pick, order, axis=1)
+        live = np.take_along_axis(live, order, axis=1)
+
+        def g(a, pad):
+            return np.where(live, a.ravel()[pick], pad)
+
+        return TradePool(g(self.pnl, 0.0), g(self.entry, 0.0), g(self.sl_pct, 0.0), g(self.scalp, False),
+                         g(self.start, np.inf), g(self.end, np.inf), n)
+
+
+# ============ Simulation ============
+
+def _run(s: TradePool, mdl: np.ndarray, mc: np.ndarray, pb: np.ndarray, lot_size: int):
+    """
+    Replay candidate entries in time order through the live gates for P parameter rows at once.
+    Returns final realized (P, m), intraday worst realized (P, m), entries taken (P, m).
+    """
+    P, m, K = len(mdl), len(s.count), s.pnl.shape[1]
+    mdl, mc, pb = mdl[:, None], mc[:, None], pb[:, None]
+    acc = np.zeros((P, m, K), dtype=bool)
+    live = np.isfinite(s.start)
+    for k in range(K):
+        prev = acc[:, :, :k]
+        if k:
+            closed = s.end[:, :k] <= s.start[:, k, None]               # (m, k): closed before this entry
+            realized = (prev * closed * s.pnl[None, :, :k]).sum(axis=2)
+            n_open = (prev & ~closed).sum(axis=2)
+            scal = prev & s.scalp[None, :, :k]
+            n_scalp = (scal & ~closed).sum(axis=2)
+            last_scalp = np.where(scal, s.start[None, :, :k], -np.inf).max(axis=2)
+        else:
+            realized = np.zeros((P, m))
+            n_open = n_scalp = np.zeros((P, m), dtype=np.int64)
+            last_scalp = np.full((P, m), -np.inf)
+        args = (realized, n_open, s.entry[None, :, k], s.sl_pct[None, :, k], lot_size)
+        ok = np.where(pb, entry_gate(*args, max_daily_loss=mdl, max_concurrent=mc, projected_block=True),
+                      entry_gate(*args, max_daily_loss=mdl, max_concurrent=mc, projected_block=False))
+        sc = scalp_gate(n_scalp, s.start[None, :, k] - last_scalp)
+        ok = ok & np.where(s.scalp[None, :, k], sc, True)
+        acc[:, :, k] = ok & live[None, :, k]
+
+    booked = acc * s.pnl[None]
+    final = booked.sum(axis=2)
+    # realized after each exit -> worst intraday point
+    upto = (s.end[:, None, :] <= s.end[:, :, None]).astype(np.float64)   # (m, exit k, trade j)
+    path = np.einsum("pmj,mkj->pmk", booked, upto)
+    worst = np.minimum(np.where(live[None], path, np.inf).min(axis=2), 0.0)
+    return final, worst, acc.sum(axis=2)
+
+
+def default_grid() -> Dict[str, list]:
+    return {
+        "max_daily_loss": [MAX_DAILY_LOSS_INR],
+        "max_concurrent": [MAX_CONCURRENT_POS],
+        "projected_block": [USE_PROJECTED_RISK_BLOCK],
+    }
+
+
+def simulate(pool: TradePool, grid: Optional[Dict[str, list]] = None, n_sessions: int = RISK_SIM_SESSIONS,
+             mode: str = "day", seed: Optional[int] = None, lot_size: int = LOT_SIZE) -> pd.DataFrame:
+    """
+    Loss-limit hit probability and session PnL distribution for every grid combination.
+    Every combination sees the same resampled sessions (common random numbers), so
+    differences between rows come from the gates, not from sampling noise.
+    Outcomes are the recorded ones: trades that were blocked live cannot be replayed.
+    """
+    g = default_grid()
+    g.update(grid or {})
+    combos = list(itertools.product(g["max_daily_loss"], g["max_concurrent"], g["projected_block"]))
+    mdl = np.array([c[0] for c in combos], dtype=np.float64)
+    mc = np.array([c[1] for c in combos], dtype=np.int64)
+    pb = np.array([c[2] for c in combos], dtype=bool)
+
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    finals, worsts, taken = [], [], []
+    done = 0
+    per_pass = max(1, min(RISK_SIM_CHUNK, _MAX_CELLS // (len(combos) * pool.pnl.shape[1])))
+    while done < n_sessions:
+        m = min(per_pass, n_sessions - done)
+        f, w, n = _run(pool.sample(rng, m, mode), mdl, mc, pb, lot_size)
+        finals.append(f.astype(np.float32))
+        worsts.append(w.astype(np.float32))
+        taken.append(n.astype(np.int16))
+        done += m
+    final = np.concatenate(finals, axis=1)
+    worst = np.concatenate(worsts, axis=1)
+    n_taken = np.concatenate(taken, axis=1)
+
+    q = np.percentile(final, [1, 5, 50, 95], axis=1)
+    tail = final <= q[1][:, None]
+    df = pd.DataFrame({
+        "max_daily_loss": mdl, "max_concurrent": mc, "projected_block": pb,
+        "hit_prob": (worst <= -mdl[:, None]).mean(axis=1),
+        "loss_day_prob": (final < 0).mean(axis=1),
+        "mean_pnl": final.mean(axis=1), "std_pnl": final.std(axis=1),
+        "p01": q[0], "p05": q[1], "p50": q[2], "p95": q[3],
+        "cvar05": (final * tail).sum(axis=1) / np.maximum(tail.sum(axis=1), 1),
+        "taken_per_session": n_taken.mean(axis=1),
+    })
+    df.attrs["sessions"] = n_sessions
+    df.attrs["seconds"] = time.perf_counter() - t0
+    return df
+
+
+if __name__ == "__main__":
+    # python risk_sim.py [n_sessions] [day|trade]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else RISK_SIM_SESSIONS
+    mode = sys.argv[2] if len(sys.argv) > 2 else "day"
+    trades = trades_from_logs()
+    pool = TradePool.from_trades(trades)
+    res = simulate(pool, {
+        "max_daily_loss": [1000, 1500, 2000, 3000, 4000],
+        "max_concurrent": [1, 2, 3],
+        "projected_block": [False, True],
+    }, n_sessions=n, mode=mode)
+    print(res.to_string(index=False))
+    print(f"\n{len(trades)} trades over {len(pool.count)} sessions -> {n} synthetic sessions x {len(res)} "
+          f"settings in {res.attrs['seconds']:.1f}s")
@@ -0,0 +1,94 @@
+# scheduler.py
+import math
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+from config import (POLL_MIN_SEC, POLL_MAX_SEC, POLL_BUDGET_PER_MIN, POLL_SAFETY_SIGMAS,
+                    POLL_VOL_HALFLIFE_SEC, POLL_DEFAULT_VOL_BPS)
+from logging_utils import ist_now
+
+
+class PollScheduler:
+    """
+    Per-symbol poll cadence from how soon anything can happen to it.
+    For a symbol at price p with actionable levels L (stops, targets, trail/breakeven thresholds,
+    breakout buffers, strategy bands) and recent volatility s (log-return per sqrt(second), EWMA),
+    a `k`-sigma move covers the nearest level in about (d / (k*s))^2 seconds, d = min|ln(L/p)|;
+    the next poll is that, clamped to [min_sec, max_sec] and to any time deadline (impulse
+    window, minute close). When the planned calls exceed `budget_per_min`, every interval is
+    stretched by the same factor (never below min_sec) so the total stays inside the budget.
+    Times are ist_now() seconds, so replays on a virtual clock schedule the same way.
+    """
+    def __init__(self, min_sec: float = POLL_MIN_SEC, max_sec: float = POLL_MAX_SEC,
+                 budget_per_min: float = POLL_BUDGET_PER_MIN, k: float = POLL_SAFETY_SIGMAS,
+                 vol_halflife_sec: float = POLL_VOL_HALFLIFE_SEC, default_vol_bps: float = POLL_DEFAULT_VOL_BPS):
+        self.min_sec = min_sec
+        self.max_sec = max_sec
+        self.budget = budget_per_min
+        self.k = k
+        self.halflife = vol_halflife_sec
+        self.default_var = (default_vol_bps / 1e4) ** 2
+        self.scale = 1.0
+        self._last: Dict[str, Tuple[float, float]] = {}   # symbol -> (t, price) of the last poll
+        self._var: Dict[str, float] = {}                  # symbol -> EWMA squared log-return per second
+        self._raw: Dict[str, float] = {}                  # symbol -> unscaled interval
+        self._due: Dict[str, float] = {}
+        self._calls: deque = deque()
+
+    @staticmethod
+    def _now(now: Optional[float]) -> float:
+        return ist_now().timestamp() if now is None else now
+
+    def observe(self, symbol: str, price: float, now: Optional[float] = None):
+        """One poll of `symbol` happened (counts against the budget, updates its volatility)."""
+        now = self._now(now)
+        self._calls.append(now)
+        last = self._last.get(symbol)
+        if last is not None and price > 0 and last[1] > 0 and now > last[0]:
+            dt_ = now - last[0]
+            r2 = math.log(price / last[1]) ** 2 / dt_
+            w = 1.0 - 0.5 ** (dt_ / self.halflife)
+            self._var[symbol] = (1.0 - w) * self._var.get(symbol, r2) + w * r2
+        self._last[symbol] = (now, price)
+
+    def vol(self, symbol: str) -> float:
+        """Recent volatility, log-return per sqrt(second)."""
+        return math.sqrt(max(self._var.get(symbol, self.default_var), 1e-16))
+
+    def plan(self, symbol: str, price: float, levels: Iterable[Optional[float]] = (),
+             deadline: Optional[float] = None, now: Optional[float] = None) -> float:
+        """Schedule the next poll of `symbol`; returns the interval chosen."""
+        now = self._now(now)
+        ds = [abs(math.log(lv / price)) for lv in levels if lv and lv > 0 and price > 0]
+        if ds:
+            raw = (min(ds) / (self.k * self.vol(symbol))) ** 2
+        else:
+            raw = self.max_sec
+        raw = min(max(raw, self.min_sec), self.max_sec)
+        self._raw[symbol] = raw
+        demand = sum(60.0 / r for r in self._raw.values())
+        self.scale = max(1.0, demand / self.budget) if self.budget else 1.0
+        iv = raw * self.scale
+        if deadline is not None and deadline > now:
+            iv = min(iv, max(deadline - now, self.min_sec))
+        self._due[symbol] = now + iv
+        return iv
+
+    def due(self, symbol: str, now: Optional[float] = None) -> bool:
+        return self._now(now) >= self._due.get(symbol, 0.0)
+
+    def forget(self, symbol: str):
+        for d in (self._last, self._var, self._raw, self._due):
+            d.pop(symbol, None)
+
+    def next_wait(self, now: Optional[float] = None) -> float:
+        """Seconds until the earliest symbol is due."""
+        if not self._due:
+            return self.min_sec
+        return max(0.0, min(self._due.values()) - self._now(now))
+
+    def used_per_min(self, now: Optional[float] = None) -> int:
+        """Polls in the last 60 s (budget used)."""
+        now = self._now(now)
+        while self._calls and self._calls[0] < now - 60.0:
+            self._calls.popleft()
+        return len(self._calls)
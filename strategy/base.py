@@ -1,8 +1,33 @@
 # strategy/base.py
-from typing import Optional
+from typing import Optional, Tuple
 
 class IStrategy:
+    """
+    Pluggable entry strategy. Class attributes declare what it needs so the engine can
+    feed, seed, gate and order it without strategy-specific code:
+      symbols     - data symbols read (the engine's underlying index when empty)
+      timeframes  - aggregated timeframes (minutes) whose finished bars feed on_bar
+      warmup_bars - 1m bars needed before signal() can fire (drives cross-session seeding)
+      needs_ltp   - requires a live index LTP in the snapshot
+      route       - 'scalp' (BB-style range scalp, scalp cooldown) or 'secondary' (regime router)
+      cost        - relative evaluation cost; cheaper strategies are evaluated first
+    """
     name: str = "base"
-    def signal(self, idx_ltp: float, rsi_val: Optional[float]) -> Optional[str]:
-        """Return 'CE'/'PE'/None based on current state."""
+    symbols: Tuple[str, ...] = ()
+    timeframes: Tuple[int, ...] = ()
+    warmup_bars: int = 0
+    needs_ltp: bool = True
+    route: str = "secondary"
+    cost: int = 10
+
+    def on_bar(self, tf: int, bar) -> None:
+        """Finished-bar event from the shared BarAggregator for a subscribed timeframe."""
+        pass
+
+    def signal(self, snap) -> Optional[str]:
+        """Return 'CE'/'PE'/None from the tick's MarketSnapshot."""
         raise NotImplementedError
+
+    def trigger_levels(self) -> Tuple[float, ...]:
+        """Index prices where signal() can change (bands), for the adaptive poll scheduler."""
+        return ()
@@ -2,38 +2,45 @@ import pandas as pd
 from typing import Optional, Tuple
 from config import (SCALP_BB_PERIOD, SCALP_BB_STD, SCALP_RSI_MIN, SCALP_RSI_MAX,
                     SCALP_LOOKBACK_MIN, ORB_START_IST)
-from data import utc_epoch_to_ist_dt, ist_now
-from indicators import compute_rsi_from_1m
+from data import ist_now
+from indicators import compute_rsi
+from strategy.base import IStrategy
+from strategy.registry import register
 
-class BBScalp:
+@register
+class BBScalp(IStrategy):
     """
     Bollinger Band mean-reversion scalper on INDEX 1m data.
     Buys CE when price rejects lower band in RSI range regime.
     Buys PE when price rejects upper band in RSI range regime.
     """
-    def __init__(self, data_client, logger, index_symbol: str):
+    name = "bb_scalp"
+    timeframes = (1,)
+    warmup_bars = SCALP_BB_PERIOD + 5
+    route = "scalp"
+    cost = 1
+
+    def __init__(self, data_client, logger, index_symbol: str, bars):
         self.dc = data_client
         self.log = logger
         self.index_symbol = index_symbol
-
-    def _build_today_df(self) -> pd.DataFrame:
-        c = self.dc.get_1m_today(self.index_symbol)
-        rows = []
-        for ts, o, h, l, cl, v in c:
-            rows.append({"ts": utc_epoch_to_ist_dt(ts), "o": o, "h": h, "l": l, "c": cl, "v": v})
-        df = pd.DataFrame(rows)
-        return df
+        self.bars = bars
+        self._levels = None  # (prev_close, upper, lower, rsi) as of the last closed 1m bar
 
     def _recent_df(self) -> pd.DataFrame:
-        df = self._build_today_df()
+        df = self.bars.frame(1)
         if df.empty:
             return df
         # only post-open data
-        df = df[df['ts'].dt.time >= ORB_START_IST]
-        # limit to lookback window
-        cutoff = ist_now() - pd.Timedelta(minutes=SCALP_LOOKBACK_MIN)
-        df = df[df['ts'] >= cutoff]
-        return df
+        df = df[df.index.time >= ORB_START_IST]
+        # limit to lookback window; warm-start rows (prior sessions) only fill what today lacks
+        now = ist_now()
+        cutoff = now - pd.Timedelta(minutes=SCALP_LOOKBACK_MIN)
+        is_today = df.index.date == now.date()
+        today_df = df[is_today & (df.index >= cutoff)]
+        need = max(0, SCALP_BB_PERIOD + 5 - len(today_df))
+        seed_df = df[~is_today].tail(need) if need else df.iloc[0:0]
+        return pd.concat([seed_df, today_df])
 
     def _compute_bb(self, closes: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series]:
         ma = closes.rolling(SCALP_BB_PERIOD).mean()
@@ -42,43 +49,45 @@ class BBScalp:
         lower = ma - SCALP_BB_STD * sd
         return ma, upper, lower
 
-    def signal(self) -> Optional[str]:
-        """
-        Returns 'CE' / 'PE' / None based on last two candles:
-        - CE: last closed candle <= lower band AND current price back above lower band, RSI in [RSI_MIN, RSI_MAX]
-        - PE: last closed candle >= upper band AND current price back below upper band, RSI in [RSI_MIN, RSI_MAX]
-        """
+    def on_bar(self, tf: int, bar) -> None:
+        """Recompute bands/RSI once per closed 1m bar; signal() then only compares the live LTP."""
+        self._levels = None
         df = self._recent_df()
         if df.empty or len(df) < SCALP_BB_PERIOD + 5:
-            return None
+            return
 
-        # Compute RSI on 1m (no aggregation for faster responsiveness)
-        rsi = compute_rsi_from_1m(df[['ts','o','h','l','c','v']].copy(), period=14, tf_min=1)
-        if rsi is None or not (SCALP_RSI_MIN <= rsi <= SCALP_RSI_MAX):
-            return None  # avoid trending conditions
+        # RSI on 1m (no aggregation for faster responsiveness)
+        rsi = compute_rsi(df, period=14)
+        if rsi is None:
+            return
 
         closes = df['c']
         ma, upper, lower = self._compute_bb(closes)
+        if pd.isna(upper.iloc[-1]) or pd.isna(lower.iloc[-1]):
+            return
+        self._levels = (float(closes.iloc[-1]), float(upper.iloc[-1]), float(lower.iloc[-1]), float(rsi))
 
-        # Use last closed bar and current live price (ltp)
-        last_idx = closes.index[-1]
-        prev_idx = closes.index[-2] if len(closes) >= 2 else None
-        if prev_idx is None:
-            return None
-
-        last_close = float(closes.loc[last_idx])
-        prev_close = float(closes.loc[prev_idx])
-        last_upper = float(upper.loc[last_idx]) if pd.notna(upper.loc[last_idx]) else None
-        last_lower = float(lower.loc[last_idx]) if pd.notna(lower.loc[last_idx]) else None
+    def trigger_levels(self):
+        return self._levels[1:3] if self._levels is not None else ()
 
-        if last_upper is None or last_lower is None:
+    def signal(self, snap) -> Optional[str]:
+        """
+        Returns 'CE' / 'PE' / None based on the last closed candle vs the live index price (snap.idx_ltp).
+        Uses its own 1m RSI; the core snap.rsi_val is ignored.
+        - CE: last closed candle <= lower band AND current price back above lower band, RSI in [RSI_MIN, RSI_MAX]
+        - PE: last closed candle >= upper band AND current price back below upper band, RSI in [RSI_MIN, RSI_MAX]
+        """
+        lv = self._levels  # read once: on_bar replaces it between ticks
+        if lv is None:
             return None
+        prev_close, last_upper, last_lower, rsi = lv
+        if not (SCALP_RSI_MIN <= rsi <= SCALP_RSI_MAX):
+            return None  # avoid trending conditions
 
-        # Live index LTP for 'rejection' confirmation
-        try:
-            ltp = self.dc.get_ltp(self.index_symbol)
-        except Exception:
+        # Live index LTP for 'rejection' confirmation (from the tick snapshot, no extra quote)
+        if snap.idx_ltp is None:
             return None
+        ltp = float(snap.idx_ltp)
 
         # Mean-reversion “tag + reject”
         # Long scalp (CE): touched/closed at/below lower band, then ltp back above lower band
@@ -0,0 +1,68 @@
+# strategy/executor.py
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+from models import MarketSnapshot
+
+
+class StrategyExecutor:
+    """
+    Evaluate strategies concurrently on one immutable MarketSnapshot per tick.
+    - per-strategy deadline (timeout_sec from submit); late strategies count as no-signal
+    - errors are isolated per strategy and logged as STRAT_ERR (same as the serial router)
+    - a strategy still running from an earlier tick is skipped instead of queued again
+    - max_workers=0 evaluates inline (deterministic, e.g. for replay)
+    Thread pool rather than processes: strategies share the data client/aggregator and
+    their per-tick work is small after on_bar precomputation. The pool is started on first
+    use, so an executor that was shut down at session end serves the next session again.
+    """
+    def __init__(self, logger, max_workers: int = 4, timeout_sec: float = 0.25):
+        self.log = logger
+        self.timeout_sec = timeout_sec
+        self.max_workers = max_workers
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[str, object] = {}
+
+    def _call(self, s, snap: MarketSnapshot) -> Optional[str]:
+        return s.signal(snap)
+
+    def evaluate(self, strategies: List, snap: MarketSnapshot, day_pnl: float = 0.0) -> Dict[str, Optional[str]]:
+        """Strategies are submitted (or run inline) in the order given, i.e. cheapest first."""
+        out: Dict[str, Optional[str]] = {}
+        if self.max_workers <= 0:
+            for s in strategies:
+                try:
+                    out[s.name] = self._call(s, snap)
+                except Exception as e:
+                    self.log("STRAT_ERR", reason=f"{s.name}: {e}", day_pnl=day_pnl)
+                    out[s.name] = None
+            return out
+
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="strat")
+        futs = {}
+        for s in strategies:
+            prev = self._inflight.get(s.name)
+            if prev is not None and not prev.done():
+                self.log("STRAT_BUSY", reason=f"{s.name}: previous evaluation still running", day_pnl=day_pnl)
+                out[s.name] = None
+                continue
+            futs[s.name] = self._inflight[s.name] = self.pool.submit(self._call, s, snap)
+
+        deadline = time.monotonic() + self.timeout_sec
+        for name, f in futs.items():
+            try:
+                out[name] = f.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                self.log("STRAT_TIMEOUT", reason=f"{name}: > {self.timeout_sec * 1000:.0f}ms", day_pnl=day_pnl)
+                out[name] = None
+            except Exception as e:
+                self.log("STRAT_ERR", reason=f"{name}: {e}", day_pnl=day_pnl)
+                out[name] = None
+        return out
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+        self._inflight.clear()
@@ -3,7 +3,7 @@ from typing import Optional
 from config import ORB_START_IST, ORB_END_IST, ENTRY_BUFFER_PCT
 from config import USE_RSI, RSI_PERIOD, RSI_TIMEFRAME_MIN, RSI_LONG_MIN, RSI_SHORT_MAX
 from data import utc_epoch_to_ist_dt
-from indicators import compute_rsi_from_1m
+from indicators import compute_rsi_from_1m, compute_rsi
 
 class ORBStrategy:
     def __init__(self, data_client, logger):
@@ -16,7 +16,8 @@ class ORBStrategy:
         self.long_armed = True
         self.short_armed = True
 
-    def compute_orb(self, one_min_candles: list) -> Optional[float]:
+    def compute_orb(self, one_min_candles: list, rsi_frame: Optional[pd.DataFrame] = None) -> Optional[float]:
+        """ORB levels from today's candles; RSI from rsi_frame (pre-aggregated, warm-started bars) when given."""
         rows = []
         for ts, o, h, l, cl, v in one_min_candles:
             t_ist = utc_epoch_to_ist_dt(ts)
@@ -32,11 +33,13 @@ class ORBStrategy:
         self.entry_lo_buf = self.or_low  * (1 - ENTRY_BUFFER_PCT/100.0)
 
         rsi_val = None
-        if USE_RSI:
+        if USE_RSI and rsi_frame is not None:
+            rsi_val = compute_rsi(rsi_frame, period=RSI_PERIOD)
+        elif USE_RSI:
             post_open = df[df['ts'].dt.time >= ORB_START_IST]
             rsi_val = compute_rsi_from_1m(post_open, period=RSI_PERIOD, tf_min=RSI_TIMEFRAME_MIN)
 
-        self.log("ORB_LEVELS", reason=f"ORH={self.or_high:.2f} ORL={self.or_low:.2f} RSI={rsi_val if rsi_val is not None else 'NA'}")
+        self.log("ORB_LEVELS", symbol=self.dc.inst.index_symbol, reason=f"ORH={self.or_high:.2f} ORL={self.or_low:.2f} RSI={rsi_val if rsi_val is not None else 'NA'}")
         return rsi_val
 
     def rsi_allows(self, direction: str, rsi_val: Optional[float]) -> bool:
@@ -0,0 +1,33 @@
+# strategy/registry.py
+from typing import Dict, List, Sequence, Tuple, Type
+from strategy.base import IStrategy
+
+REGISTRY: Dict[str, Type[IStrategy]] = {}
+
+
+def register(cls: Type[IStrategy]) -> Type[IStrategy]:
+    """Class decorator: make a strategy buildable by name from config.STRATEGIES."""
+    if cls.name in REGISTRY and REGISTRY[cls.name] is not cls:
+        raise ValueError(f"strategy name already registered: {cls.name}")
+    REGISTRY[cls.name] = cls
+    return cls
+
+
+def load_builtins():
+    # importing registers them
+    import strategy.bb_scalp, strategy.supertrend_trend, strategy.vwap_reversion  # noqa: F401
+
+
+def build_strategies(specs: Sequence[Tuple[str, dict]], data_client, logger, index_symbol: str, bars) -> List[IStrategy]:
+    """Instantiate (name, params) specs, cheapest first."""
+    load_builtins()
+    out = []
+    for name, params in specs:
+        cls = REGISTRY.get(name)
+        if cls is None:
+            raise ValueError(f"unknown strategy '{name}' (registered: {sorted(REGISTRY)})")
+        s = cls(data_client, logger, index_symbol, bars, **(params or {}))
+        if not s.symbols:
+            s.symbols = (index_symbol,)
+        out.append(s)
+    return sorted(out, key=lambda s: s.cost)
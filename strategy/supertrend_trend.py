@@ -2,7 +2,7 @@
 import pandas as pd
 from typing import Optional
 from strategy.base import IStrategy
-from data import utc_epoch_to_ist_dt
+from strategy.registry import register
 from config import ORB_START_IST, RSI_LONG_MIN, RSI_SHORT_MAX
 
 def atr(df: pd.DataFrame, period=10):
@@ -37,79 +37,43 @@ def supertrend(df: pd.DataFrame, period=10, multiplier=3.0):
                 st.iloc[i] = upper.iloc[i]
     return st, dir_up
 
+@register
 class SupertrendTrend(IStrategy):
     name = "supertrend_trend"
+    needs_ltp = False
+    cost = 2
 
-    def __init__(self, data_client, logger, index_symbol: str, period=10, multiplier=3.0, tf_min=5):
+    def __init__(self, data_client, logger, index_symbol: str, bars, period=10, multiplier=3.0, tf_min=5):
         self.dc = data_client
         self.log = logger
         self.symbol = index_symbol
+        self.bars = bars
         self.period = period
         self.multiplier = multiplier
         self.tf_min = tf_min
+        self.timeframes = (tf_min,)
+        self.warmup_bars = (max(14, period + 5) + 1) * tf_min
+        self._levels = None  # (last_st, last_c) as of the last finished tf bar
 
-    def _as_df(self, c) -> pd.DataFrame:
-        if c is None:
-            return pd.DataFrame()
-
-        if isinstance(c, (list, tuple)):
-            rows = []
-            for row in c:
-                if isinstance(row, dict):
-                    ts = row.get("t") or row.get("ts")
-                    o = row.get("o"); h = row.get("h"); l = row.get("l"); cl = row.get("c"); v = row.get("v")
-                else:
-                    if len(row) < 6:
-                        continue
-                    ts, o, h, l, cl, v = row[:6]
-                rows.append({"ts": utc_epoch_to_ist_dt(ts), "o": o, "h": h, "l": l, "c": cl, "v": v})
-            df = pd.DataFrame(rows)
-        elif isinstance(c, pd.DataFrame):
-            df = c.copy()
-            if "ts" not in df.columns:
-                if "t" in df.columns:
-                    df = df.rename(columns={"t": "ts"})
-                elif pd.api.types.is_datetime64_any_dtype(df.index):
-                    df = df.reset_index().rename(columns={df.columns[0]: "ts"})
-                else:
-                    return pd.DataFrame()
-            if not pd.api.types.is_datetime64_any_dtype(df["ts"]):
-                df["ts"] = df["ts"].apply(utc_epoch_to_ist_dt)
-        else:
-            return pd.DataFrame()
-
-        if df.empty or "ts" not in df.columns:
-            return pd.DataFrame()
-
-        for col in ["o", "h", "l", "c", "v"]:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-        df = df.dropna(subset=["o", "h", "l", "c", "v"])
-        df = df.set_index("ts").sort_index()
-        return df
-
-    def _df_agg(self) -> pd.DataFrame:
-        c = self.dc.get_1m_today(self.symbol)
-        df = self._as_df(c)
-        if df.empty:
-            return df
+    def on_bar(self, tf: int, bar) -> None:
+        # recompute once per finished tf bar (warm-started bars included)
+        df = self.bars.frame(self.tf_min)
         df = df[df.index.time >= ORB_START_IST]
-        # resample on index (no 'on' kw)
-        o = df["o"].resample(f"{self.tf_min}min").first()
-        h = df["h"].resample(f"{self.tf_min}min").max()
-        l = df["l"].resample(f"{self.tf_min}min").min()
-        cl = df["c"].resample(f"{self.tf_min}min").last()
-        out = pd.DataFrame({"o": o, "h": h, "l": l, "c": cl}).dropna()
-        return out
+        if df.empty or len(df) < max(14, self.period + 5):
+            self._levels = None
+            return
+        st, _ = supertrend(df, period=self.period, multiplier=self.multiplier)
+        self._levels = (float(st.iloc[-1]), float(df["c"].iloc[-1]))
 
-    def signal(self, idx_ltp: float, rsi_val: Optional[float]) -> Optional[str]:
-        df5 = self._df_agg()
-        if df5.empty or len(df5) < max(14, self.period + 5):
-            return None
+    def trigger_levels(self):
+        return self._levels[:1] if self._levels is not None else ()
 
-        st, _ = supertrend(df5, period=self.period, multiplier=self.multiplier)
-        last_st = float(st.iloc[-1])
-        last_c  = float(df5["c"].iloc[-1])
+    def signal(self, snap) -> Optional[str]:
+        lv = self._levels  # read once: on_bar replaces it between ticks
+        if lv is None:
+            return None
+        last_st, last_c = lv
+        rsi_val = snap.rsi_val
 
         if rsi_val is None:
             return None
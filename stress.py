@@ -0,0 +1,98 @@
+# stress.py
+import os, sys, time, shutil, tempfile, tracemalloc, datetime as dt
+from typing import List, Optional
+import numpy as np
+import logging_utils
+from config import IST, LOG_DIR, ORB_END_IST, STRESS_RATES, STRESS_SECONDS
+from logging_utils import set_clock, logger_row as log
+from bar_store import BarStore
+from data import DataClient
+from instruments import default_instrument
+from engine import Engine
+from synthetic import VirtualClock, MarketModel, SyntheticBroker
+
+
+def run_rate(rate: float, seconds: float = STRESS_SECONDS, positions: int = 2,
+             day: Optional[dt.date] = None, seed: Optional[int] = None) -> dict:
+    """
+    Drive one Engine through `seconds` of synthetic market at `rate` ticks/sec on a virtual clock
+    (clock advances 1/rate per tick; no sleeping) and measure per-tick wall time and memory.
+    The engine falls behind at this rate when a tick takes longer than 1/rate.
+    """
+    day = day or dt.date(2001, 1, 1)  # a Monday no real log/checkpoint uses
+    clock = VirtualClock(IST.localize(dt.datetime.combine(day, ORB_END_IST)))
+    tmp = tempfile.mkdtemp(prefix="orb_stress_")
+    prev_log = logging_utils.LOG_FILE
+    logging_utils.LOG_FILE = os.path.join(LOG_DIR, f"stress_{int(rate)}.csv")
+    set_clock(clock.now)
+    try:
+        broker = SyntheticBroker(clock, MarketModel(seed=seed), ticks_per_sec=rate)
+        inst = default_instrument()
+        eng = Engine(broker, inst, DataClient(broker, log, inst, store=BarStore(tmp)))
+        eng.ckpt = None
+        eng.start_session(allow_yday=False)
+        for i in range(positions):  # position management/trailing is the per-tick hot path
+            eng.create_position("CE" if i % 2 == 0 else "PE", is_core=True, note="STRESS")
+
+        n = int(rate * seconds)
+        lat = np.empty(n)
+        mem: List[int] = []
+        hist: List[int] = []
+        every = max(1, n // 10)
+        tracemalloc.start()
+        t_start = time.perf_counter()
+        for i in range(n):
+            clock.advance(1.0 / rate)
+            t0 = time.perf_counter()
+            if eng.tick() is None:
+                lat = lat[:i]
+                break
+            lat[i] = time.perf_counter() - t0
+            if i % every == 0:
+                mem.append(tracemalloc.get_traced_memory()[0])
+                hist.append(sum(len(p.history) for p in eng.positions))
+        wall = time.perf_counter() - t_start
+        tracemalloc.stop()
+        eng.end_session()
+
+        budget = 1.0 / rate
+        return {
+            "rate": rate, "ticks": len(lat), "wall_sec": wall,
+            "achieved_tps": len(lat) / wall if wall > 0 else float("inf"),
+            "p50_ms": float(np.percentile(lat, 50) * 1e3) if len(lat) else 0.0,
+            "p99_ms": float(np.percentile(lat, 99) * 1e3) if len(lat) else 0.0,
+            "late_pct": float((lat > budget).mean() * 100.0) if len(lat) else 0.0,
+            "keeps_up": bool(len(lat)) and wall <= seconds,
+            "mem_start_kb": mem[0] / 1024 if mem else 0.0,
+            "mem_end_kb": mem[-1] / 1024 if mem else 0.0,
+            "history_len": hist[-1] if hist else 0,
+            "history_growth": (hist[-1] - hist[0]) if hist else 0,
+            "trades": len(eng.trades),
+            "broker_calls": broker.calls,
+        }
+    finally:
+        set_clock(None)
+        logging_utils.LOG_FILE = prev_log
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def sweep(rates=STRESS_RATES, seconds: float = STRESS_SECONDS, positions: int = 2, seed: Optional[int] = None):
+    rows = []
+    for r in rates:
+        res = run_rate(r, seconds, positions, seed=seed)
+        rows.append(res)
+        if not res["keeps_up"]:
+            break  # every higher rate falls behind too
+    return rows
+
+
+if __name__ == "__main__":
+    # python stress.py [seconds] [positions]
+    secs = float(sys.argv[1]) if len(sys.argv) > 1 else STRESS_SECONDS
+    npos = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    out = sweep(seconds=secs, positions=npos, seed=7)
+    cols = ["rate", "ticks", "achieved_tps", "p50_ms", "p99_ms", "late_pct", "keeps_up",
+            "mem_start_kb", "mem_end_kb", "history_len", "history_growth", "trades", "broker_calls"]
+    print(" ".join(f"{c:>14}" for c in cols))
+    for r in out:
+        print(" ".join(f"{r[c]:>14.2f}" if isinstance(r[c], float) else f"{str(r[c]):>14}" for c in cols))
@@ -0,0 +1,201 @@
+# synthetic.py
+import re, threading, datetime as dt
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import (IST, ORB_START_IST, RISK_FREE_RATE,
+                    SYN_SPOT0, SYN_VOL_ANNUAL, SYN_REGIME_VOL_MULT, SYN_REGIME_MEAN_MIN,
+                    SYN_JUMPS_PER_DAY, SYN_JUMP_STD_PCT, SYN_IV_PREMIUM, SYN_DAYS_TO_EXPIRY,
+                    SYN_SPREAD_TICKS, TICK_SIZE)
+from greeks import bs_price
+
+SESSION_SEC = 375 * 60          # 09:15 .. 15:30
+YEAR_SEC = 252 * SESSION_SEC    # vol is quoted per trading year
+_OPT = re.compile(r"(\d+)(CE|PE)$")
+
+
+class VirtualClock:
+    """Simulated IST time; install with logging_utils.set_clock(clock.now)."""
+    def __init__(self, start: dt.datetime):
+        self.t = start
+
+    def now(self) -> dt.datetime:
+        return self.t
+
+    def advance(self, seconds: float):
+        self.t += dt.timedelta(seconds=seconds)
+
+
+class MarketModel:
+    """
+    Index price process: GBM with Poisson jumps and a two-state (calm/stressed) volatility
+    regime with exponential holding times. Paths are produced in vectorized chunks.
+    """
+    def __init__(self, spot0: float = SYN_SPOT0, vol: float = SYN_VOL_ANNUAL,
+                 regime_mult: Tuple[float, float] = SYN_REGIME_VOL_MULT,
+                 regime_mean_min: Tuple[float, float] = SYN_REGIME_MEAN_MIN,
+                 jumps_per_day: float = SYN_JUMPS_PER_DAY, jump_std_pct: float = SYN_JUMP_STD_PCT,
+                 seed: Optional[int] = None):
+        self.spot = spot0
+        self.vol = vol
+        self.mult = np.asarray(regime_mult, dtype=np.float64)
+        self.mean_sec = np.asarray(regime_mean_min, dtype=np.float64) * 60.0
+        self.jump_rate = jumps_per_day / SESSION_SEC
+        self.jump_std = jump_std_pct / 100.0
+        self.rng = np.random.default_rng(seed)
+        self.regime = 0
+        self._left = self.rng.exponential(self.mean_sec[0])  # seconds left in the current regime
+
+    def sigma(self) -> float:
+        """Current annualised index vol (regime-dependent)."""
+        return float(self.vol * self.mult[self.regime])
+
+    def path(self, n: int, dt_sec: float) -> np.ndarray:
+        """Next n prices spaced dt_sec apart."""
+        regimes = np.empty(n, dtype=np.int64)
+        i = 0
+        while i < n:
+            k = min(n - i, max(1, int(self._left / dt_sec)))
+            regimes[i:i + k] = self.regime
+            i += k
+            self._left -= k * dt_sec
+            if self._left <= 0:
+                self.regime ^= 1
+                self._left = self.rng.exponential(self.mean_sec[self.regime])
+        sig = self.vol * self.mult[regimes] * np.sqrt(dt_sec / YEAR_SEC)
+        ret = -0.5 * sig * sig + sig * self.rng.standard_normal(n)
+        jumps = self.rng.poisson(self.jump_rate * dt_sec, n)
+        if jumps.any():
+            ret += jumps * self.rng.normal(0.0, self.jump_std, n)
+        p = self.spot * np.exp(np.cumsum(ret))
+        self.spot = float(p[-1])
+        return p
+
+
+class SyntheticBroker:
+    """
+    Fyers-shaped stand-in (get_profile / quotes / history) over a MarketModel, driven by a
+    VirtualClock: the tape advances to clock time in steps of 1 / ticks_per_sec whenever it
+    is read. Options are Black-Scholes priced off the live index with regime IV, so premiums
+    move with the index. Pair with a DataClient (and a throwaway BarStore) for a replay client.
+    """
+    def __init__(self, clock: VirtualClock, model: Optional[MarketModel] = None, ticks_per_sec: float = 1.0,
+                 prior_sessions: int = 3, days_to_expiry: float = SYN_DAYS_TO_EXPIRY):
+        self.clock = clock
+        self.model = model or MarketModel()
+        self.dt = 1.0 / ticks_per_sec
+        self.expiry = clock.now() + dt.timedelta(days=days_to_expiry)
+        self.candles: Dict[str, List[list]] = {}   # day -> closed 1m rows [epoch, o, h, l, c, v]
+        self.daily: List[list] = []
+        self._bar: Optional[list] = None
+        self.spot = self.model.spot
+        self.calls = 0
+        self._lock = threading.Lock()  # session_header/warm-up read the tape from worker threads
+
+        today = clock.now().date()
+        start = self._session_open(today)
+        days, d = [], today
+        while len(days) < prior_sessions:
+            d -= dt.timedelta(days=1)
+            if d.weekday() < 5:
+                days.append(d)
+        for d in reversed(days):  # earlier sessions at 1s resolution
+            t0 = self._session_open(d).timestamp()
+            self._tape(t0 + np.arange(1, SESSION_SEC + 1, dtype=np.float64), self.model.path(SESSION_SEC, 1.0))
+            self._close_bar()
+        self._t = start.timestamp()
+        self._sync()
+
+    def _session_open(self, day: dt.date) -> dt.datetime:
+        return IST.localize(dt.datetime.combine(day, ORB_START_IST))
+
+    # ---- tape ----
+    def _sync(self):
+        with self._lock:
+            now = self.clock.now().timestamp()
+            n = int((now - self._t) / self.dt + 1e-9)
+            if n <= 0:
+                return
+            t = self._t + self.dt * np.arange(1, n + 1)
+            self._tape(t, self.model.path(n, self.dt))
+            self._t = float(t[-1])
+
+    def _tape(self, t: np.ndarray, p: np.ndarray):
+        m = (t // 60).astype(np.int64)
+        starts = np.r_[0, np.flatnonzero(np.diff(m)) + 1]
+        ends = np.r_[starts[1:], len(p)] - 1
+        hi = np.maximum.reduceat(p, starts)
+        lo = np.minimum.reduceat(p, starts)
+        for s, e, h, l in zip(starts, ends, hi, lo):
+            ep = int(m[s]) * 60
+            b = self._bar
+            if b is not None and b[0] == ep:
+                b[2], b[3], b[4], b[5] = max(b[2], h), min(b[3], l), float(p[e]), b[5] + (e - s + 1)
+            else:
+                self._close_bar()
+                self._bar = [ep, float(p[s]), float(h), float(l), float(p[e]), float(e - s + 1)]
+        self.spot = float(p[-1])
+
+    def _close_bar(self):
+        b = self._bar
+        if b is None:
+            return
+        day = dt.datetime.fromtimestamp(b[0], IST).strftime("%Y-%m-%d")
+        rows = self.candles.setdefault(day, [])
+        rows.append(b)
+        if self.daily and self.daily[-1][0] == day:
+            d = self.daily[-1]
+            d[2], d[3], d[4] = max(d[2], b[2]), min(d[3], b[3]), b[4]
+        else:
+            self.daily.append([day, b[1], b[2], b[3], b[4], 0.0])
+        self._bar = None
+
+    def _closed(self, day: str) -> List[list]:
+        rows = list(self.candles.get(day, ()))
+        b = self._bar
+        if b is not None and b[0] + 60 <= self.clock.now().timestamp() \
+                and dt.datetime.fromtimestamp(b[0], IST).strftime("%Y-%m-%d") == day:
+            rows.append(list(b))
+        return rows
+
+    # ---- pricing ----
+    def price(self, symbol: str) -> Optional[float]:
+        if symbol.endswith("-INDEX"):
+            return self.spot
+        m = _OPT.search(symbol)
+        if m is None:
+            return None
+        T = max((self.expiry - self.clock.now()).total_seconds(), 60.0) / (365.0 * 86400.0)
+        iv = self.model.sigma() + SYN_IV_PREMIUM
+        px = float(bs_price(self.spot, float(m.group(1)), T, RISK_FREE_RATE, iv, m.group(2) == "CE"))
+        return round(max(px, 0.05), 2)
+
+    # ---- fyers API surface ----
+    def get_profile(self) -> dict:
+        return {"s": "ok", "data": {"name": "synthetic"}}
+
+    def quotes(self, payload: dict) -> dict:
+        self.calls += 1
+        self._sync()
+        d = []
+        for sym in str(payload.get("symbols", "")).split(","):
+            px = self.price(sym)
+            v = {"symbol": sym, "lp": px} if px is not None else {"s": "error", "errmsg": "invalid symbol"}
+            if px is not None and not sym.endswith("-INDEX"):  # quoted book around the model price
+                half = SYN_SPREAD_TICKS * TICK_SIZE / 2.0
+                v["bid"], v["ask"] = round(max(px - half, TICK_SIZE), 2), round(px + half, 2)
+            d.append({"n": sym, "s": "ok" if px is not None else "error", "v": v})
+        return {"s": "ok", "d": d}
+
+    def history(self, payload: dict) -> dict:
+        self.calls += 1
+        self._sync()
+        lo, hi = payload["range_from"], payload["range_to"]
+        if payload.get("resolution") == "D":
+            rows = [[int(IST.localize(dt.datetime.strptime(d[0], "%Y-%m-%d")).timestamp())] + d[1:]
+                    for d in self.daily if lo <= d[0] <= hi and d[0] < self.clock.now().strftime("%Y-%m-%d")]
+        else:
+            rows = []
+            for day in sorted(set(self.candles) | {self.clock.now().strftime("%Y-%m-%d")}):
+                if lo <= day <= hi:
+                    rows.extend(self._closed(day))
+        return {"s": "ok", "candles": rows} if rows else {"s": "no_data", "candles": []}
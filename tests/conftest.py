@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:  # flat top-level modules, same as running main.py from the repo root
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,95 @@
+# tests/test_checkpoint.py
+import datetime as dt, json, os
+
+import pytest
+
+import engine, exit_optimizer, logging_utils
+from bar_store import BarStore
+from checkpoint import Checkpointer
+from config import IST, ORB_END_IST
+from data import DataClient
+from events import BUS
+from instruments import default_instrument
+from logging_utils import set_clock, logger_row as log
+from synthetic import VirtualClock, MarketModel, SyntheticBroker
+
+
+def test_save_is_throttled_and_on_change(tmp_path):
+    ck = Checkpointer(str(tmp_path / "s.json"), min_interval_sec=3600)
+    assert ck.save({"a": 1})
+    assert not ck.due() and not ck.save({"a": 2})
+    assert ck.save({"a": 2}, force=True)
+    assert not ck.save({"a": 2}, force=True)   # unchanged
+    assert Checkpointer(ck.path).load() == {"a": 2}
+
+
+def test_trade_journal_keeps_what_the_snapshot_counted(tmp_path):
+    ck = Checkpointer(str(tmp_path / "s.json"))
+    ck.append_trades([{"pnl": 1.0}, {"pnl": 2.0}])
+    ck.append_trades([{"pnl": 3.0}])          # crash before the snapshot counted this one
+    with open(ck.journal, "a", encoding="utf-8") as f:
+        f.write('{"pnl": 4')                  # torn write
+    assert ck.load_trades(2) == [{"pnl": 1.0}, {"pnl": 2.0}]
+    with open(ck.journal, encoding="utf-8") as f:
+        assert [json.loads(x) for x in f] == [{"pnl": 1.0}, {"pnl": 2.0}]
+    ck.clear_journal()
+    assert ck.load_trades(5) == [] and not os.path.exists(ck.journal)
+
+
+@pytest.fixture
+def make_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(logging_utils, "LOG_FILE", str(tmp_path / "log.csv"))
+    monkeypatch.setattr(exit_optimizer, "LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(engine, "LOG_DIR", str(tmp_path))
+    clock = VirtualClock(IST.localize(dt.datetime.combine(dt.date(2001, 1, 1), ORB_END_IST)))
+    set_clock(clock.now)
+    broker = SyntheticBroker(clock, MarketModel(seed=2))
+    inst = default_instrument()
+    made = []
+
+    def make():
+        eng = engine.Engine(broker, inst, DataClient(broker, log, inst, store=BarStore(str(tmp_path / "bars"))))
+        eng.orb.or_high, eng.orb.or_low = 24050.0, 23950.0
+        eng.orb.entry_hi_buf, eng.orb.entry_lo_buf = 24060.0, 23940.0
+        made.append(eng)
+        return eng
+
+    yield make
+    for eng in made:
+        eng.executor.shutdown()
+    BUS.unsubscribe("exit_paths")
+    BUS.flush()
+    set_clock(None)
+
+
+def test_tick_checkpoint_serializes_only_when_due_and_dirty(make_engine, monkeypatch):
+    eng = make_engine()
+    calls = []
+    state_dict = eng.state_dict
+    monkeypatch.setattr(eng, "state_dict", lambda: calls.append(1) or state_dict())
+    p = eng.open_position("NSE:XCE", "CE", 100.0, 75, True, "CORE", 20, 25, 100.0)
+    assert len(calls) == 1                    # entries force a write
+    eng.checkpoint()
+    assert len(calls) == 1                    # throttled: nothing built
+    eng.ckpt.min_interval_sec = 0.0
+    eng.checkpoint()
+    assert len(calls) == 1                    # due but nothing moved
+    p.peak_price = 110.0
+    eng.checkpoint()
+    assert len(calls) == 2
+
+
+def test_resume_reads_trades_from_the_journal(make_engine):
+    eng = make_engine()
+    a = eng.open_position("NSE:XCE", "CE", 100.0, 75, True, "CORE", 20, 25, 100.0)
+    eng.open_position("NSE:XPE", "PE", 80.0, 75, True, "CORE", 20, 25, 80.0)
+    eng.close_position(a, 110.0, "Take-Profit")
+    with open(eng.ckpt.path, encoding="utf-8") as f:
+        assert "trades" not in json.load(f)
+
+    again = make_engine()
+    assert again.resume_from_checkpoint()
+    assert [p.symbol for p in again.positions] == ["NSE:XPE"]
+    [t] = again.trades
+    assert t["reason"] == "Take-Profit" and t["pnl"] == pytest.approx(eng.trades[0]["pnl"])
+    assert t["exit_time"] == eng.trades[0]["exit_time"]
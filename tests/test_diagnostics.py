@@ -0,0 +1,45 @@
+# tests/test_diagnostics.py
+from dataclasses import replace
+
+from diagnostics import (TickState, block_mask, mask_text, NO_BREAK, RSI_BLOCK, DUPLICATE_CORE, NOT_ARMED,
+                         DAILY_LOSS_HIT, COOLDOWN, MAX_CONCURRENT, PROJECTED_RISK)
+
+BASE = TickState(idx=24100.0, rsi=60.0, or_high=24050.0, or_low=23950.0, hi_buf=24060.0, lo_buf=23940.0,
+                 rsi_ok={"CE": True, "PE": True}, armed={"CE": True, "PE": True},
+                 core_open={"CE": False, "PE": False}, daily_loss_hit=False, cooldown_sec=0, n_open=0)
+
+
+def test_clear_breakout_has_no_block():
+    assert block_mask(BASE, "CE") == 0
+    assert mask_text(0, "CE") == "ok"
+    assert block_mask(BASE, "PE") == NO_BREAK
+    assert mask_text(NO_BREAK, "PE") == "no_breakdown_below_buffer"
+
+
+def test_each_block_sets_its_bit():
+    cases = [
+        (dict(rsi_ok={"CE": False}), RSI_BLOCK),
+        (dict(core_open={"CE": True}), DUPLICATE_CORE),
+        (dict(armed={"CE": False}), NOT_ARMED),
+        (dict(daily_loss_hit=True), DAILY_LOSS_HIT),
+        (dict(cooldown_sec=30), COOLDOWN),
+        (dict(n_open=2), MAX_CONCURRENT),
+        (dict(projected_ok={"CE": False}), PROJECTED_RISK),
+    ]
+    for change, bit in cases:
+        assert block_mask(replace(BASE, **change), "CE") == bit, change
+
+
+def test_bits_combine_and_follow_flags():
+    s = replace(BASE, idx=24000.0, core_open={"CE": True}, armed={"CE": False}, n_open=3,
+                projected_ok={"CE": False}, rsi_ok={"CE": False})
+    # no breakout: RSI and projected risk are not judged
+    assert block_mask(s, "CE") == NO_BREAK | DUPLICATE_CORE | NOT_ARMED | MAX_CONCURRENT
+    assert block_mask(s, "CE", prevent_duplicate=False, rearm_on_pullback=False, max_concurrent=5) == NO_BREAK
+    assert mask_text(NO_BREAK | MAX_CONCURRENT, "CE") == "no_breakout_above_buffer, max_concurrent"
+
+
+def test_missing_buffers_and_unknown_projection():
+    s = replace(BASE, hi_buf=None, lo_buf=None)
+    assert block_mask(s, "CE") == NO_BREAK and block_mask(s, "PE") == NO_BREAK
+    assert block_mask(replace(BASE, projected_ok={"CE": None}), "CE") == 0
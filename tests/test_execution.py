@@ -0,0 +1,230 @@
+# tests/test_execution.py
+# Order path end to end: Engine -> OrderManager -> FakeExchange on a VirtualClock. The manager's
+# poller is parked (poll_sec=3600) and every step polls by hand, so fills land exactly when the
+# test moves the clock; option marks come from a dict the test sets instead of the synthetic feed.
+import datetime as dt
+from types import SimpleNamespace
+
+import pytest
+
+import engine, exit_optimizer, logging_utils
+from bar_store import BarStore
+from checkpoint import Checkpointer
+from config import IST, ORB_END_IST, FEE_BROKERAGE_PER_ORDER, FEE_GST_PCT
+from data import DataClient
+from events import BUS
+from execution import FakeExchange, OrderManager, SELL
+from fills import fees
+from instruments import default_instrument
+from logging_utils import set_clock, logger_row as log
+from synthetic import VirtualClock, MarketModel, SyntheticBroker
+
+LATENCY = 1.0
+TIMEOUT = 5.0
+
+
+@pytest.fixture
+def desk(tmp_path, monkeypatch):
+    monkeypatch.setattr(logging_utils, "LOG_FILE", str(tmp_path / "log.csv"))
+    monkeypatch.setattr(exit_optimizer, "LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(engine, "CHECKPOINT_ENABLED", False)
+    clock = VirtualClock(IST.localize(dt.datetime.combine(dt.date(2001, 1, 1), ORB_END_IST)))
+    set_clock(clock.now)
+    broker = SyntheticBroker(clock, MarketModel(seed=1))
+    ex = FakeExchange(broker, latency_sec=LATENCY, slippage_ticks=1, partial_prob=0.0, seed=1)
+    marks = {}
+    ex._ltp = marks.get
+    om = OrderManager(ex, log, poll_sec=3600, timeout_sec=TIMEOUT)
+    inst = default_instrument()
+    eng = engine.Engine(broker, inst, DataClient(broker, log, inst, store=BarStore(str(tmp_path / "bars"))),
+                        orders=om)
+    yield SimpleNamespace(clock=clock, ex=ex, om=om, eng=eng, marks=marks)
+    om.stop()
+    eng.executor.shutdown()
+    BUS.unsubscribe("exit_paths")
+    BUS.flush()
+    set_clock(None)
+
+
+def step(d, seconds: float):
+    """Send what is queued, move the clock, read the order book once and book the results."""
+    assert d.om.flush()
+    d.clock.advance(seconds)
+    d.om.poll()
+    assert d.om.flush()   # cancels the poll just queued (timeouts) reach the exchange
+    d.eng.reconcile_orders()
+
+
+def enter_at(d, price: float):
+    d.eng.enter("CE", True, "CORE", 20, 25)
+    o = next(iter(d.eng._pending_entries.values()))
+    d.marks[o.symbol] = price
+    return o
+
+
+def test_entry_fill_opens_position_at_fill_price(desk):
+    o = enter_at(desk, 100.0)
+    step(desk, LATENCY / 2)
+    assert desk.eng.positions == [] and o.tag in desk.eng._pending_entries   # still in flight
+
+    step(desk, LATENCY)
+    assert desk.eng._pending_entries == {}
+    [p] = desk.eng.positions
+    assert p.entry_price == pytest.approx(100.05)   # market buy, one tick of slippage
+    assert p.qty == desk.eng.inst.lot_size
+    assert p.entry_time == o.submitted_at
+    assert p.sl_price == pytest.approx(100.05 * 0.8) and p.tp_price == pytest.approx(100.05 * 1.25)
+    assert o.status == "FILLED"
+
+
+def test_protect_rests_only_the_stop(desk, monkeypatch):
+    monkeypatch.setattr(engine, "EXEC_BROKER_STOPS", True)
+    enter_at(desk, 100.0)
+    step(desk, 1.5)
+    [p] = desk.eng.positions
+    legs = desk.eng._protect[id(p)]
+    assert set(legs) == {"sl"}
+    assert legs["sl"].stop_price == pytest.approx(80.05)
+
+
+def test_partial_exit_keeps_the_remainder_open(desk):
+    enter_at(desk, 100.0)
+    step(desk, 1.5)
+    [p] = desk.eng.positions
+    lot = p.qty
+
+    desk.ex.partial_prob = 1.0   # the exit fills in two halves
+    desk.marks[p.symbol] = 110.0
+    desk.eng.exit_position(p, "Take-Profit")
+    o = desk.eng._exiting[id(p)]
+    step(desk, 1.5)
+    assert o.status == "PARTIAL" and o.filled_qty == lot // 2
+    assert p in desk.eng.positions and p.qty == lot   # nothing booked while the order works
+
+    del desk.marks[p.symbol]     # no price: the second half never comes, the timeout cancels it
+    step(desk, TIMEOUT)
+    assert o.meta["cancel_sent"]
+    step(desk, 0.1)
+    assert o.status == "CANCELLED" and o.filled_qty == lot // 2
+    assert p in desk.eng.positions and p.qty == lot - lot // 2
+    assert not desk.eng.exit_pending(p)
+    t = desk.eng.trades[-1]
+    assert t["reason"] == "Take-Profit"
+    cost = 2 * engine.COST_PER_SIDE_INR
+    assert t["pnl"] == pytest.approx((109.95 - 100.05) * (lot // 2) - cost * (lot // 2) / lot)
+
+    desk.ex.partial_prob = 0.0
+    desk.marks[p.symbol] = 110.0
+    desk.eng.exit_position(p, "Take-Profit")
+    step(desk, 1.5)
+    assert desk.eng.positions == []
+    # two exits of one position pay one round trip of costs between them
+    assert sum(t["pnl"] for t in desk.eng.trades) == pytest.approx((109.95 - 100.05) * lot - cost)
+
+
+def test_split_exit_pays_entry_brokerage_once(desk, monkeypatch):
+    monkeypatch.setattr(engine, "FILL_MODEL_ENABLED", True)
+    enter_at(desk, 100.0)
+    step(desk, 1.5)
+    [p] = desk.eng.positions
+    lot = p.qty
+    desk.marks[p.symbol] = 110.0
+    desk.ex.partial_prob = 1.0
+    desk.eng.exit_position(p, "Take-Profit")
+    o = desk.eng._exiting[id(p)]
+    step(desk, 1.5)
+    del desk.marks[p.symbol]
+    step(desk, TIMEOUT)
+    step(desk, 0.1)
+    assert o.status == "CANCELLED" and p.qty == lot - lot // 2
+
+    desk.ex.partial_prob = 0.0
+    desk.marks[p.symbol] = 110.0
+    desk.eng.exit_position(p, "Take-Profit")
+    step(desk, 1.5)
+    assert desk.eng.positions == []
+    # one buy order, two sell orders: the whole-position fees plus one more sell's brokerage
+    extra = FEE_BROKERAGE_PER_ORDER * (1 + FEE_GST_PCT / 100.0)
+    assert sum(t["pnl"] for t in desk.eng.trades) == pytest.approx(
+        (109.95 - 100.05) * lot - fees(100.05, 109.95, lot) - extra)
+
+
+def test_unfilled_entry_is_cancelled_after_timeout(desk):
+    desk.eng.enter("CE", True, "CORE", 20, 25)   # no marks: the fake exchange cannot fill it
+    desk.eng.orb.long_armed = False
+    o = next(iter(desk.eng._pending_entries.values()))
+    step(desk, TIMEOUT / 2)
+    assert not o.meta.get("cancel_sent")
+
+    step(desk, TIMEOUT)
+    assert o.meta["cancel_sent"]
+    step(desk, 0.1)
+    assert o.status == "CANCELLED" and o.filled_qty == 0
+    assert desk.ex._book[o.broker_id]["status"] == 1
+    assert desk.eng.positions == [] and desk.eng._pending_entries == {}
+    assert desk.eng.orb.long_armed   # core side gets its signal back
+
+
+def test_stop_leg_fill_closes_position(desk, monkeypatch):
+    monkeypatch.setattr(engine, "EXEC_BROKER_STOPS", True)
+    enter_at(desk, 100.0)
+    step(desk, 1.5)
+    [p] = desk.eng.positions
+    sl = desk.eng._protect[id(p)]["sl"]
+
+    desk.marks[p.symbol] = 70.0   # through the stop
+    step(desk, 1.5)
+    assert sl.status == "FILLED" and sl.filled_qty == p.qty
+    assert desk.eng.positions == [] and id(p) not in desk.eng._protect
+    assert desk.eng.trades[-1]["reason"] == "Stop-Loss (exchange)"
+    assert sum(o["filledQty"] for o in desk.ex._book.values() if o["side"] == SELL) == p.qty
+
+
+def test_client_exit_cancels_the_stop_before_selling(desk, monkeypatch):
+    monkeypatch.setattr(engine, "EXEC_BROKER_STOPS", True)
+    enter_at(desk, 100.0)
+    step(desk, 1.5)
+    [p] = desk.eng.positions
+    sl = desk.eng._protect[id(p)]["sl"]
+
+    desk.marks[p.symbol] = 126.0
+    desk.eng.exit_position(p, "Take-Profit")
+    assert desk.eng.exit_pending(p) and not desk.eng._exiting   # no sell until the stop is gone
+    step(desk, 0.1)
+    assert sl.status == "CANCELLED" and sl.filled_qty == 0
+    o = desk.eng._exiting[id(p)]
+    step(desk, 1.5)
+    assert o.status == "FILLED" and desk.eng.positions == []
+    assert desk.eng.trades[-1]["reason"] == "Take-Profit"
+    assert sum(o["filledQty"] for o in desk.ex._book.values() if o["side"] == SELL) == p.qty
+
+
+def test_resume_replaces_the_previous_runs_stop(desk, monkeypatch, tmp_path):
+    monkeypatch.setattr(engine, "EXEC_BROKER_STOPS", True)
+    old = desk.eng
+    old.ckpt = Checkpointer(str(tmp_path / "state.json"))
+    old.orb.or_high, old.orb.or_low = 24050.0, 23950.0
+    old.orb.entry_hi_buf, old.orb.entry_lo_buf = 24060.0, 23940.0
+    enter_at(desk, 100.0)
+    step(desk, 1.5)
+    [p] = old.positions
+    stale = old._protect[id(p)]["sl"]
+    assert desk.om.flush() and desk.ex._book[stale.broker_id]["status"] == 6
+
+    # restart: same broker, new order manager and engine
+    desk.om.stop()
+    om = OrderManager(desk.ex, log, poll_sec=3600, timeout_sec=TIMEOUT)
+    inst = old.inst
+    eng = engine.Engine(old.fyers, inst, DataClient(old.fyers, log, inst, store=old.dc.store), orders=om)
+    eng.ckpt = Checkpointer(old.ckpt.path)
+    try:
+        assert eng.resume_from_checkpoint()
+        assert eng.dc.symbol_cache_rows() == old.dc.symbol_cache_rows()
+        [q] = eng.positions
+        sl = eng._protect[id(q)]["sl"]
+        assert om.flush()
+        assert desk.ex._book[stale.broker_id]["status"] == 1
+        assert desk.ex._book[sl.broker_id]["status"] == 6 and sl.stop_price == pytest.approx(80.05)
+    finally:
+        om.stop()
+        eng.executor.shutdown()
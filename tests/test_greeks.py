@@ -0,0 +1,30 @@
+# tests/test_greeks.py
+import numpy as np
+
+from greeks import bs_price, implied_vol
+
+S, T, R = 24000.0, 5 / 365.0, 0.065
+
+
+def test_implied_vol_round_trips_bs_price():
+    K = np.array([23000.0, 23500.0, 24000.0, 24500.0, 25000.0])
+    sig = np.array([0.22, 0.18, 0.14, 0.13, 0.15])
+    for is_call in (True, False):
+        px = bs_price(S, K, T, R, sig, is_call)
+        iv = implied_vol(px, S, K, T, R, is_call)
+        np.testing.assert_allclose(iv, sig, atol=1e-3)
+
+
+def test_implied_vol_mixed_calls_and_puts():
+    K = np.array([23800.0, 24200.0])
+    is_call = np.array([False, True])
+    px = bs_price(S, K, T, R, 0.16, is_call)
+    np.testing.assert_allclose(implied_vol(px, S, K, T, R, is_call), [0.16, 0.16], atol=1e-3)
+
+
+def test_implied_vol_nan_outside_no_arbitrage_range():
+    K = np.array([23000.0, 24000.0, 24000.0, 24000.0])
+    disc = 23000.0 * np.exp(-R * T)
+    px = np.array([S - disc - 1.0, S + 1.0, np.nan, 0.0])  # below intrinsic, above spot, missing, zero
+    iv = implied_vol(px, S, K, T, R, True)
+    assert np.isnan(iv).all()
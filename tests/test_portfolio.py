@@ -0,0 +1,47 @@
+# tests/test_portfolio.py
+import datetime as dt
+
+import pytest
+
+from models import Position
+from portfolio import Portfolio
+
+
+def pos(side="CE", entry=100.0, qty=75, sl=80.0):
+    return Position(symbol=f"NSE:X{side}", side=side, entry_time=dt.datetime(2001, 1, 1, 9, 30),
+                    entry_price=entry, qty=qty, sl_price=sl, tp_price=entry * 1.25, peak_price=entry)
+
+
+def test_open_mark_close_running_totals():
+    pf = Portfolio(cost_per_side=10.0)
+    a, b = pos("CE"), pos("PE", entry=50.0, sl=40.0)
+    pf.open(a, 110.0)
+    pf.open(b)
+    assert pf.unrealized == pytest.approx(10 * 75 - 20 + 0 - 20)
+    assert pf.at_sl == pytest.approx(-20 * 75 - 20 - 10 * 75 - 20)
+    assert pf.exposure == {"CE": pytest.approx(110 * 75), "PE": pytest.approx(50 * 75)}
+    assert pf.count == {"CE": 1, "PE": 1}
+
+    a.sl_price = 100.0  # breakeven move is picked up by the next mark
+    pf.mark(a, 120.0)
+    assert pf.ltp(a) == 120.0
+    assert pf.unrealized == pytest.approx(20 * 75 - 20 - 20)
+    assert pf.at_sl == pytest.approx(-20 - 10 * 75 - 20)
+
+    pf.close(a)
+    assert pf.ltp(a) is None
+    assert pf.count == {"CE": 0, "PE": 1}
+    assert pf.unrealized == pytest.approx(-20)
+    pf.close(b)
+    assert (pf.unrealized, pf.at_sl, pf.exposure) == (0.0, 0.0, {"CE": 0.0, "PE": 0.0})
+
+
+def test_mark_unknown_position_opens_it_and_partial_qty_rescales():
+    pf = Portfolio()
+    a = pos()
+    pf.mark(a, 105.0)
+    assert pf.unrealized == pytest.approx(5 * 75)
+    a.qty = 25  # partial exit booked by the engine, then re-marked
+    pf.mark(a, 105.0)
+    assert pf.unrealized == pytest.approx(5 * 25)
+    assert pf.exposure["CE"] == pytest.approx(105 * 25)
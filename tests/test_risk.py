@@ -0,0 +1,43 @@
+# tests/test_risk.py
+import numpy as np
+
+from risk import entry_gate, projected_ok, scalp_gate
+
+LIMITS = dict(max_daily_loss=1000.0, max_concurrent=2, cost_per_side=10.0)
+
+
+def test_entry_gate_daily_loss_counts_open_mtm():
+    assert entry_gate(-900.0, 0, 0.0, 20, 75, projected_block=False, **LIMITS)
+    assert not entry_gate(-900.0, 0, 0.0, 20, 75, mtm=-100.0, projected_block=False, **LIMITS)
+    assert not entry_gate(-1000.0, 0, 0.0, 20, 75, projected_block=False, **LIMITS)
+
+
+def test_entry_gate_max_concurrent():
+    assert entry_gate(0.0, 1, 0.0, 20, 75, projected_block=False, **LIMITS)
+    assert not entry_gate(0.0, 2, 0.0, 20, 75, projected_block=False, **LIMITS)
+
+
+def test_entry_gate_projected_risk():
+    # 50 * 20% * 75 + 2 * 10 = 770 at risk
+    assert entry_gate(-200.0, 0, 50.0, 20, 75, projected_block=True, **LIMITS)
+    assert not entry_gate(-250.0, 0, 50.0, 20, 75, projected_block=True, **LIMITS)
+    assert not entry_gate(0.0, 1, 50.0, 20, 75, at_sl=-250.0, projected_block=True, **LIMITS)
+    assert entry_gate(-250.0, 0, 50.0, 20, 75, projected_block=False, **LIMITS)
+    assert entry_gate(-250.0, 0, 0.0, 20, 75, projected_block=True, **LIMITS)  # no premium estimate yet
+
+
+def test_entry_gate_vectorised_matches_scalar():
+    realized = np.array([0.0, -250.0, -950.0, 0.0])
+    n_open = np.array([0, 0, 0, 2])
+    est = np.array([50.0, 50.0, 10.0, 10.0])
+    got = entry_gate(realized, n_open, est, 20, 75, projected_block=True, **LIMITS)
+    want = [entry_gate(r, n, e, 20, 75, projected_block=True, **LIMITS) for r, n, e in zip(realized, n_open, est)]
+    assert got.tolist() == want == [True, False, False, False]
+
+
+def test_projected_ok_and_scalp_gate():
+    assert projected_ok(0.0, 0.0, 50.0, 20, 75, max_daily_loss=1000.0, cost_per_side=10.0)
+    assert not projected_ok(0.0, -300.0, 50.0, 20, 75, max_daily_loss=1000.0, cost_per_side=10.0)
+    assert scalp_gate(0, 60.0, max_open=1, min_gap_sec=30)
+    assert not scalp_gate(1, 60.0, max_open=1, min_gap_sec=30)
+    assert not scalp_gate(0, 10.0, max_open=1, min_gap_sec=30)
@@ -0,0 +1,77 @@
+# tests/test_scheduler.py
+import math
+
+import pytest
+
+from scheduler import PollScheduler
+
+
+def sched(**kw):
+    args = dict(min_sec=1.0, max_sec=30.0, budget_per_min=1000.0, k=3.0, vol_halflife_sec=60.0, default_vol_bps=10.0)
+    args.update(kw)
+    return PollScheduler(**args)
+
+
+def test_interval_follows_distance_to_nearest_level():
+    s = sched()
+    far = s.plan("A", 100.0, [101.0], now=0.0)
+    near = s.plan("B", 100.0, [100.2, 150.0, None], now=0.0)
+    assert near < far
+    assert far == pytest.approx((math.log(1.01) / (3.0 * 10e-4)) ** 2)
+    assert s.plan("C", 100.0, [], now=0.0) == 30.0
+    assert s.plan("D", 100.0, [100.0], now=0.0) == 1.0
+
+
+def test_deadline_caps_interval_and_due():
+    s = sched()
+    assert s.plan("A", 100.0, [], deadline=12.0, now=10.0) == 2.0
+    assert not s.due("A", now=11.9) and s.due("A", now=12.0)
+    assert s.plan("A", 100.0, [], deadline=10.5, now=10.0) == 1.0  # never below min_sec
+    assert s.next_wait(now=10.25) == pytest.approx(0.75)
+
+
+def test_volatility_shortens_interval():
+    s = sched()
+    calm = s.plan("A", 100.0, [101.0], now=0.0)
+    s.observe("A", 100.0, now=0.0)
+    s.observe("A", 100.5, now=1.0)
+    s.observe("A", 100.0, now=2.0)
+    assert s.plan("A", 100.0, [101.0], now=2.0) < calm
+
+
+def test_budget_stretches_every_interval():
+    s = sched(budget_per_min=60.0)
+    for i in range(4):
+        s.plan(f"S{i}", 100.0, [100.0], now=0.0)   # 4 symbols at 1 s = 240 polls/min
+    assert s.scale == pytest.approx(4.0)
+    assert s.plan("S0", 100.0, [100.0], now=0.0) == pytest.approx(4.0)
+    for t in range(70):
+        s.observe("S0", 100.0, now=float(t))
+    assert s.used_per_min(now=69.0) == 61
+
+
+def test_forget_drops_symbol_from_budget_and_wait():
+    s = sched(budget_per_min=60.0)
+    s.plan("A", 100.0, [100.0], now=0.0)
+    s.plan("B", 100.0, [100.0], now=0.0)
+    s.forget("B")
+    assert s.plan("A", 100.0, [100.0], now=0.0) == pytest.approx(1.0)
+    assert s.next_wait(now=0.0) == pytest.approx(1.0)
+
+
+def test_index_polled_by_minute_close_with_busy_positions():
+    # Engine plans the index only after a tick that fetched it, with the next minute close as
+    # deadline; fast-moving positions must not keep pushing the index poll out.
+    s = sched(min_sec=1.0, max_sec=60.0)
+    now, idx_polls = 0.0, []
+    s.plan("IDX", 24000.0, [], deadline=60.0, now=now)
+    while now < 180.0:
+        now = now + s.next_wait(now=now)
+        if s.due("IDX", now=now):
+            idx_polls.append(now)
+            s.plan("IDX", 24000.0, [], deadline=now - now % 60 + 60, now=now)
+        for sym in ("P1", "P2"):
+            if s.due(sym, now=now):
+                s.plan(sym, 100.0, [100.0], now=now)
+    assert len(idx_polls) >= 3
+    assert all(b - a <= 60.0 for a, b in zip(idx_polls, idx_polls[1:]))
@@ -0,0 +1,77 @@
+# tests/test_warm_up.py
+import collections, datetime as dt, glob, os, threading, time
+
+import engine, exit_optimizer, logging_utils
+from bar_store import BarStore
+from config import IST
+from data import DataClient
+from events import BUS
+from instruments import default_instrument
+from logging_utils import set_clock, logger_row as log
+from synthetic import VirtualClock, MarketModel, SyntheticBroker
+
+
+class SlowHistory:
+    """SyntheticBroker whose history endpoint takes a while, like the real one; counts 1m requests per day."""
+    def __init__(self, feed, delay: float = 0.05):
+        self.feed = feed
+        self.delay = delay
+        self.requests = collections.Counter()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.feed, name)
+
+    def history(self, payload: dict) -> dict:
+        if payload.get("resolution") == "1":
+            with self._lock:
+                self.requests[(payload["symbol"], payload["range_from"])] += 1
+        time.sleep(self.delay)
+        return self.feed.history(payload)
+
+
+def test_warm_up_fetches_each_past_day_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(logging_utils, "LOG_FILE", str(tmp_path / "log.csv"))
+    monkeypatch.setattr(exit_optimizer, "LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(engine, "CHECKPOINT_ENABLED", False)
+    clock = VirtualClock(IST.localize(dt.datetime(2001, 1, 1, 9, 0)))
+    set_clock(clock.now)
+    try:
+        broker = SlowHistory(SyntheticBroker(clock, MarketModel(seed=3)))
+        inst = default_instrument()
+        store = BarStore(str(tmp_path / "bars"))
+        eng = engine.Engine(broker, inst, DataClient(broker, log, inst, store=store))
+        eng.warm_up()
+        eng.executor.shutdown()
+    finally:
+        BUS.unsubscribe("exit_paths")
+        BUS.flush()
+        set_clock(None)
+
+    assert broker.requests and max(broker.requests.values()) == 1
+    assert store.get(inst.index_symbol, "2000-12-29")           # previous session (Friday) is cached
+    assert store.get(inst.index_symbol, "2000-12-31") == []     # and the weekend as no-session days
+    assert not glob.glob(str(tmp_path / "bars" / "*" / "*.tmp"))
+
+
+def test_bar_store_concurrent_puts_of_one_day(tmp_path):
+    store = BarStore(str(tmp_path))
+    rows = [[60 * i, 1.0, 2.0, 0.5, 1.5, 10.0] for i in range(375)]
+    errors, start = [], threading.Barrier(8)
+
+    def put():
+        start.wait()
+        try:
+            for _ in range(20):
+                store.put("NSE:X-INDEX", "2001-01-01", rows)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert os.listdir(os.path.join(str(tmp_path), "NSE_X-INDEX")) == ["2001-01-01.json"]
+    assert BarStore(str(tmp_path)).get("NSE:X-INDEX", "2001-01-01") == rows
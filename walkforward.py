@@ -0,0 +1,416 @@
+# walkforward.py
+import os, sys, time, inspect, hashlib, itertools, datetime as dt
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from config import (ORB_START_IST, ORB_END_IST, ENTRY_BUFFER_PCT, USE_RSI, RSI_PERIOD, RSI_TIMEFRAME_MIN,
+                    RSI_LONG_MIN, RSI_SHORT_MAX, INIT_SL_PCT, INIT_TP_PCT,
+                    SCALP_SL_PCT, SCALP_TP_PCT, SCALP_BB_PERIOD, SCALP_BB_STD, SCALP_RSI_MIN, SCALP_RSI_MAX,
+                    STRATEGIES, LOT_SIZE, INDEX_SYMBOL, BAR_STORE_DIR,
+                    WF_IS_DAYS, WF_OOS_DAYS, WF_OBJECTIVE, WF_CACHE_DIR, WF_CACHE_MAX_ITEMS)
+from bar_store import BarStore
+from orb_backtest import (Sessions, SESSION_MINUTES, IST_OFFSET_SEC, SESSION_OPEN_MIN, minute_col, first_true,
+                          ladder_arrays, pnl_stats, live_ladder, sessions_from_rows, rsi_by_minute, orb_entries,
+                          exit_pnl)
+from strategy.supertrend_trend import supertrend
+
+STRATEGY_NAMES = ("orb", "bb_scalp", "supertrend_trend", "vwap_reversion")
+
+
+# ============ Indicator cache ============
+
+class IndicatorCache:
+    """
+    Content-addressed store of per-day indicator series. The address hashes
+    (symbol, day, indicator, params) together with a digest of the bars the series was
+    computed from, so a rewritten day can never serve a stale series. Recent series stay in
+    memory (LRU, `max_items`); evicted ones are spilled to <root>/<indicator>/<address>.npy and
+    read back on the next miss. flush() writes the rest (walk_forward calls it when done),
+    which carries the cache across studies and runs. root=None keeps everything in memory.
+    """
+    def __init__(self, root: Optional[str] = WF_CACHE_DIR, max_items: int = WF_CACHE_MAX_ITEMS):
+        self.root = root
+        self.max_items = max(1, max_items)
+        self._mem: "OrderedDict[str, Tuple[str, np.ndarray, bool]]" = OrderedDict()   # addr -> (name, arr, on disk)
+        self.hits = self.disk_hits = self.misses = self.spills = 0
+
+    @staticmethod
+    def address(symbol: str, day: str, name: str, params: tuple, digest: str) -> str:
+        return hashlib.sha1(repr((symbol, day, name, tuple(params), digest)).encode()).hexdigest()
+
+    def _path(self, name: str, addr: str) -> str:
+        return os.path.join(self.root, name, f"{addr}.npy")
+
+    def get(self, symbol: str, day: str, name: str, params: tuple, digest: str,
+            compute: Callable[[], np.ndarray]) -> np.ndarray:
+        addr = self.address(symbol, day, name, params, digest)
+        hit = self._mem.get(addr)
+        if hit is not None:
+            self._mem.move_to_end(addr)
+            self.hits += 1
+            return hit[1]
+        arr, on_disk = None, False
+        if self.root:
+            try:
+                arr = np.load(self._path(name, addr))
+                on_disk = True
+                self.disk_hits += 1
+            except (OSError, ValueError):
+                arr = None
+        if arr is None:
+            arr = np.asarray(compute(), dtype=np.float64)
+            self.misses += 1
+        arr.setflags(write=False)   # shared by every combo that asks for it
+        self._mem[addr] = (name, arr, on_disk)
+        while len(self._mem) > self.max_items:
+            self._evict()
+        return arr
+
+    def _evict(self):
+        addr, (name, arr, on_disk) = self._mem.popitem(last=False)
+        if not on_disk:
+            self._spill(name, addr, arr)
+
+    def flush(self) -> int:
+        """Write every in-memory series not yet on disk; returns how many were written."""
+        n = 0
+        for addr, (name, arr, on_disk) in list(self._mem.items()):
+            if not on_disk and self._spill(name, addr, arr):
+                self._mem[addr] = (name, arr, True)
+                n += 1
+        return n
+
+    def _spill(self, name: str, addr: str, arr: np.ndarray) -> bool:
+        if not self.root:
+            return False
+        path = self._path(name, addr)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp, path)
+        self.spills += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "spills": self.spills, "in_memory": len(self._mem)}
+
+
+# ============ Study: days x minutes + cached indicators ============
+
+def _digest(rows: List[list]) -> str:
+    return hashlib.sha1(np.asarray(rows, dtype=np.float64).tobytes()).hexdigest()
+
+
+class Study:
+    """
+    One symbol's sessions (orb_backtest.Sessions + volume) with per-day indicator series
+    served from an IndicatorCache. A day's series may use the previous session as warm start
+    (as the live engine seeds RSI / BB / Supertrend), so its digest covers both days' bars.
+    """
+    def __init__(self, symbol: str, day_rows: Dict[str, List[list]], cache: Optional[IndicatorCache] = None):
+        self.symbol = symbol
+        self.s = sessions_from_rows(day_rows)
+        self.days = self.s.days
+        D, T = len(self.days), SESSION_MINUTES
+        self.v = np.zeros((D, T))
+        raw = []
+        for i, d in enumerate(self.days):
+            r = np.asarray(day_rows[d], dtype=np.float64)
+            if r.shape[1] > 5:
+                m = ((r[:, 0].astype(np.int64) + IST_OFFSET_SEC) // 60) % 1440 - SESSION_OPEN_MIN
+                ok = (m >= 0) & (m < T)
+                self.v[i, m[ok]] = r[ok, 5]
+            raw.append(_digest(day_rows[d]))
+        self.digests = [hashlib.sha1(((raw[i - 1] if i else "") + raw[i]).encode()).hexdigest() for i in range(D)]
+        self.cache = cache if cache is not None else IndicatorCache()
+
+    @classmethod
+    def from_store(cls, store: BarStore, symbol: str, start: Optional[dt.date] = None, end: Optional[dt.date] = None,
+                   cache: Optional[IndicatorCache] = None) -> "Study":
+        """Every session of `symbol` in the local bar store within [start, end]."""
+        rows = {}
+        for d in store.days(symbol):
+            day = dt.date.fromisoformat(d)
+            if (start is None or day >= start) and (end is None or day <= end):
+                rows[d] = store.get(symbol, d)
+        return cls(symbol, rows, cache)
+
+    def series(self, i: int, name: str, params: tuple) -> np.ndarray:
+        return self.cache.get(self.symbol, self.days[i], name, params, self.digests[i],
+                              lambda: INDICATORS[name](self, i, *params))
+
+    def matrix(self, name: str, params: tuple) -> np.ndarray:
+        """(D, ...) stack of one indicator's per-day series."""
+        return np.stack([self.series(i, name, params) for i in range(len(self.days))])
+
+
+# ---- per-day indicator series, values as of each minute's close (NaN = not ready) ----
+
+def _rsi(st: Study, i: int, period: int, tf: int) -> np.ndarray:
+    """(T,) rolling-mean RSI on tf bars, previous session as warm start."""
+    lo = max(i - 1, 0)
+    s = st.s
+    sub = Sessions(s.days[lo:i + 1], s.o[lo:i + 1], s.h[lo:i + 1], s.l[lo:i + 1], s.c[lo:i + 1])
+    return rsi_by_minute(sub, period, tf)[-1]
+
+
+def _bb(st: Study, i: int, period: int, k: float) -> np.ndarray:
+    """(2, T) upper / lower Bollinger band on 1m closes (bb_scalp), previous session as seed."""
+    a = minute_col(ORB_START_IST)
+    c = st.s.c[max(i - 1, 0):i + 1, a:].ravel()
+    cs = pd.Series(c)
+    ma, sd = cs.rolling(period).mean().to_numpy(), cs.rolling(period).std().to_numpy()
+    n = SESSION_MINUTES - a
+    out = np.full((2, SESSION_MINUTES), np.nan)
+    out[0, a:] = (ma + k * sd)[-n:]
+    out[1, a:] = (ma - k * sd)[-n:]
+    return out
+
+
+def _tf_bars(st: Study, i: int, tf: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    a = minute_col(ORB_START_IST)
+    n = SESSION_MINUTES - a
+    starts = np.arange(0, n, tf)
+    ends = np.minimum(starts + tf - 1, n - 1)
+    h, l, c = st.s.h[i, a:], st.s.l[i, a:], st.s.c[i, a:]
+    return np.fmax.reduceat(h, starts), np.fmin.reduceat(l, starts), c[ends]
+
+
+def _supertrend(st: Study, i: int, period: int, multiplier: float, tf: int) -> np.ndarray:
+    """(2, T) Supertrend line and close of the last finished tf bar (supertrend_trend), previous session as seed."""
+    bars = [_tf_bars(st, j, tf) for j in range(max(i - 1, 0), i + 1)]
+    df = pd.DataFrame({k: np.concatenate([b[n] for b in bars]) for n, k in enumerate(("h", "l", "c"))})
+    line = supertrend(df, period=period, multiplier=multiplier)[0].to_numpy()
+    nb = len(bars[-1][0])
+    seed = len(df) - nb
+    a = minute_col(ORB_START_IST)
+    m = np.arange(SESSION_MINUTES - a)
+    j = (m + 1) // tf - 1 + seed          # last finished bar at each minute's close
+    ok = j >= max(14, period + 5) - 1
+    out = np.full((2, SESSION_MINUTES), np.nan)
+    out[0, a:][ok] = line[j[ok]]
+    out[1, a:][ok] = df["c"].to_numpy()[j[ok]]
+    return out
+
+
+def _vwap(st: Study, i: int, k: float, lookback_min: int) -> np.ndarray:
+    """
+    (2, T) upper / lower VWAP band (vwap_reversion): VWAP cumulated from the start of the
+    trailing `lookback_min` window, band = k * std of the last 20 close-VWAP deviations.
+    """
+    a = minute_col(ORB_START_IST)
+    n = SESSION_MINUTES - a
+    h, l, c, v = st.s.h[i, a:], st.s.l[i, a:], st.s.c[i, a:], st.v[i, a:]
+    cpv = np.concatenate(([0.0], np.cumsum((h + l + c) / 3.0 * v)))
+    cv = np.concatenate(([0.0], np.cumsum(v)))
+    m = np.arange(n)
+    w0 = np.maximum(m + 1 - lookback_min, 0)                  # window start seen at minute m
+    j = m[:, None] - 19 + np.arange(20)[None, :]             # last 20 rows of that window
+    inwin = j >= w0[:, None]
+    jj = np.clip(j, 0, n - 1)
+    vv = cv[jj + 1] - cv[w0][:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vw = np.where(inwin & (vv > 0), (cpv[jj + 1] - cpv[w0][:, None]) / vv, np.nan)
+        dev = c[jj] - vw
+        have = ~np.isnan(dev)
+        cnt = have.sum(axis=1)
+        mu = np.where(have, dev, 0.0).sum(axis=1) / cnt
+        var = np.where(have, (dev - mu[:, None]) ** 2, 0.0).sum(axis=1) / (cnt - 1)
+        sd = np.where(cnt >= 10, np.sqrt(var), np.nan)
+    ok = (m + 1 - w0 >= 40) & ~np.isnan(vw[:, -1])
+    out = np.full((2, SESSION_MINUTES), np.nan)
+    out[0, a:] = np.where(ok, vw[:, -1] + k * sd, np.nan)
+    out[1, a:] = np.where(ok, vw[:, -1] - k * sd, np.nan)
+    return out
+
+
+INDICATORS: Dict[str, Callable[..., np.ndarray]] = {
+    "rsi": _rsi, "bb": _bb, "supertrend": _supertrend, "vwap": _vwap,
+}
+
+
+# ============ Entries per strategy: first signal per day ============
+
+def _reject(c: np.ndarray, ub: np.ndarray, lb: np.ndarray, ok: np.ndarray, e: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Band tag-and-reject: minute m closed beyond a band, the next minute back inside -> entry at m + 1."""
+    D, T = c.shape
+    ce = np.zeros((D, T), bool)
+    pe = np.zeros((D, T), bool)
+    ce[:, 1:] = ok[:, :-1] & (c[:, :-1] <= lb[:, :-1]) & (c[:, 1:] > lb[:, :-1])
+    pe[:, 1:] = ok[:, :-1] & (c[:, :-1] >= ub[:, :-1]) & (c[:, 1:] < ub[:, :-1])
+    ce[:, :e] = pe[:, :e] = False
+    t_ce, t_pe = first_true(ce, T), first_true(pe, T)
+    return np.minimum(t_ce, t_pe), np.where(t_ce <= t_pe, 1, -1)
+
+
+def entries(st: Study, strategy: str, p: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """t0 (D,) entry minute (T = none) and side (+1 CE / -1 PE) of `strategy` under params p."""
+    s = st.s
+    D, T = s.c.shape
+    e = minute_col(ORB_END_IST)
+    rsi = (st.matrix("rsi", (p["rsi_period"], p["rsi_tf"])) if USE_RSI and "rsi_period" in p
+           else np.full((D, T), np.nan))
+    if strategy == "orb":
+        t0, side = orb_entries(s, rsi, p["orb_end"], p["entry_buffer_pct"], [p["rsi_long_min"]], [p["rsi_short_max"]])
+        return t0[0, 0], side[0, 0]
+    if strategy == "bb_scalp":
+        ub, lb = st.matrix("bb", (p["bb_period"], p["bb_std"])).transpose(1, 0, 2)
+        r1 = st.matrix("rsi", (14, 1))   # bb_scalp's own 1m RSI
+        return _reject(s.c, ub, lb, (r1 >= SCALP_RSI_MIN) & (r1 <= SCALP_RSI_MAX), e)
+    if strategy == "supertrend_trend":
+        line, lc = st.matrix("supertrend", (p["st_period"], p["st_multiplier"], p["st_tf"])).transpose(1, 0, 2)
+        ce = np.zeros((D, T), bool)
+        pe = np.zeros((D, T), bool)
+        ce[:, 1:] = (lc > line)[:, :-1] & (rsi[:, :-1] > RSI_LONG_MIN)
+        pe[:, 1:] = (lc < line)[:, :-1] & (rsi[:, :-1] < RSI_SHORT_MAX)
+        ce[:, :e] = pe[:, :e] = False
+        t_ce, t_pe = first_true(ce, T), first_true(pe, T)
+        return np.minimum(t_ce, t_pe), np.where(t_ce <= t_pe, 1, -1)
+    if strategy == "vwap_reversion":
+        ub, lb = st.matrix("vwap", (p["vwap_k"], p["vwap_lookback_min"])).transpose(1, 0, 2)
+        neutral = np.isnan(rsi) | ((rsi >= 40) & (rsi <= 60))
+        return _reject(s.c, ub, lb, neutral, e)
+    raise ValueError(f"unknown strategy '{strategy}' (known: {STRATEGY_NAMES})")
+
+
+# ============ Grid ============
+
+def _strategy_params(name: str) -> dict:
+    """Constructor defaults of a registered strategy overlaid with its config.STRATEGIES params."""
+    from strategy.registry import REGISTRY, load_builtins
+    load_builtins()
+    sig = inspect.signature(REGISTRY[name].__init__)
+    p = {k: v.default for k, v in sig.parameters.items() if v.default is not inspect.Parameter.empty}
+    p.update(dict(STRATEGIES).get(name) or {})
+    return p
+
+
+def live_grid(strategy: str) -> Dict[str, list]:
+    """Single point = the live config of `strategy`; widen any axis to walk it forward."""
+    rsi = {"rsi_period": [RSI_PERIOD], "rsi_tf": [RSI_TIMEFRAME_MIN]}
+    core_exit = {"sl_pct": [INIT_SL_PCT], "tp_pct": [INIT_TP_PCT]}
+    scalp_exit = {"sl_pct": [SCALP_SL_PCT], "tp_pct": [SCALP_TP_PCT]}
+    if strategy == "orb":
+        return {"orb_end": [ORB_END_IST], "entry_buffer_pct": [ENTRY_BUFFER_PCT],
+                "rsi_long_min": [RSI_LONG_MIN], "rsi_short_max": [RSI_SHORT_MAX], **rsi, **core_exit}
+    if strategy == "bb_scalp":
+        return {"bb_period": [SCALP_BB_PERIOD], "bb_std": [SCALP_BB_STD], **scalp_exit}
+    if strategy == "supertrend_trend":
+        p = _strategy_params(strategy)
+        return {"st_period": [p["period"]], "st_multiplier": [p["multiplier"]], "st_tf": [p["tf_min"]],
+                **rsi, **scalp_exit}
+    if strategy == "vwap_reversion":
+        p = _strategy_params(strategy)
+        return {"vwap_k": [p["band_k"]], "vwap_lookback_min": [p["lookback_min"]], **rsi, **scalp_exit}
+    raise ValueError(f"unknown strategy '{strategy}' (known: {STRATEGY_NAMES})")
+
+
+# ============ Walk-forward ============
+
+def windows(n_days: int, is_days: int, oos_days: int, step_days: Optional[int] = None) -> List[Tuple[slice, slice]]:
+    """Rolling (in-sample, out-of-sample) day slices; steps by oos_days so OOS windows tile."""
+    step = step_days or oos_days
+    out, a = [], 0
+    while a + is_days + oos_days <= n_days:
+        out.append((slice(a, a + is_days), slice(a + is_days, a + is_days + oos_days)))
+        a += step
+    return out
+
+
+def day_pnl(st: Study, strategy: str, grid: Optional[Dict[str, list]] = None,
+            lot_size: int = LOT_SIZE) -> Tuple[List[dict], np.ndarray, np.ndarray]:
+    """
+    Per-day PnL and traded mask (C, D) of every grid combination (one trade per day at most, orb_backtest exit
+    model with the live trail ladder). A combo's day PnL does not depend on the window, so each
+    (combo, day) is priced once for the whole study and windows only slice the matrix.
+    """
+    g = live_grid(strategy)
+    g.update(grid or {})
+    entry_axes = [k for k in g if k not in ("sl_pct", "tp_pct")]
+    exits = list(itertools.product(g["sl_pct"], g["tp_pct"]))
+    sl = np.array([x[0] for x in exits], dtype=np.float64)
+    tp = np.array([x[1] for x in exits], dtype=np.float64)
+    lv, sv = ladder_arrays([live_ladder()])
+    lv, sv = np.repeat(lv, len(exits), axis=0), np.repeat(sv, len(exits), axis=0)
+
+    T = st.s.c.shape[1]
+    params, blocks, traded = [], [], []
+    memo: Dict[bytes, np.ndarray] = {}
+    for vals in itertools.product(*(g[k] for k in entry_axes)):
+        p = dict(zip(entry_axes, vals))
+        t0, side = entries(st, strategy, p)
+        key = t0.tobytes() + side.tobytes()
+        pnl = memo.get(key)
+        if pnl is None:  # neighbouring params often enter the same days at the same minutes
+            pnl = memo[key] = exit_pnl(st.s, t0, side, sl, tp, lv, sv, lot_size)
+        blocks.append(pnl)
+        traded.append(np.broadcast_to(t0 < T, pnl.shape))
+        params += [{**p, "sl_pct": a, "tp_pct": b} for a, b in exits]
+    return params, np.concatenate(blocks, axis=0), np.concatenate(traded, axis=0)
+
+
+def walk_forward(st: Study, strategy: str, grid: Optional[Dict[str, list]] = None,
+                 is_days: int = WF_IS_DAYS, oos_days: int = WF_OOS_DAYS, step_days: Optional[int] = None,
+                 objective: str = WF_OBJECTIVE, lot_size: int = LOT_SIZE) -> pd.DataFrame:
+    """
+    Pick the combination maximising `objective` (a pnl_stats column) on each in-sample window and
+    score it on the following out-of-sample window. One row per window; attrs carry the
+    stitched OOS PnL and the indicator cache counters.
+    """
+    wins = windows(len(st.days), is_days, oos_days, step_days)
+    if not wins:
+        raise ValueError(f"need at least {is_days + oos_days} sessions, have {len(st.days)}")
+    t_start = time.perf_counter()
+    params, pnl, traded = day_pnl(st, strategy, grid, lot_size)
+    rows, oos, oos_traded = [], [], []
+    for ins, out in wins:
+        st_is = pnl_stats(pnl[:, ins], traded[:, ins])
+        k = int(np.argmax(st_is[objective]))
+        st_oos = pnl_stats(pnl[k:k + 1, out], traded[k:k + 1, out])
+        oos.append(pnl[k, out])
+        oos_traded.append(traded[k, out])
+        rows.append({
+            "is_start": st.days[ins.start], "is_end": st.days[ins.stop - 1],
+            "oos_start": st.days[out.start], "oos_end": st.days[out.stop - 1],
+            **{a: (b.strftime("%H:%M") if isinstance(b, dt.time) else b) for a, b in params[k].items()},
+            f"is_{objective}": st_is[objective][k], "is_trades": st_is["trades"][k],
+            "oos_trades": st_oos["trades"][0], "oos_total_pnl": st_oos["total_pnl"][0],
+            "oos_win_rate": st_oos["win_rate"][0], "oos_max_drawdown": st_oos["max_drawdown"][0],
+        })
+    df = pd.DataFrame(rows)
+    stitched, stitched_traded = np.concatenate(oos), np.concatenate(oos_traded)
+    df.attrs["strategy"] = strategy
+    df.attrs["combos"] = len(params)
+    df.attrs["days"] = len(st.days)
+    df.attrs["oos_total_pnl"] = float(stitched.sum())
+    df.attrs["oos_max_drawdown"] = float(pnl_stats(stitched[None], stitched_traded[None])["max_drawdown"][0])
+    st.cache.flush()
+    df.attrs["cache"] = st.cache.stats()
+    df.attrs["seconds"] = time.perf_counter() - t_start
+    return df
+
+
+if __name__ == "__main__":
+    # python walkforward.py STRATEGY [START END] [SYMBOL]   (sessions already in the local bar store)
+    name = sys.argv[1] if len(sys.argv) > 1 else "orb"
+    start, end = (dt.date.fromisoformat(x) for x in sys.argv[2:4]) if len(sys.argv) > 3 else (None, None)
+    sym = sys.argv[4] if len(sys.argv) > 4 else INDEX_SYMBOL
+    study = Study.from_store(BarStore(BAR_STORE_DIR), sym, start, end)
+    rsi_axes = {"rsi_period": [7, 10, 14], "rsi_tf": [1, 3, 5]}
+    res = walk_forward(study, name, {
+        "orb": {"orb_end": [dt.time(9, 20), dt.time(9, 30), dt.time(9, 45)], "entry_buffer_pct": [0.0, 0.05, 0.1],
+                "rsi_long_min": [50, 55, 60], "rsi_short_max": [40, 45, 50], **rsi_axes,
+                "sl_pct": [10, 15, 20], "tp_pct": [25, 35, 50]},
+        "bb_scalp": {"bb_period": [14, 20, 30], "bb_std": [1.5, 2.0, 2.5], "sl_pct": [6, 8, 10], "tp_pct": [5, 6.5, 10]},
+        "supertrend_trend": {"st_period": [7, 10, 14], "st_multiplier": [2.0, 3.0, 4.0], "st_tf": [3, 5], **rsi_axes},
+        "vwap_reversion": {"vwap_k": [1.5, 2.0, 2.5], "vwap_lookback_min": [60, 120, 240], **rsi_axes},
+    }.get(name))
+    print(res.to_string())
+    c = res.attrs["cache"]
+    print(f"\n{res.attrs['combos']} combos over {res.attrs['days']} sessions, {len(res)} windows: "
+          f"OOS PnL {res.attrs['oos_total_pnl']:.0f} (max DD {res.attrs['oos_max_drawdown']:.0f}) "
+          f"in {res.attrs['seconds']:.1f}s; indicator cache {c['hits']} hits / {c['disk_hits']} disk / "
+          f"{c['misses']} computed / {c['spills']} spilled")